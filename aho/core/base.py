@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 
+from ..utils.context import ContextBuilder
+from ..utils.tracing import TRACER
 from .memory import Memory
 from .types import Message, Response, Tool
 
@@ -41,32 +43,40 @@ class BaseAgent:
         name: str,
         llm: Optional[BaseLLM] = None,
         memory: Optional[Memory] = None,
-        tools: Optional[List[Tool]] = None
+        tools: Optional[List[Tool]] = None,
+        context_builder: Optional[ContextBuilder] = None,
+        context_limit: int = 20
     ):
         self.name = name
         self.llm = llm
         self.memory = memory or Memory()
         self.tools = tools or []
         self.plugins: Dict[str, BasePlugin] = {}
+        self.context_builder = context_builder
+        self.context_limit = context_limit
     
     async def think(self, input_data: str) -> Response:
         """Process input and generate a plan."""
         if not self.llm:
             raise ValueError("No LLM configured for this agent")
         
-        # Use memory for context
-        context = self.memory.retrieve_relevant(input_data)
-        messages = [
-            {"role": "system", "content": f"You are {self.name}, an AI assistant."},
-            {"role": "user", "content": input_data}
-        ]
+        if self.context_builder is None:
+            self.context_builder = ContextBuilder.for_llm(self.llm)
         
-        if context:
-            messages.insert(1, {"role": "system", "content": f"Context: {context}"})
-        
-        response = await self.llm.generate(messages)
-        self.memory.store(input_data, response)
-        return response
+        with TRACER.span("BaseAgent.think", agent=self.name) as span:
+            # Pack the most relevant memories into the model's token budget
+            context = self.memory.retrieve_relevant(input_data, limit=self.context_limit)
+            messages = self.context_builder.build(
+                user=input_data,
+                system=f"You are {self.name}, an AI assistant.",
+                context=context
+            )
+            span.set_attribute("context_items", self.context_builder.last_stats.get("context_items"))
+            span.set_attribute("prompt_tokens", self.context_builder.last_stats.get("prompt_tokens"))
+            
+            response = await self.llm.generate(messages)
+            self.memory.store(input_data, response)
+            return response
     
     def add_tool(self, tool: Tool) -> None:
         """Add a tool to the agent's toolkit."""
@@ -19,17 +19,23 @@ class Memory:
     Supports both simple key-value storage and sophisticated memory management.
     """
     
-    def __init__(self, max_items: int = 1000):
+    def __init__(self, max_items: int = 1000, tool_result_limit: int = 2000):
         self.short_term: List[Dict[str, Any]] = []
         self.long_term: Dict[str, Any] = {}
         self.max_items = max_items
+        self.tool_result_limit = tool_result_limit
         self.tools: Dict[str, Tool] = {}
         self._load_default_tools()
         
     def _load_default_tools(self) -> None:
         """Load all registered tools"""
         for name, tool_cls in ToolRegistry.get_all_tools().items():
-            tool = tool_cls()
+            try:
+                tool = tool_cls()
+            except Exception as e:
+                # e.g. a search tool without its API key configured
+                logger.warning(f"Skipping tool {name}: {e}")
+                continue
             self.tools[name] = tool
             logger.debug(f"Loaded tool: {name}")
     
@@ -50,15 +56,27 @@ class Memory:
         
         result = await tool.execute(**kwargs)
         
-        # Store tool usage in memory
+        # Store a compact record of the tool usage in memory
         self.store_short_term({
             "tool": tool_name,
             "args": kwargs,
-            "result": result
+            "result": self._compact_tool_result(result)
         })
         
         return result
     
+    def _compact_tool_result(self, result: Any) -> Any:
+        """
+        Plain-data copy of a tool result for memory, cut to tool_result_limit
+        characters so large payloads are not kept for the whole session.
+        """
+        if isinstance(result, BaseModel):
+            result = result.model_dump()
+        text = result if isinstance(result, str) else json.dumps(result, default=str)
+        if len(text) <= self.tool_result_limit:
+            return result if isinstance(result, str) else json.loads(text)
+        return text[:self.tool_result_limit] + " …"
+    
     def get_available_tools(self) -> Dict[str, Dict[str, Any]]:
         """Get schemas for all registered tools"""
         return {
@@ -4,6 +4,7 @@ import asyncio
 import networkx as nx
 
 from aho.core.agent import BaseAgent
+from aho.utils.tracing import TRACER
 
 class TaskState(BaseModel):
     id: str
@@ -23,14 +24,15 @@ class ManagerAgent:
         strategy: str = "sequential",
         timeout: int = 300
     ) -> Dict:
-        if strategy == "sequential":
-            return await self._sequential_execution(task)
-        elif strategy == "hierarchical":
-            return await self._hierarchical_execution(task)
-        elif strategy == "debate":
-            return await self._debate_execution(task, timeout)
-        else:
-            raise ValueError(f"Unknown strategy: {strategy}")
+        with TRACER.span("ManagerAgent.coordinate", strategy=strategy, agents=len(self.agents)):
+            if strategy == "sequential":
+                return await self._sequential_execution(task)
+            elif strategy == "hierarchical":
+                return await self._hierarchical_execution(task)
+            elif strategy == "debate":
+                return await self._debate_execution(task, timeout)
+            else:
+                raise ValueError(f"Unknown strategy: {strategy}")
             
     async def _debate_execution(self, task: str, timeout: int) -> Dict:
         """Implement consensus-building debate pattern"""
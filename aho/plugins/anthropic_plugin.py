@@ -1,32 +1,182 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 import anthropic
-from tenacity import retry, stop_after_attempt, wait_exponential
+from .base import BasePlugin, LLMResponse, StreamChunk, stable_prefix_layout
+from .resilience import ResiliencePolicy, resilient
+from .transport import HTTPTransportConfig, SharedClientMixin
 
-class ClaudePlugin:
+
+# Anthropic caches the prompt up to each block marked with cache_control
+CACHE_CONTROL = {"type": "ephemeral"}
+MAX_CACHE_BREAKPOINTS = 4
+
+
+def normalize_usage(usage: Any) -> Dict[str, int]:
+    """
+    Normalized usage from a Messages API usage object, including prompt-cache
+    reads and writes (``input_tokens`` excludes both).
+    """
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cache_read_tokens": cache_read,
+        "cache_write_tokens": cache_write,
+        "total_tokens": input_tokens + cache_read + cache_write + output_tokens
+    }
+
+
+def to_llm_response(response: Any, keep_raw: bool = False) -> LLMResponse:
+    """
+    Normalize a Messages API response: text blocks are joined into
+    ``content`` and tool_use blocks become plain-dict ``tool_calls``.
+    """
+    return LLMResponse(
+        content="".join(block.text for block in response.content if block.type == "text"),
+        tool_calls=[block for block in response.content if block.type == "tool_use"],
+        usage=normalize_usage(response.usage),
+        model=response.model,
+        finish_reason=response.stop_reason,
+        raw_response=response if keep_raw else None
+    )
+
+
+def build_cached_prompt(
+    messages: List[Dict[str, Any]],
+    tools: Optional[List[Dict[str, Any]]] = None,
+    cache: bool = True
+) -> Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """
+    Split messages into the Messages API ``system``, ``messages`` and ``tools``
+    params, with the stable prefix first and marked for prompt caching.
+
+    System messages become system text blocks; the last tool and the last
+    system block get a cache breakpoint. A conversation message can add its
+    own breakpoint with ``"cache_control": True`` (e.g. the end of a long
+    pinned document), up to the API's limit of four.
+
+    Args:
+        messages: Standard messages; system messages may appear anywhere
+        tools: Tool definitions
+        cache: Add cache_control breakpoints
+
+    Returns:
+        (system, messages, tools) params
+    """
+    # The Messages API takes every system message in the top-level system param
+    messages, tools = stable_prefix_layout(messages, tools, hoist_system=True)
+    breakpoints = 0
+
+    if tools and cache:
+        tools = tools[:-1] + [{**tools[-1], "cache_control": CACHE_CONTROL}]
+        breakpoints += 1
+
+    system = [
+        {"type": "text", "text": message["content"]}
+        for message in messages if message["role"] == "system"
+    ] or None
+    if system and cache:
+        system[-1]["cache_control"] = CACHE_CONTROL
+        breakpoints += 1
+
+    conversation = []
+    for message in messages:
+        if message["role"] not in ("user", "assistant"):
+            continue
+        formatted = {"role": message["role"], "content": message["content"]}
+        if message.get("cache_control") and cache and breakpoints < MAX_CACHE_BREAKPOINTS:
+            content = message["content"]
+            blocks = [{"type": "text", "text": content}] if isinstance(content, str) else [dict(b) for b in content]
+            blocks[-1]["cache_control"] = CACHE_CONTROL
+            formatted["content"] = blocks
+            breakpoints += 1
+        conversation.append(formatted)
+
+    return system, conversation, tools
+
+
+async def process_stream_events(events: AsyncIterator[Any]) -> AsyncIterator[StreamChunk]:
+    """
+    Convert Messages API stream events into normalized delta chunks.
+    
+    Args:
+        events (AsyncIterator[Any]): Raw server-sent events from messages.create(stream=True)
+        
+    Yields:
+        StreamChunk: Text deltas, partial tool-call arguments, usage and stop reason
+    """
+    tool_blocks: Dict[int, Dict[str, Any]] = {}
+    async for event in events:
+        if event.type == "message_start":
+            usage = normalize_usage(event.message.usage)
+            # output_tokens arrives with message_delta
+            usage.pop("output_tokens")
+            usage.pop("total_tokens")
+            yield StreamChunk(usage=usage)
+        elif event.type == "content_block_start" and event.content_block.type == "tool_use":
+            tool_blocks[event.index] = {"id": event.content_block.id, "name": event.content_block.name}
+            yield StreamChunk(tool_call={"index": event.index, **tool_blocks[event.index], "arguments": ""})
+        elif event.type == "content_block_delta":
+            if event.delta.type == "text_delta":
+                yield StreamChunk(content=event.delta.text)
+            elif event.delta.type == "input_json_delta":
+                yield StreamChunk(tool_call={
+                    "index": event.index,
+                    **tool_blocks.get(event.index, {}),
+                    "arguments": event.delta.partial_json
+                })
+        elif event.type == "message_delta":
+            yield StreamChunk(
+                usage={"output_tokens": event.usage.output_tokens},
+                finish_reason=event.delta.stop_reason
+            )
+
+class ClaudePlugin(SharedClientMixin, BasePlugin):
     """
     Plugin for interacting with Anthropic's Claude API.
     Handles API calls, retry logic, and response processing.
     """
     
-    def __init__(self, api_key: str, model: str = "claude-3-opus-20240229"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-3-opus-20240229",
+        client: Optional[anthropic.AsyncAnthropic] = None,
+        transport_config: Optional[HTTPTransportConfig] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+        prompt_caching: bool = True,
+        keep_raw: bool = False
+    ):
         """
         Initialize Claude plugin.
         
         Args:
             api_key (str): Anthropic API key
             model (str): Model to use for completions (default: claude-3-opus-20240229)
+            client (Optional[anthropic.AsyncAnthropic]): Explicit client to use instead of the shared one
+            transport_config (Optional[HTTPTransportConfig]): Connection pool and keep-alive settings
+                for the shared client
+            resilience (Optional[ResiliencePolicy]): Retry, deadline and hedging policy
+                (default: 3 attempts under the global retry budget)
+            prompt_caching (bool): Mark the system prompt and tool definitions as a cacheable prefix
+            keep_raw (bool): Keep the SDK response object on each LLMResponse
         """
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self._use_shared_client(client, anthropic.AsyncAnthropic, transport_config, api_key=api_key)
+        self.resilience = resilience or ResiliencePolicy()
         self.model = model
+        self.prompt_caching = prompt_caching
+        self.keep_raw = keep_raw
         
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @resilient
     async def generate_response(
         self,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
         tools: Optional[List[Dict[str, Any]]] = None
-    ) -> Dict[str, Any]:
+    ) -> LLMResponse:
         """
         Generate a response using Claude's API.
         
@@ -37,56 +187,81 @@ class ClaudePlugin:
             tools (Optional[List[Dict[str, Any]]]): List of tools available to the model
             
         Returns:
-            Dict[str, Any]: Response from the API
+            LLMResponse: Normalized response
         """
         try:
-            # Convert messages to Claude's format
-            formatted_messages = self._format_messages(messages)
-            
-            params = {
-                "model": self.model,
-                "messages": formatted_messages,
-                "temperature": temperature,
-            }
-            
-            if max_tokens:
-                params["max_tokens"] = max_tokens
-                
-            if tools:
-                params["tools"] = tools
-            
+            params = self._build_params(messages, temperature, max_tokens, tools)
             response = await self.client.messages.create(**params)
             return self._process_response(response)
             
         except Exception as e:
             raise Exception(f"Claude API error: {str(e)}")
-    
-    def _format_messages(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[StreamChunk]:
         """
-        Convert standard message format to Claude's expected format.
+        Stream a response from Claude's API as normalized delta chunks.
         
         Args:
-            messages (List[Dict[str, str]]): Standard message format
+            messages (List[Dict[str, str]]): List of message dictionaries
+            temperature (float): Sampling temperature
+            max_tokens (Optional[int]): Maximum tokens to generate
+            tools (Optional[List[Dict[str, Any]]]): List of tools available to the model
             
-        Returns:
-            List[Dict[str, str]]: Claude-formatted messages
+        Yields:
+            StreamChunk: Text and tool-call deltas, then a final chunk with usage and timing
         """
-        formatted_messages = []
+        async for chunk in self._timed_stream(self._stream_chunks(messages, temperature, max_tokens, tools)):
+            yield chunk
+
+    async def _stream_chunks(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]]
+    ) -> AsyncIterator[StreamChunk]:
+        try:
+            params = self._build_params(messages, temperature, max_tokens, tools)
+            params["stream"] = True
+            stream = await self.client.messages.create(**params)
+            async for chunk in process_stream_events(stream):
+                yield chunk
+        except Exception as e:
+            raise Exception(f"Claude API error: {str(e)}")
+
+    def _build_params(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        # Convert messages to Claude's format, stable prefix first
+        system, formatted_messages, tools = build_cached_prompt(messages, tools, self.prompt_caching)
         
-        for message in messages:
-            role = message["role"]
-            if role == "system":
-                # Claude handles system messages differently
-                formatted_messages.append({
-                    "role": "user",
-                    "content": message["content"]
-                })
-            elif role in ["user", "assistant"]:
-                formatted_messages.append(message)
-                
-        return formatted_messages
+        params = {
+            "model": self.model,
+            "messages": formatted_messages,
+            "temperature": temperature,
+            # The Messages API requires an explicit output budget
+            "max_tokens": max_tokens or 1024
+        }
+        
+        if system:
+            params["system"] = system
+            
+        if tools:
+            params["tools"] = tools
             
-    def _process_response(self, response: Any) -> Dict[str, Any]:
+        return params
+            
+    def _process_response(self, response: Any) -> LLMResponse:
         """
         Process the raw API response into a standardized format.
         
@@ -94,25 +269,10 @@ class ClaudePlugin:
             response (Any): Raw API response
             
         Returns:
-            Dict[str, Any]: Processed response
+            LLMResponse: Processed response
         """
         try:
-            content = response.content[0].text
-            tool_calls = response.tool_calls if hasattr(response, 'tool_calls') else None
-            
-            processed_response = {
-                "content": content,
-                "tool_calls": tool_calls,
-                "usage": {
-                    "input_tokens": response.usage.input_tokens,
-                    "output_tokens": response.usage.output_tokens,
-                    "total_tokens": response.usage.total_tokens
-                },
-                "model": response.model,
-                "raw_response": response
-            }
-            
-            return processed_response
+            return to_llm_response(response, self.keep_raw)
             
         except Exception as e:
             raise Exception(f"Error processing Claude response: {str(e)}")
\ No newline at end of file
@@ -1,15 +1,52 @@
-from typing import Dict, Any, Optional, List
-from tenacity import retry, stop_after_attempt, wait_exponential
-import requests
-from .base import BasePlugin
+from typing import Dict, Any, Optional, List, AsyncIterator
+from .base import BasePlugin, StreamChunk
+from .resilience import ResiliencePolicy, resilient
+from .transport import AsyncHTTPTransport, HTTPTransportConfig, get_shared_transport
 
 class AzureAIPlugin(BasePlugin):
-    def __init__(self, api_key: str, endpoint: str, model: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: str,
+        endpoint: str,
+        model: Optional[str] = None,
+        transport: Optional[AsyncHTTPTransport] = None,
+        transport_config: Optional[HTTPTransportConfig] = None,
+        resilience: Optional[ResiliencePolicy] = None
+    ):
         self.api_key = api_key
         self.model = model or "gpt-4-azure"
         self.endpoint = endpoint
+        self.transport = transport or get_shared_transport(transport_config)
+        self.resilience = resilience or ResiliencePolicy()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @property
+    def _url(self) -> str:
+        return f"{self.endpoint}/openai/deployments/{self.model}/chat/completions"
+
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"Ocp-Apim-Subscription-Key": self.api_key, "Content-Type": "application/json"}
+
+    def _build_payload(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens or 512
+        }
+
+        if tools:
+            payload["tools"] = tools
+
+        return payload
+
+    @resilient
     async def generate_response(
         self, 
         messages: List[Dict[str, str]], 
@@ -18,24 +55,8 @@ class AzureAIPlugin(BasePlugin):
         tools: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         try:
-            headers = {"Ocp-Apim-Subscription-Key": self.api_key, "Content-Type": "application/json"}
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens or 512
-            }
-            
-            if tools:
-                payload["tools"] = tools
-                
-            response = requests.post(
-                f"{self.endpoint}/openai/deployments/{self.model}/chat/completions", 
-                headers=headers, 
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+            payload = self._build_payload(messages, temperature, max_tokens, tools)
+            data = await self.transport.post_json(self._url, payload, headers=self._headers)
             return {
                 "content": data["choices"][0]["message"]["content"],
                 "usage": data.get("usage", {}),
@@ -43,3 +64,46 @@ class AzureAIPlugin(BasePlugin):
             }
         except Exception as e:
             raise RuntimeError(f"Azure AI API error: {e}")
+
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[StreamChunk]:
+        async for chunk in self._timed_stream(self._stream_chunks(messages, temperature, max_tokens, tools)):
+            yield chunk
+
+    async def _stream_chunks(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]]
+    ) -> AsyncIterator[StreamChunk]:
+        try:
+            payload = self._build_payload(messages, temperature, max_tokens, tools)
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+            async for event in self.transport.stream_events(self._url, payload, headers=self._headers):
+                for choice in event.get("choices", [])[:1]:
+                    delta = choice.get("delta", {})
+                    if delta.get("content"):
+                        yield StreamChunk(content=delta["content"])
+                    for tool_call in delta.get("tool_calls") or []:
+                        function = tool_call.get("function", {})
+                        yield StreamChunk(tool_call={
+                            "index": tool_call.get("index"),
+                            "id": tool_call.get("id"),
+                            "name": function.get("name"),
+                            "arguments": function.get("arguments") or ""
+                        })
+                    if choice.get("finish_reason"):
+                        yield StreamChunk(finish_reason=choice["finish_reason"])
+                if event.get("usage"):
+                    yield StreamChunk(usage={
+                        key: value for key, value in event["usage"].items() if isinstance(value, int)
+                    })
+        except Exception as e:
+            raise RuntimeError(f"Azure AI API error: {e}")
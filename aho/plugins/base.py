@@ -1,10 +1,202 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, List
+from collections.abc import MutableMapping
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, List, Tuple, TypeVar
+import functools
+import json
+import time
+from pydantic import BaseModel
+from ..utils.metrics import METRICS
+from ..utils.tracing import TRACER, current_span
+
+T = TypeVar("T")
+
+
+class StreamChunk(BaseModel):
+    """
+    A normalized piece of a streamed completion.
+
+    Content chunks carry ``content`` (a text delta) or ``tool_call`` (a partial
+    tool call: index, id, name and an ``arguments`` fragment). The last chunk of
+    every stream carries the final ``usage``, the ``finish_reason`` and the
+    ``time_to_first_token`` in seconds, plus any provider-reported ``timings``.
+    """
+    content: str = ""
+    tool_call: Optional[Dict[str, Any]] = None
+    usage: Optional[Dict[str, int]] = None
+    finish_reason: Optional[str] = None
+    time_to_first_token: Optional[float] = None
+    timings: Optional[Dict[str, float]] = None
+
+
+def _plain(value: Any) -> Any:
+    """Convert SDK objects (pydantic models) into plain dicts and lists."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+class LLMResponse(MutableMapping):
+    """
+    Normalized, memory-light result of a generate_response call.
+
+    Holds the content, tool calls (as plain dicts), normalized usage and
+    timings in fixed slots. The SDK response object is kept only when the
+    plugin is created with ``keep_raw=True``, so long-running workers do not
+    accumulate provider payloads.
+
+    Behaves like the response dicts plugins used to return: ``response["content"]``,
+    ``response.get("usage")`` and ``response["served_by"] = ...`` all work, and
+    extra keys are stored alongside the standard fields.
+
+    Example usage:
+        response = await plugin.generate_response(messages)
+        print(response.content, response["usage"]["total_tokens"])
+    """
+
+    __slots__ = ("content", "tool_calls", "usage", "model", "finish_reason", "timings", "raw_response", "_extra")
+
+    FIELDS = ("content", "tool_calls", "usage", "model", "finish_reason", "timings", "raw_response")
+
+    def __init__(
+        self,
+        content: Optional[str] = None,
+        tool_calls: Optional[List[Any]] = None,
+        usage: Optional[Dict[str, int]] = None,
+        model: Optional[str] = None,
+        finish_reason: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None,
+        raw_response: Any = None,
+        **extra: Any
+    ):
+        self.content = content
+        self.tool_calls = _plain(tool_calls) or None
+        self.usage = usage
+        self.model = model
+        self.finish_reason = finish_reason
+        self.timings = timings
+        self.raw_response = raw_response
+        self._extra: Optional[Dict[str, Any]] = extra or None
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in self.FIELDS:
+            setattr(self, key, None)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.FIELDS
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return len(self.FIELDS) + len(self._extra or ())
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{key}={self[key]!r}" for key in self if key != "raw_response")
+        return f"LLMResponse({fields})"
+
+    def copy(self) -> "LLMResponse":
+        """Shallow copy (like dict.copy()); extra keys set on the copy do not leak back."""
+        return LLMResponse(**{key: value for key, value in self.items()})
+
+    def to_dict(self, include_raw: bool = False) -> Dict[str, Any]:
+        """Plain dict of the response (without the raw payload unless asked)."""
+        return {key: value for key, value in self.items() if include_raw or key != "raw_response"}
+
+
+class _PluginCall:
+    """An instrumented plugin call in progress; ``nested`` is set once it calls another plugin."""
+
+    __slots__ = ("nested",)
+
+    def __init__(self) -> None:
+        self.nested = False
+
+
+_plugin_call: ContextVar[Optional[_PluginCall]] = ContextVar("aho_plugin_call", default=None)
+
+
+def instrumented(method: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Decorator for plugin methods, applied by BasePlugin to every concrete
+    generate_response.
+
+    A call through a stack of plugins (wrappers, failover, retries) opens one
+    trace span, at the outermost plugin, and records call metrics once per
+    request that reaches a service: at the innermost plugin, never at a
+    PluginWrapper, so cache hits are not counted as requests.
+    """
+    @functools.wraps(method)
+    async def wrapper(self: Any, *args: Any, **kwargs: Any) -> T:
+        if not METRICS.enabled and not TRACER.enabled:
+            return await method(self, *args, **kwargs)
+
+        parent = _plugin_call.get()
+        if parent is not None:
+            parent.nested = True
+        call = _PluginCall()
+        token = _plugin_call.set(call)
+        name, model = get_plugin_name(self), get_model_name(self)
+        records = METRICS.enabled and not isinstance(self, PluginWrapper)
+        span_context = nullcontext() if parent is not None else \
+            TRACER.span(f"plugin.{method.__name__}", plugin=name, model=model)
+        try:
+            with span_context as span:
+                start = time.perf_counter()
+                try:
+                    result = await method(self, *args, **kwargs)
+                except Exception:
+                    if records and not call.nested:
+                        METRICS.record_plugin_call(name, model, time.perf_counter() - start, error=True)
+                    raise
+                if span is not None:
+                    span.record_response(result)
+                if records and not call.nested:
+                    usage = result.get("usage") if hasattr(result, "get") else None
+                    METRICS.record_plugin_call(name, model, time.perf_counter() - start, usage)
+                return result
+        finally:
+            _plugin_call.reset(token)
+
+    wrapper.__instrumented__ = True
+    return wrapper
 
 
 class BasePlugin(ABC):
-    """Abstract base class for AI service plugins."""
-    
+    """
+    Abstract base class for AI service plugins.
+
+    Every subclass's generate_response is traced and metered (see ``instrumented``).
+    """
+
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        method = cls.__dict__.get("generate_response")
+        if method is not None and not getattr(method, "__isabstractmethod__", False) \
+                and not getattr(method, "__instrumented__", False):
+            cls.generate_response = instrumented(method)
+
     @abstractmethod
     async def generate_response(
         self,
@@ -15,14 +207,239 @@ class BasePlugin(ABC):
     ) -> Dict[str, Any]:
         """
         Generate a response from the AI service.
-        
+
         Args:
             messages: List of message dictionaries with 'role' and 'content'
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
             tools: List of tools available to the model
-            
+
         Returns:
             Dict containing the response content and metadata
         """
-        pass
\ No newline at end of file
+        pass
+
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[StreamChunk]:
+        """
+        Stream a response from the AI service as normalized delta chunks.
+
+        Plugins without native streaming fall back to generate_response and
+        yield the whole completion as a single chunk.
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            tools: List of tools available to the model
+
+        Yields:
+            StreamChunk objects; the last one carries usage and timing
+        """
+        # generate_response records its own call metrics
+        async for chunk in self._timed_stream(
+            self._fallback_stream(messages, temperature, max_tokens, tools),
+            record_call=False
+        ):
+            yield chunk
+
+    async def _fallback_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]]
+    ) -> AsyncIterator[StreamChunk]:
+        response = await self.generate_response(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            tools=tools
+        )
+        yield StreamChunk(content=response.get("content") or "", usage=response.get("usage") or None)
+
+    async def _timed_stream(
+        self,
+        chunks: AsyncIterator[StreamChunk],
+        record_call: bool = True
+    ) -> AsyncIterator[StreamChunk]:
+        """
+        Pass content chunks through, record time-to-first-token, and finish with
+        one chunk holding the merged usage, finish reason and time to first token.
+        Timing lives on the stream, not the plugin, so concurrent streams on one
+        plugin never see each other's values.
+        """
+        start = time.perf_counter()
+        time_to_first_token = None
+        usage: Dict[str, int] = {}
+        timings: Dict[str, float] = {}
+        finish_reason = None
+
+        try:
+            async for chunk in chunks:
+                if chunk.usage:
+                    usage.update(chunk.usage)
+                if chunk.timings:
+                    timings.update(chunk.timings)
+                if chunk.finish_reason:
+                    finish_reason = chunk.finish_reason
+                if chunk.content or chunk.tool_call:
+                    if time_to_first_token is None:
+                        time_to_first_token = time.perf_counter() - start
+                    yield StreamChunk(content=chunk.content, tool_call=chunk.tool_call)
+        except Exception:
+            if METRICS.enabled and record_call:
+                METRICS.record_plugin_call(
+                    get_plugin_name(self), get_model_name(self), time.perf_counter() - start, error=True
+                )
+            raise
+
+        if time_to_first_token is not None:
+            current_span().set_attribute("time_to_first_token", time_to_first_token)
+        if METRICS.enabled:
+            name, model = get_plugin_name(self), get_model_name(self)
+            if time_to_first_token is not None:
+                METRICS.plugin_ttft.observe(time_to_first_token, plugin=name, model=model or "")
+            if record_call:
+                METRICS.record_plugin_call(name, model, time.perf_counter() - start, usage)
+
+        yield StreamChunk(
+            usage=usage,
+            finish_reason=finish_reason,
+            time_to_first_token=time_to_first_token,
+            timings=timings or None
+        )
+
+
+def get_model_name(plugin: Any) -> Optional[str]:
+    """Return the model a plugin is configured for, if it exposes one."""
+    model = getattr(plugin, "model", None)
+    if model is None:
+        model = getattr(getattr(plugin, "config", None), "model", None)
+    return model
+
+
+def unwrap_plugin(plugin: Any) -> Any:
+    """The plugin at the bottom of a stack of PluginWrappers."""
+    while isinstance(plugin, PluginWrapper):
+        plugin = plugin.plugin
+    return plugin
+
+
+def get_plugin_name(plugin: Any) -> str:
+    """Name used for a plugin in metrics and traces: its ``name`` or its class, looking through wrappers."""
+    plugin = unwrap_plugin(plugin)
+    return getattr(plugin, "name", None) or type(plugin).__name__
+
+
+class PluginWrapper(BasePlugin):
+    """
+    Base class for plugins that wrap another plugin and add behaviour around
+    its calls (caching, rate limiting, ...). Attributes not defined on the
+    wrapper are looked up on the wrapped plugin, so wrappers can be stacked and
+    used anywhere a plugin is expected.
+    """
+
+    def __init__(self, plugin: BasePlugin):
+        self.plugin = plugin
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "plugin":
+            raise AttributeError(name)
+        return getattr(self.plugin, name)
+
+    @property
+    def model(self) -> Optional[str]:
+        return get_model_name(self.plugin)
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        return await self.plugin.generate_response(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            tools=tools
+        )
+
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[StreamChunk]:
+        async for chunk in self.plugin.generate_stream(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            tools=tools
+        ):
+            yield chunk
+
+
+def usage_total_tokens(usage: Optional[Dict[str, Any]]) -> int:
+    """
+    Total tokens from a plugin ``usage`` dict, whichever naming the provider
+    uses (prompt/completion or input/output).
+    """
+    if not usage:
+        return 0
+    if usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    return int(
+        (usage.get("prompt_tokens") or usage.get("input_tokens") or 0) +
+        (usage.get("completion_tokens") or usage.get("output_tokens") or 0)
+    )
+
+
+def _tool_name(tool: Dict[str, Any]) -> str:
+    return str(tool.get("name") or (tool.get("function") or {}).get("name") or "")
+
+
+def stable_prefix_layout(
+    messages: List[Dict[str, Any]],
+    tools: Optional[List[Dict[str, Any]]] = None,
+    hoist_system: bool = False
+) -> Tuple[List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+    """
+    Lay out a request so its stable part is byte-identical from call to call.
+
+    Providers cache prompts by exact prefix. The leading run of system
+    messages (system prompt, pinned memory) is that prefix and stays first;
+    system messages later in the conversation (tool guidance, new
+    instructions) stay where they are, since moving them changes what the
+    model reads. Tool schemas are sorted by name with their keys in
+    canonical order.
+
+    Args:
+        messages: The request messages
+        tools: Tool definitions
+        hoist_system: Move every system message ahead of the conversation, in
+                      their original order (for APIs that take the system
+                      prompt separately, or to opt in to a longer cached prefix)
+
+    Returns:
+        (messages, tools) in cache-friendly order
+    """
+    if hoist_system:
+        system = [message for message in messages if message.get("role") == "system"]
+        conversation = [message for message in messages if message.get("role") != "system"]
+        messages = system + conversation
+    else:
+        messages = list(messages)
+    if tools:
+        tools = [
+            json.loads(json.dumps(tool, sort_keys=True))
+            for tool in sorted(tools, key=_tool_name)
+        ]
+    return messages, tools
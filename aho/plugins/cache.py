@@ -0,0 +1,240 @@
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from loguru import logger
+from .base import BasePlugin, LLMResponse, PluginWrapper
+
+# Marks persisted entries that were LLMResponse objects
+_LLM_RESPONSE_MARKER = "__llm_response__"
+
+
+def _to_jsonable(value: Any) -> Any:
+    """Convert SDK objects (pydantic models, dataclasses) into plain JSON data."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, Mapping):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def make_request_key(
+    model: Optional[str],
+    messages: List[Dict[str, Any]],
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    tools: Optional[List[Dict[str, Any]]] = None
+) -> str:
+    """
+    Build a stable hash for a generate_response call.
+
+    Messages and tool schemas are serialized with sorted keys and without
+    ``None`` values, so equivalent requests map to the same key regardless of
+    dict ordering.
+    """
+    normalized_messages = [
+        {k: v for k, v in message.items() if v is not None}
+        for message in messages
+    ]
+    payload = {
+        "model": model,
+        "messages": _to_jsonable(normalized_messages),
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "tools": _to_jsonable(tools or []),
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier exact-match response cache.
+
+    An in-memory LRU tier with TTL sits in front of an optional SQLite tier
+    that survives restarts. Entries read from disk are promoted to memory.
+
+    Example usage:
+        cache = ResponseCache(max_entries=2048, ttl=24 * 3600, db_path="~/.aho/responses.db")
+        plugin = CachedPlugin(openai_plugin, cache)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        db_path: Optional[Union[str, Path]] = None
+    ):
+        """
+        Args:
+            max_entries: Maximum number of responses kept in memory
+            ttl: Seconds an entry stays valid (None for no expiry)
+            db_path: SQLite file for the persistent tier (None for memory only)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Dict[str, Any]]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if db_path is not None:
+            self._open_db(Path(db_path).expanduser())
+
+    def _open_db(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._db.commit()
+
+    def _expiry(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl is not None else None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response (of the type it was stored as), or None on a miss."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value.copy()
+            del self._entries[key]
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None:
+                value_json, expires_at = row
+                if expires_at is None or expires_at > now:
+                    value = json.loads(value_json)
+                    if value.pop(_LLM_RESPONSE_MARKER, False):
+                        value = LLMResponse(**value)
+                    self._remember(key, expires_at, value)
+                    self.hits += 1
+                    return value.copy()
+                self.delete(key)
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a response in every configured tier."""
+        expires_at = self._expiry()
+        # Keep our own copy: callers annotate the response they got back
+        self._remember(key, expires_at, value.copy())
+
+        if self._db is not None:
+            # raw SDK payloads are not portable across processes
+            persisted = {k: v for k, v in value.items() if k != "raw_response"}
+            if isinstance(value, LLMResponse):
+                persisted[_LLM_RESPONSE_MARKER] = True
+            try:
+                encoded = json.dumps(_to_jsonable(persisted))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Response not persisted to cache: {e}")
+                return
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, encoded, expires_at)
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, expires_at: Optional[float], value: Dict[str, Any]) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove an entry from every tier."""
+        self._entries.pop(key, None)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+
+    def clear(self) -> None:
+        """Remove all entries from every tier."""
+        self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the persistent tier."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CachedPlugin(PluginWrapper):
+    """
+    Wraps any plugin so that repeated identical requests are answered from a
+    ResponseCache without touching the network.
+
+    Example usage:
+        plugin = CachedPlugin(OpenAIPlugin(api_key=key), deterministic_only=True)
+        chain = PromptChain([(plugin, "Summarize: {input}")])
+    """
+
+    def __init__(
+        self,
+        plugin: BasePlugin,
+        cache: Optional[ResponseCache] = None,
+        deterministic_only: bool = False
+    ):
+        """
+        Args:
+            plugin: The plugin to wrap
+            cache: Cache to use (defaults to an in-memory ResponseCache)
+            deterministic_only: Only cache calls made with temperature 0
+        """
+        super().__init__(plugin)
+        self.cache = cache if cache is not None else ResponseCache()
+        self.deterministic_only = deterministic_only
+
+    def is_cacheable(self, temperature: Optional[float]) -> bool:
+        return not self.deterministic_only or temperature == 0
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        if not self.is_cacheable(temperature):
+            return await super().generate_response(messages, temperature, max_tokens, tools)
+
+        key = make_request_key(self.model, messages, temperature, max_tokens, tools)
+        cached = self.cache.get(key)
+        if cached is not None:
+            cached["cache_hit"] = True
+            return cached
+
+        response = await super().generate_response(messages, temperature, max_tokens, tools)
+        self.cache.set(key, response)
+        return response
@@ -1,39 +1,88 @@
-from typing import Dict, Any, Optional, List
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import Dict, Any, Optional, List, AsyncIterator
 import anthropic
-from .base import BasePlugin
+from .anthropic_plugin import build_cached_prompt, process_stream_events, to_llm_response
+from .base import BasePlugin, LLMResponse, StreamChunk
+from .resilience import ResiliencePolicy, resilient
+from .transport import HTTPTransportConfig, SharedClientMixin
 
-class ClaudePlugin(BasePlugin):
-    def __init__(self, api_key: str, model: Optional[str] = None):
+class ClaudePlugin(SharedClientMixin, BasePlugin):
+    def __init__(
+        self,
+        api_key: str,
+        model: Optional[str] = None,
+        client: Optional[anthropic.AsyncAnthropic] = None,
+        transport_config: Optional[HTTPTransportConfig] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+        prompt_caching: bool = True,
+        keep_raw: bool = False
+    ):
         self.api_key = api_key
         self.model = model or "claude-3-opus-20240229"
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self._use_shared_client(client, anthropic.AsyncAnthropic, transport_config, api_key=api_key)
+        self.resilience = resilience or ResiliencePolicy()
+        self.prompt_caching = prompt_caching
+        self.keep_raw = keep_raw
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @resilient
     async def generate_response(
-        self, 
-        messages: List[Dict[str, str]], 
-        temperature: float = 0.7, 
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
         max_tokens: Optional[int] = None,
         tools: Optional[List[Dict[str, Any]]] = None
-    ) -> Dict[str, Any]:
+    ) -> LLMResponse:
+        try:
+            params = self._build_params(messages, temperature, max_tokens, tools)
+            response = await self.client.messages.create(**params)
+            return to_llm_response(response, self.keep_raw)
+        except Exception as e:
+            raise RuntimeError(f"Claude API error: {e}")
+
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[StreamChunk]:
+        async for chunk in self._timed_stream(self._stream_chunks(messages, temperature, max_tokens, tools)):
+            yield chunk
+
+    async def _stream_chunks(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]]
+    ) -> AsyncIterator[StreamChunk]:
         try:
-            formatted_messages = [{"role": msg["role"], "content": msg["content"]} for msg in messages]
-            params = {
-                "model": self.model,
-                "messages": formatted_messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens or 512
-            }
-            
-            if tools:
-                params["tools"] = tools
-                
-            response = await self.client.completions.create(**params)
-            return {
-                "content": response["choices"][0]["message"]["content"],
-                "usage": response.get("usage", {}),
-                "tool_calls": response["choices"][0]["message"].get("tool_calls")
-            }
+            params = self._build_params(messages, temperature, max_tokens, tools)
+            params["stream"] = True
+            stream = await self.client.messages.create(**params)
+            async for chunk in process_stream_events(stream):
+                yield chunk
         except Exception as e:
-            raise RuntimeError(f"Claude API error: {e}")
\ No newline at end of file
+            raise RuntimeError(f"Claude API error: {e}")
+
+    def _build_params(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        system, formatted_messages, tools = build_cached_prompt(messages, tools, self.prompt_caching)
+        params = {
+            "model": self.model,
+            "messages": formatted_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens or 512
+        }
+
+        if system:
+            params["system"] = system
+
+        if tools:
+            params["tools"] = tools
+
+        return params
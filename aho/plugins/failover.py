@@ -0,0 +1,321 @@
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import time
+from loguru import logger
+from .base import BasePlugin, StreamChunk, get_model_name
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when every plugin behind a FailoverPlugin is unavailable."""
+
+
+class BreakerPermit:
+    """
+    Admission handed out by CircuitBreaker.allow_request(). Pass it back with
+    the call's outcome so the breaker can tell probes from ordinary calls and
+    ignore calls admitted before its last state change.
+    """
+
+    __slots__ = ("generation", "probe")
+
+    def __init__(self, generation: int, probe: bool):
+        self.generation = generation
+        self.probe = probe
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker driven by error rate and slow-call rate.
+
+    - closed: calls flow; outcomes are kept in a rolling window. The breaker
+      opens when the window's error rate or slow-call rate crosses its threshold.
+    - open: calls are rejected until ``reset_timeout`` has passed.
+    - half_open: up to ``half_open_max_calls`` probe calls are let through;
+      ``success_threshold`` successes close the breaker, any failure reopens it.
+
+    Outcomes reported with the permit from allow_request() only count while
+    the breaker is still in the state that admitted the call: a slow call
+    started before the breaker opened cannot close or reopen it later.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 5,
+        error_rate_threshold: float = 0.5,
+        slow_call_threshold: Optional[float] = None,
+        slow_call_rate_threshold: float = 0.8,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        success_threshold: int = 1
+    ):
+        """
+        Args:
+            window: Number of recent calls considered
+            min_calls: Calls needed in the window before the breaker can open
+            error_rate_threshold: Failure fraction that opens the breaker
+            slow_call_threshold: Seconds after which a successful call counts as slow (None to ignore latency)
+            slow_call_rate_threshold: Slow-call fraction that opens the breaker
+            reset_timeout: Seconds to stay open before probing
+            half_open_max_calls: Concurrent probe calls allowed while half-open
+            success_threshold: Probe successes needed to close again
+        """
+        self.window: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.success_threshold = success_threshold
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # Bumped on every state change; permits from an earlier generation are stale
+        self._generation = 0
+
+    def allow_request(self) -> Optional[BreakerPermit]:
+        """
+        Whether a call may be sent now; reserves a probe slot when half-open.
+
+        Returns:
+            A permit to pass to record_success/record_failure/release, or None if the call is rejected
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return None
+            self._set_state(self.HALF_OPEN)
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_max_calls:
+                return None
+            self._probes_in_flight += 1
+            return BreakerPermit(self._generation, probe=True)
+        return BreakerPermit(self._generation, probe=False)
+
+    def _is_probe(self, permit: Optional[BreakerPermit]) -> Optional[bool]:
+        """
+        Whether an outcome belongs to a probe call, or None if it should be ignored.
+        Without a permit the current state decides.
+        """
+        if permit is None:
+            return self.state == self.HALF_OPEN
+        if permit.generation != self._generation:
+            return None  # admitted before the breaker last changed state
+        return permit.probe
+
+    def record_success(self, latency: float, permit: Optional[BreakerPermit] = None) -> None:
+        probe = self._is_probe(permit)
+        if probe is None:
+            return
+        slow = self.slow_call_threshold is not None and latency > self.slow_call_threshold
+        if probe:
+            self._probes_in_flight -= 1
+            if slow:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.success_threshold:
+                self._set_state(self.CLOSED)
+                self.window.clear()
+            return
+        self.window.append((True, slow))
+        self._evaluate()
+
+    def release(self, permit: Optional[BreakerPermit] = None) -> None:
+        """Give back a probe slot for a call that ended without an outcome (e.g. cancelled)."""
+        if self._is_probe(permit) and self._probes_in_flight > 0:
+            self._probes_in_flight -= 1
+
+    def record_failure(self, permit: Optional[BreakerPermit] = None) -> None:
+        probe = self._is_probe(permit)
+        if probe is None:
+            return
+        if probe:
+            self._probes_in_flight -= 1
+            self._open()
+            return
+        self.window.append((False, False))
+        self._evaluate()
+
+    def _evaluate(self) -> None:
+        if self.state != self.CLOSED or len(self.window) < self.min_calls:
+            return
+        calls = len(self.window)
+        error_rate = sum(1 for ok, _ in self.window if not ok) / calls
+        slow_rate = sum(1 for _, slow in self.window if slow) / calls
+        if error_rate >= self.error_rate_threshold or (
+            self.slow_call_threshold is not None and slow_rate >= self.slow_call_rate_threshold
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self._set_state(self.OPEN)
+        self.opened_at = time.monotonic()
+        self.window.clear()
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self._generation += 1
+
+
+class FailoverPlugin(BasePlugin):
+    """
+    Sends each call to the first healthy plugin in an ordered list.
+
+    Every plugin has its own CircuitBreaker; a failing or slow provider is
+    skipped within milliseconds instead of being retried, and is tried again
+    once its breaker lets probe traffic through.
+
+    Wrapped plugins should use a short ResiliencePolicy (e.g. max_attempts=1)
+    so that failover, not retrying, handles outages.
+
+    Example usage:
+        plugin = FailoverPlugin([
+            OpenAIPlugin(api_key=openai_key, resilience=ResiliencePolicy(max_attempts=1)),
+            ClaudePlugin(api_key=anthropic_key, resilience=ResiliencePolicy(max_attempts=1)),
+        ])
+        chain = PromptChain([(plugin, "Summarize: {input}")])
+    """
+
+    def __init__(
+        self,
+        plugins: List[BasePlugin],
+        breaker_factory: Optional[Callable[[], CircuitBreaker]] = None,
+        probe_messages: Optional[List[Dict[str, str]]] = None
+    ):
+        """
+        Args:
+            plugins: Plugins in order of preference
+            breaker_factory: Callable returning a new CircuitBreaker (defaults to CircuitBreaker)
+            probe_messages: Messages sent by probe() to check recovering providers
+        """
+        if not plugins:
+            raise ValueError("FailoverPlugin needs at least one plugin")
+        self.plugins = plugins
+        factory = breaker_factory or CircuitBreaker
+        self.breakers = [factory() for _ in plugins]
+        self.probe_messages = probe_messages or [{"role": "user", "content": "ping"}]
+
+    @property
+    def model(self) -> Optional[str]:
+        return get_model_name(self.plugins[0])
+
+    @staticmethod
+    def _plugin_name(plugin: Any, idx: int) -> str:
+        return getattr(plugin, "name", None) or f"{type(plugin).__name__}[{idx}]"
+
+    def health(self) -> Dict[str, str]:
+        """Breaker state for each plugin."""
+        return {
+            self._plugin_name(plugin, idx): breaker.state
+            for idx, (plugin, breaker) in enumerate(zip(self.plugins, self.breakers))
+        }
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        last_error: Optional[Exception] = None
+        for idx, (plugin, breaker) in enumerate(zip(self.plugins, self.breakers)):
+            permit = breaker.allow_request()
+            if permit is None:
+                continue
+            start = time.perf_counter()
+            try:
+                response = await plugin.generate_response(
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    tools=tools
+                )
+            except asyncio.CancelledError:
+                breaker.release(permit)
+                raise
+            except Exception as e:
+                breaker.record_failure(permit)
+                last_error = e
+                logger.warning(f"Failing over from {self._plugin_name(plugin, idx)}: {e}")
+                continue
+            breaker.record_success(time.perf_counter() - start, permit)
+            response["served_by"] = self._plugin_name(plugin, idx)
+            return response
+
+        raise CircuitOpenError(f"No healthy plugin available (last error: {last_error})")
+
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[StreamChunk]:
+        """Stream from the first healthy plugin; fails over only before the first chunk arrives."""
+        last_error: Optional[Exception] = None
+        for idx, (plugin, breaker) in enumerate(zip(self.plugins, self.breakers)):
+            permit = breaker.allow_request()
+            if permit is None:
+                continue
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in plugin.generate_stream(
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    tools=tools
+                ):
+                    started = True
+                    yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release(permit)
+                raise
+            except Exception as e:
+                breaker.record_failure(permit)
+                if started:
+                    raise
+                last_error = e
+                logger.warning(f"Failing over from {self._plugin_name(plugin, idx)}: {e}")
+                continue
+            breaker.record_success(time.perf_counter() - start, permit)
+            return
+
+        raise CircuitOpenError(f"No healthy plugin available (last error: {last_error})")
+
+    async def probe(self) -> Dict[str, str]:
+        """
+        Send a small probe request to every plugin whose breaker is ready to
+        half-open, so recovered providers close their breaker without waiting
+        for live traffic.
+
+        Returns:
+            Breaker state for each plugin after probing
+        """
+        for plugin, breaker in zip(self.plugins, self.breakers):
+            if breaker.state == CircuitBreaker.CLOSED:
+                continue
+            permit = breaker.allow_request()
+            if permit is None:
+                continue
+            start = time.perf_counter()
+            try:
+                await plugin.generate_response(messages=self.probe_messages, max_tokens=1)
+            except Exception:
+                breaker.record_failure(permit)
+            except BaseException:
+                # Cancelled mid-probe: give the half-open slot back
+                breaker.release(permit)
+                raise
+            else:
+                breaker.record_success(time.perf_counter() - start, permit)
+        return self.health()
@@ -1,15 +1,31 @@
 from typing import Dict, Any, Optional, List
-from tenacity import retry, stop_after_attempt, wait_exponential
-import requests
+from .base import BasePlugin
+from .resilience import ResiliencePolicy, resilient
+from .transport import AsyncHTTPTransport, HTTPTransportConfig, get_shared_transport
 
-class GoogleGeminiPlugin:
-    def __init__(self, api_key: str, model: Optional[str] = None):
+class GoogleGeminiPlugin(BasePlugin):
+    def __init__(
+        self,
+        api_key: str,
+        model: Optional[str] = None,
+        transport: Optional[AsyncHTTPTransport] = None,
+        transport_config: Optional[HTTPTransportConfig] = None,
+        resilience: Optional[ResiliencePolicy] = None
+    ):
         self.api_key = api_key
         self.model = model or "gemini-1"
         self.base_url = "https://gemini.googleapis.com/v1"
+        self.transport = transport or get_shared_transport(transport_config)
+        self.resilience = resilience or ResiliencePolicy()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def generate_response(self, messages: List[Dict[str, str]], temperature: float = 0.7, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+    @resilient
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
         try:
             headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
             payload = {
@@ -18,12 +34,14 @@ class GoogleGeminiPlugin:
                 "temperature": temperature,
                 "max_tokens": max_tokens or 512
             }
-            response = requests.post(f"{self.base_url}/generate", headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
+
+            if tools:
+                payload["tools"] = tools
+
+            data = await self.transport.post_json(f"{self.base_url}/generate", payload, headers=headers)
             return {
                 "content": data["choices"][0]["message"]["content"],
                 "usage": data.get("usage", {})
             }
         except Exception as e:
-            raise RuntimeError(f"Google Gemini API error: {e}")
\ No newline at end of file
+            raise RuntimeError(f"Google Gemini API error: {e}")
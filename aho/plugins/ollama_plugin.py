@@ -1,26 +1,204 @@
-from typing import Dict, Any, Optional, List, AsyncGenerator
+from typing import Dict, Any, Optional, List, AsyncGenerator, Tuple, Union
 from pydantic import BaseModel, Field, ValidationError
 from ollama import AsyncClient
-from tenacity import retry, stop_after_attempt, wait_exponential
 from pathlib import Path
+import asyncio
+import json
+import time
 import yaml
-from .base import BasePlugin
+from .base import BasePlugin, StreamChunk
 
 class OllamaConfig(BaseModel):
     base_url: str = Field("http://localhost:11434", description="Ollama server URL")
+    hosts: List[str] = Field(
+        default_factory=list, description="Pool of Ollama server URLs to balance across (overrides base_url)"
+    )
     model: str = Field("llama2", description="Default model to use")
     temperature: float = Field(0.7, ge=0.0, le=1.0)
     num_ctx: int = Field(4096, description="Context window size")
     system: Optional[str] = Field(None, description="System prompt")
     template_name: Optional[str] = Field(None, description="Registered template to use")
     timeout: int = Field(30, description="Request timeout in seconds")
+    keep_alive: Optional[Union[str, float]] = Field(
+        "30m", description="How long the server keeps the model loaded after a request (e.g. '30m', -1 for forever)"
+    )
+    num_parallel: int = Field(
+        4, ge=1, description="Parallel slots per server (OLLAMA_NUM_PARALLEL); extra requests queue client-side"
+    )
+    max_host_failures: int = Field(
+        3, ge=1, description="Consecutive failures after which a host is drained until its next health check"
+    )
+
+
+def _seconds(nanoseconds: Optional[int]) -> float:
+    return (nanoseconds or 0) / 1e9
+
+
+def _model_tag(model: str) -> str:
+    """Name a model the way the server lists it: 'llama2' is served as 'llama2:latest'"""
+    return model if ":" in model.rsplit("/", 1)[-1] else f"{model}:latest"
+
+
+class OllamaHost:
+    """One Ollama server in the pool, with its slots and what it is known to serve"""
+
+    def __init__(self, url: str, num_parallel: int):
+        self.url = url
+        self.client = AsyncClient(host=url)
+        self.slots = asyncio.Semaphore(num_parallel)
+        self.queued = 0
+        self.active = 0
+        self.healthy = True
+        self.failures = 0
+        # None until the first health check: assume the host may serve any model
+        self.models: Optional[set] = None
+        self.loaded: set = set()
+
+    @property
+    def outstanding(self) -> int:
+        return self.queued + self.active
+
+    def serves(self, model: str) -> bool:
+        return self.models is None or _model_tag(model) in self.models
+
+    def is_loaded(self, model: str) -> bool:
+        return _model_tag(model) in self.loaded
+
+    def record_success(self, model: str) -> None:
+        self.failures = 0
+        self.healthy = True
+        self.loaded.add(_model_tag(model))
+
+    def record_failure(self, max_failures: int) -> None:
+        self.failures += 1
+        if self.failures >= max_failures:
+            self.healthy = False
+
 
 class OllamaPlugin(BasePlugin):
     def __init__(self, config: Optional[Dict] = None):
         self.config = OllamaConfig(**(config or {}))
-        self.client = AsyncClient(host=self.config.base_url)
+        urls = self.config.hosts or [self.config.base_url]
+        self.hosts = [OllamaHost(url, self.config.num_parallel) for url in urls]
         self.templates = self._load_default_templates()
-        
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self) -> AsyncClient:
+        """Client for the first host; used for model management calls"""
+        return self.hosts[0].client
+
+    @client.setter
+    def client(self, client: AsyncClient) -> None:
+        self.hosts[0].client = client
+
+    @property
+    def queued(self) -> int:
+        return sum(host.queued for host in self.hosts)
+
+    @property
+    def active(self) -> int:
+        return sum(host.active for host in self.hosts)
+
+    def _select_host(self, model: str) -> OllamaHost:
+        """
+        Least-outstanding-requests choice among healthy hosts that serve the
+        model, preferring hosts where it is already loaded
+        """
+        candidates = [h for h in self.hosts if h.healthy and h.serves(model)]
+        if not candidates:
+            # Every host is drained; try them anyway rather than fail outright
+            candidates = [h for h in self.hosts if h.serves(model)] or self.hosts
+        return min(candidates, key=lambda h: (not h.is_loaded(model), h.outstanding))
+
+    async def _acquire_slot(self, model: str) -> Tuple[OllamaHost, float]:
+        """Pick a host and wait for one of its slots; returns the host and the time spent queued"""
+        host = self._select_host(model)
+        start = time.perf_counter()
+        host.queued += 1
+        try:
+            await host.slots.acquire()
+        finally:
+            host.queued -= 1
+        host.active += 1
+        return host, time.perf_counter() - start
+
+    def _release_slot(self, host: OllamaHost, model: str, error: Optional[BaseException] = None) -> None:
+        host.active -= 1
+        host.slots.release()
+        if error is None:
+            host.record_success(model)
+        elif not isinstance(error, (asyncio.CancelledError, ValidationError, GeneratorExit)):
+            host.record_failure(self.config.max_host_failures)
+
+    async def check_health(self) -> Dict[str, bool]:
+        """
+        Refresh every host's health, available models and loaded models.
+        Hosts that answer are put back into rotation; hosts that fail are drained.
+
+        Returns:
+            Health of each host by URL
+        """
+        async def check(host: OllamaHost) -> None:
+            try:
+                available = await host.client.list()
+                running = await host.client.ps()
+            except Exception:
+                host.healthy = False
+                return
+            host.models = {_model_tag(m.model) for m in available.models}
+            host.loaded = {_model_tag(m.model) for m in running.models}
+            host.healthy = True
+            host.failures = 0
+
+        await asyncio.gather(*(check(host) for host in self.hosts))
+        return {host.url: host.healthy for host in self.hosts}
+
+    def start_health_checks(self, interval: float = 30.0) -> None:
+        """Run check_health every ``interval`` seconds in the background until close()"""
+        async def loop() -> None:
+            while True:
+                await self.check_health()
+                await asyncio.sleep(interval)
+
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.ensure_future(loop())
+
+    async def preload(self, model: Optional[str] = None) -> float:
+        """
+        Load a model into server memory on every healthy host ahead of the first request.
+
+        Returns:
+            Longest time any server spent loading the model (0 if it was already resident)
+        """
+        model = model or self.config.model
+
+        async def load(host: OllamaHost) -> float:
+            response = await host.client.generate(
+                model=model,
+                prompt="",
+                keep_alive=self.config.keep_alive
+            )
+            host.loaded.add(_model_tag(model))
+            return _seconds(response.load_duration)
+
+        try:
+            hosts = [h for h in self.hosts if h.healthy and h.serves(model)] or self.hosts
+            return max(await asyncio.gather(*(load(host) for host in hosts)))
+        except Exception as e:
+            raise RuntimeError(f"Model preload failed: {str(e)}")
+
+    @staticmethod
+    def _timings(response: Any, queue_time: float) -> Dict[str, float]:
+        """Split server-reported durations into load, prompt and generation time"""
+        return {
+            "queue_time": queue_time,
+            "load_time": _seconds(response.load_duration),
+            "prompt_eval_time": _seconds(response.prompt_eval_duration),
+            "eval_time": _seconds(response.eval_duration),
+            "total_time": _seconds(response.total_duration)
+        }
+
     def _load_default_templates(self) -> Dict[str, str]:
         """Load built-in prompt templates"""
         return {
@@ -88,23 +266,51 @@ class OllamaPlugin(BasePlugin):
         variables = messages[-1].get("variables", {})
         return template.format(**variables)
 
-    async def generate_response(self, messages: List[Dict], **kwargs) -> Dict:
+    def _prepare_messages(self, messages: List[Dict]) -> List[Dict]:
+        """Apply the configured template, if any"""
+        if self.config.template_name:
+            content = self._apply_template(messages)
+            return [{"role": "user", "content": content}]
+        return messages
+
+    def _build_options(self, temperature: Optional[float], max_tokens: Optional[int]) -> Dict[str, Any]:
+        """Build per-request model options, falling back to the plugin config"""
+        options = {
+            "temperature": self.config.temperature if temperature is None else temperature,
+            "num_ctx": self.config.num_ctx
+        }
+        if max_tokens:
+            options["num_predict"] = max_tokens
+        return options
+
+    async def generate_response(
+        self,
+        messages: List[Dict],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> Dict:
         """Generate response with template support"""
         try:
-            # Apply template if specified
-            if self.config.template_name:
-                content = self._apply_template(messages)
-                messages = [{"role": "user", "content": content}]
+            if tools:
+                kwargs["tools"] = tools
+            kwargs.setdefault("keep_alive", self.config.keep_alive)
 
-            response = await self.client.chat(
-                model=self.config.model,
-                messages=messages,
-                options={
-                    "temperature": self.config.temperature,
-                    "num_ctx": self.config.num_ctx
-                },
-                **kwargs
-            )
+            host, queue_time = await self._acquire_slot(self.config.model)
+            error: Optional[BaseException] = None
+            try:
+                response = await host.client.chat(
+                    model=self.config.model,
+                    messages=self._prepare_messages(messages),
+                    options=self._build_options(temperature, max_tokens),
+                    **kwargs
+                )
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._release_slot(host, self.config.model, error)
             
             return {
                 "content": response.message.content,
@@ -112,20 +318,96 @@ class OllamaPlugin(BasePlugin):
                 "usage": {
                     "input_tokens": response.prompt_eval_count,
                     "output_tokens": response.eval_count
-                }
+                },
+                "timings": self._timings(response, queue_time),
+                "host": host.url
             }
         except ValidationError as e:
             raise ValueError(f"Invalid configuration: {str(e)}")
         except Exception as e:
             raise RuntimeError(f"Generation failed: {str(e)}")
 
+    async def generate_stream(
+        self,
+        messages: List[Dict],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        **kwargs
+    ) -> AsyncGenerator[StreamChunk, None]:
+        """Stream response chunks with template support"""
+        async for chunk in self._timed_stream(self._stream_chunks(messages, temperature, max_tokens, tools, **kwargs)):
+            yield chunk
+
+    async def _stream_chunks(
+        self,
+        messages: List[Dict],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]],
+        **kwargs
+    ) -> AsyncGenerator[StreamChunk, None]:
+        if tools:
+            kwargs["tools"] = tools
+        kwargs.setdefault("keep_alive", self.config.keep_alive)
+
+        host, queue_time = await self._acquire_slot(self.config.model)
+        error: Optional[BaseException] = None
+        try:
+            stream = await host.client.chat(
+                model=self.config.model,
+                messages=self._prepare_messages(messages),
+                options=self._build_options(temperature, max_tokens),
+                stream=True,
+                **kwargs
+            )
+            async for part in stream:
+                if part.message.content:
+                    yield StreamChunk(content=part.message.content)
+                for index, tool_call in enumerate(part.message.tool_calls or []):
+                    # Ollama emits complete tool calls rather than argument fragments
+                    yield StreamChunk(tool_call={
+                        "index": index,
+                        "id": None,
+                        "name": tool_call.function.name,
+                        "arguments": json.dumps(dict(tool_call.function.arguments))
+                    })
+                if part.done:
+                    yield StreamChunk(
+                        usage={
+                            "input_tokens": part.prompt_eval_count or 0,
+                            "output_tokens": part.eval_count or 0
+                        },
+                        finish_reason=part.done_reason,
+                        timings=self._timings(part, queue_time)
+                    )
+        except ValidationError as e:
+            error = e
+            raise ValueError(f"Invalid configuration: {str(e)}")
+        except Exception as e:
+            error = e
+            raise RuntimeError(f"Generation failed: {str(e)}")
+        except BaseException as e:
+            # Cancelled or closed early by the consumer
+            error = e
+            raise
+        finally:
+            self._release_slot(host, self.config.model, error)
+
     async def list_models(self) -> List[Dict]:
-        """List models with details"""
+        """List models with details, across every host in the pool"""
         try:
-            response = await self.client.list()
-            return [model.dict() for model in response.models]
+            responses = await asyncio.gather(*(host.client.list() for host in self.hosts))
+            models: Dict[str, Dict] = {}
+            for response in responses:
+                for model in response.models:
+                    models.setdefault(model.model, model.dict())
+            return list(models.values())
         except Exception as e:
             raise RuntimeError(f"Failed to list models: {str(e)}")
 
     async def close(self):
-        await self.client.close()
+        if self._health_task is not None:
+            self._health_task.cancel()
+        for host in self.hosts:
+            await host.client.close()
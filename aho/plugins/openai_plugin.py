@@ -1,32 +1,71 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 import openai
-from tenacity import retry, stop_after_attempt, wait_exponential
+from .base import BasePlugin, LLMResponse, StreamChunk, stable_prefix_layout
+from .resilience import ResiliencePolicy, resilient
+from .transport import HTTPTransportConfig, SharedClientMixin
 
-class OpenAIPlugin:
+def normalize_usage(usage: Any) -> Dict[str, int]:
+    """
+    Normalized usage from a Chat Completions usage object. Prompt-cache hits
+    are reported in ``cache_read_tokens`` (already included in prompt_tokens);
+    OpenAI does not report cache writes.
+    """
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+        "cache_read_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "cache_write_tokens": 0
+    }
+
+
+class OpenAIPlugin(SharedClientMixin, BasePlugin):
     """
     Plugin for interacting with OpenAI's API services.
     Handles API calls, retry logic, and response processing.
     """
     
-    def __init__(self, api_key: str, model: str = "gpt-4-turbo-preview"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4-turbo-preview",
+        client: Optional[openai.AsyncOpenAI] = None,
+        transport_config: Optional[HTTPTransportConfig] = None,
+        resilience: Optional[ResiliencePolicy] = None,
+        keep_raw: bool = False,
+        hoist_system_messages: bool = False
+    ):
         """
         Initialize OpenAI plugin.
         
         Args:
             api_key (str): OpenAI API key
             model (str): Model to use for completions (default: gpt-4-turbo-preview)
+            client (Optional[openai.AsyncOpenAI]): Explicit client to use instead of the shared one
+            transport_config (Optional[HTTPTransportConfig]): Connection pool and keep-alive settings
+                for the shared client
+            resilience (Optional[ResiliencePolicy]): Retry, deadline and hedging policy
+                (default: 3 attempts under the global retry budget)
+            keep_raw (bool): Keep the SDK response object on each LLMResponse
+            hoist_system_messages (bool): Move system messages from later in the conversation
+                up to the leading system prompt, for a longer cached prefix. This changes the
+                order the model reads them in (default: leave them in place)
         """
-        self.client = openai.OpenAI(api_key=api_key)
+        self._use_shared_client(client, openai.AsyncOpenAI, transport_config, api_key=api_key)
+        self.resilience = resilience or ResiliencePolicy()
         self.model = model
+        self.keep_raw = keep_raw
+        self.hoist_system_messages = hoist_system_messages
         
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @resilient
     async def generate_response(
         self, 
         messages: List[Dict[str, str]], 
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
         tools: Optional[List[Dict[str, Any]]] = None
-    ) -> Dict[str, Any]:
+    ) -> LLMResponse:
         """
         Generate a response using OpenAI's API.
         
@@ -37,28 +76,110 @@ class OpenAIPlugin:
             tools (Optional[List[Dict[str, Any]]]): List of tools available to the model
             
         Returns:
-            Dict[str, Any]: Response from the API
+            LLMResponse: Normalized response
         """
         try:
-            params = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": temperature,
-            }
-            
-            if max_tokens:
-                params["max_tokens"] = max_tokens
-                
-            if tools:
-                params["tools"] = tools
-            
+            params = self._build_params(messages, temperature, max_tokens, tools)
             response = await self.client.chat.completions.create(**params)
             return self._process_response(response)
             
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
+
+    async def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[StreamChunk]:
+        """
+        Stream a response from OpenAI's API as normalized delta chunks.
+        
+        Args:
+            messages (List[Dict[str, str]]): List of message dictionaries
+            temperature (float): Sampling temperature
+            max_tokens (Optional[int]): Maximum tokens to generate
+            tools (Optional[List[Dict[str, Any]]]): List of tools available to the model
             
-    def _process_response(self, response: Any) -> Dict[str, Any]:
+        Yields:
+            StreamChunk: Text and tool-call deltas, then a final chunk with usage and timing
+        """
+        async for chunk in self._timed_stream(self._stream_chunks(messages, temperature, max_tokens, tools)):
+            yield chunk
+
+    async def _stream_chunks(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]]
+    ) -> AsyncIterator[StreamChunk]:
+        try:
+            params = self._build_params(messages, temperature, max_tokens, tools)
+            params["stream"] = True
+            params["stream_options"] = {"include_usage": True}
+            stream = await self.client.chat.completions.create(**params)
+            async for chunk in stream:
+                for processed in self._process_chunk(chunk):
+                    yield processed
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+
+    def _build_params(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        tools: Optional[List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        # OpenAI caches long prompts by exact prefix: keep the system prompt and tools in a fixed order
+        messages, tools = stable_prefix_layout(messages, tools, self.hoist_system_messages)
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        
+        if max_tokens:
+            params["max_tokens"] = max_tokens
+            
+        if tools:
+            params["tools"] = tools
+            
+        return params
+
+    def _process_chunk(self, chunk: Any) -> List[StreamChunk]:
+        """
+        Convert one raw stream chunk into normalized delta chunks.
+        
+        Args:
+            chunk (Any): Raw stream chunk
+            
+        Returns:
+            List[StreamChunk]: Normalized chunks (possibly empty)
+        """
+        processed = []
+        if chunk.choices:
+            choice = chunk.choices[0]
+            delta = choice.delta
+            if delta.content:
+                processed.append(StreamChunk(content=delta.content))
+            for tool_call in delta.tool_calls or []:
+                processed.append(StreamChunk(tool_call={
+                    "index": tool_call.index,
+                    "id": tool_call.id,
+                    "name": tool_call.function.name if tool_call.function else None,
+                    "arguments": (tool_call.function.arguments if tool_call.function else None) or ""
+                }))
+            if choice.finish_reason:
+                processed.append(StreamChunk(finish_reason=choice.finish_reason))
+        usage = chunk.usage
+        if usage:
+            processed.append(StreamChunk(usage=normalize_usage(usage)))
+        return processed
+            
+    def _process_response(self, response: Any) -> LLMResponse:
         """
         Process the raw API response into a standardized format.
         
@@ -66,25 +187,19 @@ class OpenAIPlugin:
             response (Any): Raw API response
             
         Returns:
-            Dict[str, Any]: Processed response
+            LLMResponse: Processed response
         """
         try:
-            content = response.choices[0].message.content
-            tool_calls = response.choices[0].message.tool_calls if hasattr(response.choices[0].message, 'tool_calls') else None
-            
-            processed_response = {
-                "content": content,
-                "tool_calls": tool_calls,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                },
-                "model": response.model,
-                "raw_response": response
-            }
+            choice = response.choices[0]
             
-            return processed_response
+            return LLMResponse(
+                content=choice.message.content,
+                tool_calls=getattr(choice.message, "tool_calls", None),
+                finish_reason=choice.finish_reason,
+                usage=normalize_usage(response.usage),
+                model=response.model,
+                raw_response=response if self.keep_raw else None
+            )
             
         except Exception as e:
             raise Exception(f"Error processing OpenAI response: {str(e)}")
\ No newline at end of file
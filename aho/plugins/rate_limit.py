@@ -0,0 +1,238 @@
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import time
+from loguru import logger
+from .base import BasePlugin, PluginWrapper, unwrap_plugin, usage_total_tokens
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at ``per_minute`` units per minute.
+
+    The level may go negative when a settled cost exceeds what was reserved;
+    later callers then wait until the debt is paid off.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            per_minute: Refill rate in units per minute
+            capacity: Maximum burst size (defaults to one minute's worth)
+        """
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def set_rate(self, per_minute: float) -> None:
+        """Change the refill rate (and default capacity), keeping the current level."""
+        self._refill()
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = min(self.level, self.capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available."""
+        self._refill()
+        # A request larger than the bucket only waits for a full bucket
+        deficit = min(amount, self.capacity) - self.level
+        return max(0.0, deficit / self.rate)
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Async limiter enforcing requests-per-minute and tokens-per-minute.
+
+    Callers reserve an estimated token count before a call and settle the
+    actual count from the response ``usage`` afterwards. Waiting callers are
+    served in FIFO order.
+
+    Example usage:
+        limiter = RateLimiter(requests_per_minute=500, tokens_per_minute=90_000)
+        reserved = await limiter.acquire(estimated_tokens=1200)
+        response = await plugin.generate_response(messages)
+        limiter.settle(reserved, usage_total_tokens(response["usage"]))
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
+    ):
+        """
+        Args:
+            requests_per_minute: Request limit (None for unlimited)
+            tokens_per_minute: Token limit (None for unlimited)
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        self.total_wait = 0.0
+
+    def update(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None
+    ) -> None:
+        """Change the limits; a limit left as None keeps its current value."""
+        for attr, per_minute in (("requests", requests_per_minute), ("tokens", tokens_per_minute)):
+            if not per_minute:
+                continue
+            bucket = getattr(self, attr)
+            if bucket is None:
+                setattr(self, attr, TokenBucket(per_minute))
+            else:
+                bucket.set_rate(per_minute)
+
+    def _wait_time(self, estimated_tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(estimated_tokens))
+        return wait
+
+    async def acquire(self, estimated_tokens: int = 0) -> int:
+        """
+        Wait until a request with ``estimated_tokens`` fits both limits and
+        reserve it.
+
+        Returns:
+            The reserved token count, to pass to settle()
+        """
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            async with self._lock:
+                wait = self._wait_time(estimated_tokens)
+                while wait > 0:
+                    await asyncio.sleep(wait)
+                    wait = self._wait_time(estimated_tokens)
+                if self.requests is not None:
+                    self.requests.consume(1)
+                if self.tokens is not None:
+                    self.tokens.consume(estimated_tokens)
+        finally:
+            self.waiting -= 1
+            self.total_wait += time.monotonic() - start
+        return estimated_tokens
+
+    def settle(self, reserved_tokens: int, actual_tokens: int) -> None:
+        """Correct a reservation once the actual token count is known."""
+        if self.tokens is None:
+            return
+        if actual_tokens > reserved_tokens:
+            self.tokens.consume(actual_tokens - reserved_tokens)
+        else:
+            self.tokens.refund(reserved_tokens - actual_tokens)
+
+
+_limiters: Dict[Tuple[str, Optional[str]], RateLimiter] = {}
+
+
+def get_rate_limiter(
+    provider: str,
+    model: Optional[str],
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None
+) -> RateLimiter:
+    """
+    Return the process-wide limiter for a provider and model, creating it with
+    the given limits on first use. Limits given later update the shared
+    limiter; limits left as None keep whatever it already enforces.
+    """
+    key = (provider, model)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        _limiters[key] = limiter
+        return limiter
+
+    for label, bucket, given in (
+        ("requests_per_minute", limiter.requests, requests_per_minute),
+        ("tokens_per_minute", limiter.tokens, tokens_per_minute),
+    ):
+        existing = bucket.per_minute if bucket is not None else None
+        if given and given != existing:
+            logger.info(f"Rate limit for {provider}/{model} changed: {label} {existing} -> {given}")
+    limiter.update(requests_per_minute, tokens_per_minute)
+    return limiter
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: Optional[int], default_completion_tokens: int = 256) -> int:
+    """Rough token estimate for a request: ~4 characters per prompt token plus the output budget."""
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+    return prompt_chars // 4 + (max_tokens or default_completion_tokens)
+
+
+class RateLimitedPlugin(PluginWrapper):
+    """
+    Wraps a plugin so that calls queue on a per-provider, per-model
+    RateLimiter instead of running into 429 responses.
+
+    Plugins for the same provider and model share one limiter unless an
+    explicit limiter is passed.
+
+    Example usage:
+        plugin = RateLimitedPlugin(OpenAIPlugin(api_key=key), requests_per_minute=500,
+                                   tokens_per_minute=90_000)
+    """
+
+    def __init__(
+        self,
+        plugin: BasePlugin,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        limiter: Optional[RateLimiter] = None,
+        default_completion_tokens: int = 256
+    ):
+        """
+        Args:
+            plugin: The plugin to wrap
+            requests_per_minute: Request limit for this provider and model
+            tokens_per_minute: Token limit for this provider and model
+            limiter: Explicit limiter (overrides the shared one)
+            default_completion_tokens: Output estimate used when max_tokens is not set
+        """
+        super().__init__(plugin)
+        # Keyed on the provider plugin, so wrapping it in a cache or another
+        # wrapper first still shares the provider's limit
+        self.limiter = limiter or get_rate_limiter(
+            type(unwrap_plugin(plugin)).__name__, self.model, requests_per_minute, tokens_per_minute
+        )
+        self.default_completion_tokens = default_completion_tokens
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        reserved = await self.limiter.acquire(
+            estimate_tokens(messages, max_tokens, self.default_completion_tokens)
+        )
+        try:
+            response = await super().generate_response(messages, temperature, max_tokens, tools)
+        except BaseException:
+            # Also on cancellation (a losing hedge, a first_k or deadline cut-off)
+            self.limiter.settle(reserved, 0)
+            raise
+        self.limiter.settle(reserved, usage_total_tokens(response.get("usage")) or reserved)
+        return response
@@ -0,0 +1,234 @@
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+import asyncio
+import json
+import math
+import random
+import time
+from .base import BasePlugin, LLMResponse, PluginWrapper, get_model_name
+from .cache import _to_jsonable, make_request_key
+
+# A latency distribution draws a delay in seconds from the plugin's RNG;
+# it also receives the latency recorded with the response, if any.
+LatencyDistribution = Callable[[random.Random, Optional[float]], float]
+
+
+def constant(seconds: float) -> LatencyDistribution:
+    """Always the same delay."""
+    return lambda rng, recorded: seconds
+
+
+def uniform(low: float, high: float) -> LatencyDistribution:
+    """Delay drawn uniformly from [low, high]."""
+    return lambda rng, recorded: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5) -> LatencyDistribution:
+    """Long-tailed delay typical of LLM APIs: ``median`` seconds, spread ``sigma``."""
+    return lambda rng, recorded: rng.lognormvariate(math.log(median), sigma)
+
+
+def recorded(scale: float = 1.0, default: float = 0.0) -> LatencyDistribution:
+    """The latency captured with each response, scaled (``default`` when none was captured)."""
+    return lambda rng, seconds: (seconds if seconds is not None else default) * scale
+
+
+class CassetteMissError(LookupError):
+    """Raised when a ReplayPlugin has no recorded response for a request."""
+
+
+class InjectedError(RuntimeError):
+    """Default error raised by a ReplayPlugin's error injection."""
+
+
+class Cassette:
+    """
+    Recorded plugin responses, keyed by the request they answered.
+
+    Saved as a JSON file so cassettes can be checked into a repository and
+    replayed on CI machines without network access.
+
+    Example usage:
+        cassette = Cassette.load("tests/cassettes/summarize.json")
+    """
+
+    VERSION = 1
+
+    def __init__(self, entries: Optional[Dict[str, List[Dict[str, Any]]]] = None, model: Optional[str] = None):
+        self.entries: Dict[str, List[Dict[str, Any]]] = entries or {}
+        self.model = model
+        self._positions: Dict[str, int] = {}
+        self._next = 0
+        self._order: List[str] = [key for key, responses in self.entries.items() for _ in responses]
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Cassette":
+        with open(Path(path).expanduser(), encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("entries", {}), data.get("model"))
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "model": self.model, "entries": self.entries}, f, indent=2, ensure_ascii=False)
+
+    def record(self, key: str, response: Any, latency: Optional[float] = None) -> None:
+        """Add a response; raw SDK payloads are dropped."""
+        if hasattr(response, "to_dict"):
+            response = response.to_dict()
+        response = {k: v for k, v in dict(response).items() if k != "raw_response"}
+        self.entries.setdefault(key, []).append({"response": _to_jsonable(response), "latency": latency})
+        self._order.append(key)
+
+    def play(self, key: str) -> Optional[Dict[str, Any]]:
+        """Next recorded entry for a key, cycling through repeats; None when unknown."""
+        responses = self.entries.get(key)
+        if not responses:
+            return None
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        return responses[position % len(responses)]
+
+    def play_next(self) -> Optional[Dict[str, Any]]:
+        """Next entry in recording order, ignoring the request (cycles at the end)."""
+        if not self._order:
+            return None
+        key = self._order[self._next % len(self._order)]
+        self._next += 1
+        return self.play(key)
+
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self.entries.values())
+
+
+class ReplayPlugin(BasePlugin):
+    """
+    Serves responses from a Cassette with simulated latency and errors, for
+    deterministic offline benchmarks and regression tests.
+
+    Example usage:
+        plugin = ReplayPlugin(
+            Cassette.load("cassettes/chain.json"),
+            latency=lognormal(median=0.8, sigma=0.4),
+            error_rate=0.02,
+            seed=7
+        )
+        chain = PromptChain([(plugin, "Summarize: {input}"), (plugin, "Translate: {input}")])
+    """
+
+    def __init__(
+        self,
+        cassette: Optional[Cassette] = None,
+        latency: Optional[LatencyDistribution] = None,
+        error_rate: float = 0.0,
+        error_factory: Optional[Callable[[], Exception]] = None,
+        seed: Optional[int] = None,
+        model: Optional[str] = None,
+        match: str = "exact",
+        name: Optional[str] = None
+    ):
+        """
+        Args:
+            cassette: Recorded responses (an empty cassette echoes the last message)
+            latency: Delay distribution (defaults to the recorded latency)
+            error_rate: Fraction of calls that raise instead of answering
+            error_factory: Builds the injected exception (defaults to InjectedError)
+            seed: RNG seed, for repeatable latencies and errors
+            model: Model name the requests were recorded with (defaults to the cassette's)
+            match: "exact" to match on the full request, "sequential" to replay in recording order
+            name: Name reported in responses, metrics and traces
+        """
+        if match not in ("exact", "sequential"):
+            raise ValueError(f"Unknown match mode: {match}")
+        self.cassette = cassette if cassette is not None else Cassette()
+        self.latency = latency or recorded()
+        self.error_rate = error_rate
+        self.error_factory = error_factory or (lambda: InjectedError("Injected replay error"))
+        self.rng = random.Random(seed)
+        self.model = model or self.cassette.model
+        self.match = match
+        if name is not None:
+            self.name = name
+        self.calls = 0
+        self.errors = 0
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> LLMResponse:
+        self.calls += 1
+        if not len(self.cassette):
+            entry = {"response": {"content": messages[-1].get("content", "") if messages else ""}, "latency": None}
+        elif self.match == "sequential":
+            entry = self.cassette.play_next()
+        else:
+            entry = self.cassette.play(make_request_key(self.model, messages, temperature, max_tokens, tools))
+            if entry is None:
+                raise CassetteMissError("No recorded response for this request")
+
+        # Draw latency before the error so the RNG sequence does not depend on outcomes
+        delay = max(0.0, self.latency(self.rng, entry.get("latency")))
+        failed = self.error_rate > 0 and self.rng.random() < self.error_rate
+        if delay:
+            await asyncio.sleep(delay)
+        if failed:
+            self.errors += 1
+            raise self.error_factory()
+
+        return LLMResponse(**entry["response"])
+
+
+class RecordingPlugin(PluginWrapper):
+    """
+    Wraps a live plugin and records every response (and its latency) into a
+    Cassette for later replay.
+
+    Example usage:
+        recorder = RecordingPlugin(OpenAIPlugin(api_key=key), path="cassettes/chain.json")
+        await PromptChain([(recorder, "Summarize: {input}")]).run(text)
+        recorder.save()
+    """
+
+    def __init__(
+        self,
+        plugin: BasePlugin,
+        cassette: Optional[Cassette] = None,
+        path: Optional[Union[str, Path]] = None
+    ):
+        """
+        Args:
+            plugin: The plugin to record
+            cassette: Cassette to add to (defaults to the one at ``path`` if it exists, else empty)
+            path: Where save() writes the cassette
+        """
+        super().__init__(plugin)
+        self.path = Path(path).expanduser() if path is not None else None
+        if cassette is None:
+            cassette = Cassette.load(self.path) if self.path is not None and self.path.exists() else Cassette()
+        if cassette.model is None:
+            cassette.model = get_model_name(plugin)
+        self.cassette = cassette
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        start = time.perf_counter()
+        response = await super().generate_response(messages, temperature, max_tokens, tools)
+        key = make_request_key(get_model_name(self.plugin), messages, temperature, max_tokens, tools)
+        self.cassette.record(key, response, time.perf_counter() - start)
+        return response
+
+    def save(self, path: Optional[Union[str, Path]] = None) -> None:
+        """Write the cassette to ``path`` (or the path given at construction)."""
+        target = path or self.path
+        if target is None:
+            raise ValueError("No cassette path given")
+        self.cassette.save(target)
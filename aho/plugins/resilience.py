@@ -0,0 +1,245 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+import asyncio
+import functools
+import random
+import time
+from loguru import logger
+from ..utils.metrics import METRICS
+from ..utils.tracing import current_span
+from .base import BasePlugin, PluginWrapper, get_plugin_name
+
+T = TypeVar("T")
+
+
+class RetryBudget:
+    """
+    Caps retries (and hedged requests) at a fraction of overall traffic.
+
+    Every first attempt deposits ``ratio`` tokens and every retry withdraws one,
+    so across all policies sharing the budget retries cannot exceed roughly
+    ``ratio`` of requests. ``min_retries`` tokens are always available so that
+    low traffic can still retry.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, max_balance: Optional[float] = None):
+        """
+        Args:
+            ratio: Retries allowed per request (0.2 = 20% of traffic)
+            min_retries: Retries always allowed, regardless of traffic
+            max_balance: Cap on saved-up retries (defaults to 10x min_retries)
+        """
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.max_balance = max_balance if max_balance is not None else 10 * max(min_retries, 1)
+        self.balance = float(min_retries)
+        self.exhausted = 0
+
+    def record_request(self) -> None:
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Take one retry from the budget; False when it is exhausted."""
+        if self.balance >= 1:
+            self.balance -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+# Shared by every policy that is not given its own budget
+GLOBAL_RETRY_BUDGET = RetryBudget()
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th quantile (0-1) of the window, or None when empty."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResiliencePolicy:
+    """
+    Retry, deadline and hedging policy for plugin calls.
+
+    - Each attempt runs under ``attempt_timeout``.
+    - Failed attempts are retried up to ``max_attempts`` with short jittered
+      exponential backoff, as long as the retry budget allows.
+    - With ``hedge=True``, a backup request is fired once the primary has run
+      longer than the rolling ``hedge_percentile`` latency; whichever finishes
+      first wins and the other is cancelled.
+
+    Example usage:
+        policy = ResiliencePolicy(hedge=True, attempt_timeout=20)
+        plugin = OpenAIPlugin(api_key=key, resilience=policy)
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        attempt_timeout: Optional[float] = 60.0,
+        backoff_base: float = 0.25,
+        backoff_max: float = 2.0,
+        retry_budget: Optional[RetryBudget] = None,
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        latency_window: int = 200
+    ):
+        """
+        Args:
+            max_attempts: Attempts per call, including the first
+            attempt_timeout: Deadline in seconds for each attempt (None for no deadline)
+            backoff_base: First retry delay in seconds, doubled on each retry
+            backoff_max: Longest retry delay in seconds
+            retry_budget: Budget shared with other policies (defaults to GLOBAL_RETRY_BUDGET)
+            hedge: Fire a backup request for slow primaries
+            hedge_percentile: Latency quantile after which a backup is fired
+            hedge_min_samples: Latency samples needed before hedging starts
+            latency_window: Number of recent latencies kept
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.attempt_timeout = attempt_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget if retry_budget is not None else GLOBAL_RETRY_BUDGET
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker(latency_window)
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency.samples) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def _backoff(self, retry: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (retry - 1)))
+        return random.uniform(delay / 2, delay)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], label: Optional[str] = None) -> T:
+        """
+        Run ``fn`` under the policy.
+
+        Args:
+            fn: Zero-argument callable returning a fresh awaitable per attempt
+            label: Name retries are counted under in metrics
+
+        Raises:
+            The last attempt's exception when every attempt fails
+        """
+        self.retry_budget.record_request()
+        attempt = 1
+        while True:
+            try:
+                return await self._attempt(fn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt >= self.max_attempts or not self.retry_budget.try_withdraw():
+                    raise
+                self.retries += 1
+                if METRICS.enabled:
+                    METRICS.plugin_retries.inc(plugin=label or "")
+                current_span().add("retries")
+                logger.debug(f"Retrying after attempt {attempt} failed: {e}")
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        start = time.perf_counter()
+        if self.attempt_timeout is None:
+            result = await self._hedged(fn)
+        else:
+            result = await asyncio.wait_for(self._hedged(fn), self.attempt_timeout)
+        self.latency.record(time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        delay = self._hedge_delay()
+        if delay is None:
+            return await fn()
+
+        primary = asyncio.ensure_future(fn())
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or not self.retry_budget.try_withdraw():
+                return await primary
+
+            self.hedges += 1
+            current_span().add("hedges")
+            backup = asyncio.ensure_future(fn())
+            pending.add(backup)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def resilient(method: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+    """
+    Decorator for plugin methods: runs the call under ``self.resilience``,
+    creating a default ResiliencePolicy the first time it is needed.
+    Call metrics and trace spans come from BasePlugin; retries are counted
+    under the plugin's name when metrics are enabled.
+    """
+    @functools.wraps(method)
+    async def wrapper(self: Any, *args: Any, **kwargs: Any) -> T:
+        policy = getattr(self, "resilience", None)
+        if policy is None:
+            policy = self.resilience = ResiliencePolicy()
+        label = get_plugin_name(self) if METRICS.enabled else None
+        return await policy.call(lambda: method(self, *args, **kwargs), label)
+    return wrapper
+
+
+class ResilientPlugin(PluginWrapper):
+    """
+    Applies a ResiliencePolicy to any plugin, for plugins that do not take a
+    ``resilience`` argument themselves.
+
+    Example usage:
+        plugin = ResilientPlugin(OllamaPlugin(), ResiliencePolicy(hedge=True))
+    """
+
+    def __init__(self, plugin: BasePlugin, policy: Optional[ResiliencePolicy] = None):
+        """
+        Args:
+            plugin: The plugin to wrap
+            policy: Policy to apply (defaults to ResiliencePolicy())
+        """
+        super().__init__(plugin)
+        self.resilience = policy or ResiliencePolicy()
+
+    @resilient
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        return await super().generate_response(messages, temperature, max_tokens, tools)
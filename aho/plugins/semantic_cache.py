@@ -0,0 +1,239 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import inspect
+import numpy as np
+from .base import BasePlugin, PluginWrapper
+from .cache import make_request_key
+
+
+class _Namespace:
+    """FAISS index plus LRU bookkeeping for one isolated cache namespace."""
+
+    def __init__(self, faiss: Any, dimension: int):
+        # Inner product over L2-normalized vectors is cosine similarity.
+        # IDMap2 keeps ids stable across removals, which eviction relies on.
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.false_hits = 0
+
+
+class SemanticCache:
+    """
+    Embedding-similarity cache for LLM responses.
+
+    Stores one FAISS inner-product index per namespace and returns a cached
+    response when a new prompt's embedding is within ``threshold`` cosine
+    similarity of a stored one. Each namespace holds at most ``capacity``
+    entries; the least recently used entry is evicted first.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 384,
+        threshold: float = 0.92,
+        capacity: int = 1000,
+        search_k: int = 4,
+        verifier: Optional[Callable[[str, str], bool]] = None
+    ):
+        """
+        Args:
+            dimension: Embedding dimension
+            threshold: Minimum cosine similarity for a hit
+            capacity: Maximum entries per namespace
+            search_k: Neighbours searched first per lookup, and the most candidates
+                      with a matching context the verifier examines
+            verifier: Optional check (new_prompt, cached_prompt) -> bool; rejected
+                      candidates count as false hits and fall through to a miss
+        """
+        try:
+            import faiss
+        except ImportError as e:
+            raise ImportError("SemanticCache requires faiss: pip install 'aho[vector]'") from e
+        self._faiss = faiss
+        self.dimension = dimension
+        self.threshold = threshold
+        self.capacity = capacity
+        self.search_k = search_k
+        self.verifier = verifier
+        self._namespaces: Dict[str, _Namespace] = {}
+
+    def _namespace(self, name: str) -> _Namespace:
+        namespace = self._namespaces.get(name)
+        if namespace is None:
+            namespace = _Namespace(self._faiss, self.dimension)
+            self._namespaces[name] = namespace
+        return namespace
+
+    def _normalize(self, embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        if vector.shape[1] != self.dimension:
+            raise ValueError(f"Expected embedding of dimension {self.dimension}, got {vector.shape[1]}")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self,
+        embedding: Any,
+        prompt: str,
+        namespace: str = "default",
+        context_key: Optional[str] = None
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Find the closest stored response above the similarity threshold.
+
+        Args:
+            embedding: Embedding of the incoming prompt
+            prompt: The incoming prompt text (passed to the verifier)
+            namespace: Namespace to search
+            context_key: Only entries stored with the same key can match
+
+        Returns:
+            (response, similarity) on a hit, otherwise None
+        """
+        ns = self._namespace(namespace)
+        candidates = 0
+        for similarity, entry_id in self._neighbours(ns, self._normalize(embedding)):
+            if similarity < self.threshold:
+                break
+            entry = ns.entries[entry_id]
+            if entry["context_key"] != context_key:
+                continue
+            candidates += 1
+            if self.verifier is not None and not self.verifier(prompt, entry["prompt"]):
+                ns.false_hits += 1
+                if candidates >= self.search_k:
+                    break
+                continue
+            ns.entries.move_to_end(entry_id)
+            ns.hits += 1
+            return entry["response"].copy(), similarity
+
+        ns.misses += 1
+        return None
+
+    def _neighbours(self, ns: _Namespace, query: np.ndarray) -> Iterator[Tuple[float, int]]:
+        """
+        (similarity, entry id) from most to least similar. The search widens as
+        results are consumed, so entries stored under other context keys
+        cannot crowd out a match.
+        """
+        k, start = min(self.search_k, ns.index.ntotal), 0
+        while start < k:
+            similarities, ids = ns.index.search(query, k)
+            for similarity, entry_id in zip(similarities[0][start:], ids[0][start:]):
+                if entry_id >= 0:
+                    yield float(similarity), int(entry_id)
+            start, k = k, min(2 * k, ns.index.ntotal)
+
+    def store(
+        self,
+        embedding: Any,
+        prompt: str,
+        response: Dict[str, Any],
+        namespace: str = "default",
+        context_key: Optional[str] = None
+    ) -> None:
+        """Add a response to a namespace, evicting the least recently used entry when full."""
+        ns = self._namespace(namespace)
+        entry_id = ns.next_id
+        ns.next_id += 1
+        ns.index.add_with_ids(self._normalize(embedding), np.array([entry_id], dtype=np.int64))
+        ns.entries[entry_id] = {"prompt": prompt, "response": response.copy(), "context_key": context_key}
+
+        while len(ns.entries) > self.capacity:
+            evicted_id, _ = ns.entries.popitem(last=False)
+            ns.index.remove_ids(np.array([evicted_id], dtype=np.int64))
+
+    def report_false_hit(self, namespace: str = "default") -> None:
+        """Record a hit that turned out to be wrong (e.g. from user feedback)."""
+        self._namespace(namespace).false_hits += 1
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Drop one namespace, or all of them."""
+        if namespace is None:
+            self._namespaces.clear()
+        else:
+            self._namespaces.pop(namespace, None)
+
+    def stats(self, namespace: Optional[str] = None) -> Dict[str, int]:
+        """Hit, miss, false-hit and size counters for one namespace or all combined."""
+        namespaces = (
+            [self._namespaces[namespace]] if namespace in self._namespaces
+            else [] if namespace is not None
+            else list(self._namespaces.values())
+        )
+        return {
+            "hits": sum(ns.hits for ns in namespaces),
+            "misses": sum(ns.misses for ns in namespaces),
+            "false_hits": sum(ns.false_hits for ns in namespaces),
+            "size": sum(len(ns.entries) for ns in namespaces),
+        }
+
+
+class SemanticCachePlugin(PluginWrapper):
+    """
+    Wraps a plugin so that paraphrased repeats of earlier prompts are served
+    from a SemanticCache.
+
+    Only the last message is matched by similarity; everything before it
+    (system prompt, history), the model, temperature, max_tokens and tool schemas must match
+    exactly.
+
+    Example usage:
+        model = SentenceTransformer("all-MiniLM-L6-v2")
+        plugin = SemanticCachePlugin(openai_plugin, model.encode, SemanticCache(dimension=384))
+    """
+
+    def __init__(
+        self,
+        plugin: BasePlugin,
+        embedding_fn: Callable[[str], Any],
+        cache: Optional[SemanticCache] = None,
+        namespace: str = "default"
+    ):
+        """
+        Args:
+            plugin: The plugin to wrap
+            embedding_fn: Callable (sync or async) returning an embedding for a text
+            cache: Cache to use (defaults to a SemanticCache with default settings)
+            namespace: Namespace isolating this plugin's entries from other users of the cache
+        """
+        super().__init__(plugin)
+        self.embedding_fn = embedding_fn
+        self.cache = cache if cache is not None else SemanticCache()
+        self.namespace = namespace
+
+    async def _embed(self, text: str) -> Any:
+        embedding = self.embedding_fn(text)
+        if inspect.isawaitable(embedding):
+            embedding = await embedding
+        return embedding
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        if not messages:
+            return await super().generate_response(messages, temperature, max_tokens, tools)
+
+        prompt = messages[-1].get("content") or ""
+        # Everything but the last message, plus the generation settings, must match exactly
+        context_key = make_request_key(self.model, messages[:-1], temperature, max_tokens, tools)
+        embedding = await self._embed(prompt)
+
+        hit = self.cache.lookup(embedding, prompt, self.namespace, context_key)
+        if hit is not None:
+            response, similarity = hit
+            response["cache_hit"] = True
+            response["cache_similarity"] = similarity
+            return response
+
+        response = await super().generate_response(messages, temperature, max_tokens, tools)
+        self.cache.store(embedding, prompt, response, self.namespace, context_key)
+        return response
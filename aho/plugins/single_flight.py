@@ -0,0 +1,60 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+from .base import BasePlugin, PluginWrapper
+from .cache import make_request_key
+
+
+class SingleFlightPlugin(PluginWrapper):
+    """
+    Wraps a plugin so that identical requests issued while one is already in
+    flight share its result instead of going out again.
+
+    The first caller starts the request; later callers with the same key
+    await the same task and receive the same response (or exception).
+    Nothing is kept once the request completes; combine with CachedPlugin to
+    also reuse finished responses.
+
+    Example usage:
+        plugin = SingleFlightPlugin(OpenAIPlugin(api_key=key))
+        results = await asyncio.gather(*[plugin.generate_response(messages) for _ in range(20)])
+    """
+
+    def __init__(self, plugin: BasePlugin):
+        """
+        Args:
+            plugin: The plugin to wrap
+        """
+        super().__init__(plugin)
+        self._in_flight: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+        self.requests = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct requests currently outstanding."""
+        return len(self._in_flight)
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        key = make_request_key(self.model, messages, temperature, max_tokens, tools)
+        task = self._in_flight.get(key)
+        if task is None:
+            self.requests += 1
+            # Run the call in its own task so that cancelling the first caller
+            # does not cancel the request for everyone waiting on it
+            task = asyncio.ensure_future(
+                super().generate_response(messages, temperature, max_tokens, tools)
+            )
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        response = await asyncio.shield(task)
+        # Each caller gets its own copy, of the type the plugin returned
+        return response.copy()
@@ -0,0 +1,302 @@
+from types import ModuleType
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+import asyncio
+import importlib
+import json
+import httpx
+from loguru import logger
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class HTTPTransportConfig(BaseModel):
+    """Connection pool and timeout settings for the shared HTTP transport."""
+    model_config = ConfigDict(frozen=True)
+
+    max_connections: int = Field(100, ge=1, description="Maximum open connections per host")
+    max_keepalive_connections: int = Field(20, ge=0, description="Idle keep-alive connections kept per host")
+    keepalive_expiry: float = Field(30.0, ge=0.0, description="Seconds an idle connection is kept open")
+    connect_timeout: float = Field(10.0, description="Seconds to wait for a connection")
+    read_timeout: float = Field(60.0, description="Seconds to wait for response data")
+    write_timeout: float = Field(30.0, description="Seconds to wait while sending the request")
+    pool_timeout: float = Field(10.0, description="Seconds to wait for a free connection from the pool")
+    http2: bool = Field(False, description="Negotiate HTTP/2 (requires the 'h2' package)")
+
+    def limits(self, http_lib: ModuleType = httpx) -> httpx.Limits:
+        return http_lib.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def timeout(self, http_lib: ModuleType = httpx) -> httpx.Timeout:
+        return http_lib.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout
+        )
+
+
+def _close_on_loop_shutdown(loop: asyncio.AbstractEventLoop, close: Callable[[], Awaitable[None]]) -> asyncio.Task:
+    """
+    Run ``close`` on ``loop`` when the loop shuts down.
+
+    asyncio.run() (and test runners) cancel every outstanding task before
+    closing the loop, so a task that waits forever and closes the resources
+    in its ``finally`` releases them while their loop can still do so.
+    Keep a reference to the returned task: the loop only holds it weakly.
+    """
+    async def wait_then_close() -> None:
+        try:
+            await loop.create_future()
+        finally:
+            try:
+                await close()
+            except Exception as e:
+                logger.debug(f"Closing pooled clients on loop shutdown failed: {e}")
+    return loop.create_task(wait_then_close())
+
+
+def _close_stale(
+    loop: Optional[asyncio.AbstractEventLoop],
+    closers: Iterable[Callable[[], Awaitable[None]]]
+) -> None:
+    """
+    Close clients left behind by a previous event loop. Connections can only
+    be closed on the loop that opened them: when that loop still runs (in
+    another thread) the close is scheduled there, otherwise they are dropped.
+    """
+    closers = list(closers)
+    if not closers:
+        return
+    if loop is not None and loop.is_running() and not loop.is_closed():
+        for close in closers:
+            asyncio.run_coroutine_threadsafe(close(), loop)
+    else:
+        logger.debug(f"Dropping {len(closers)} pooled clients bound to a stopped event loop")
+
+
+class AsyncHTTPTransport:
+    """
+    Non-blocking HTTP transport shared by the REST based plugins.
+
+    Keeps one keep-alive connection pool per host so that concurrent calls to
+    the same provider reuse warm connections instead of serializing on a
+    blocking client.
+
+    Example usage:
+        transport = AsyncHTTPTransport(HTTPTransportConfig(max_connections=50, http2=True))
+        data = await transport.post_json(url, payload, headers=headers)
+    """
+
+    def __init__(
+        self,
+        config: Optional[HTTPTransportConfig] = None,
+        http_transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Args:
+            config: Pool limits, timeouts and HTTP/2 settings
+            http_transport: Optional low-level httpx transport (proxies, testing)
+        """
+        self.config = config or HTTPTransportConfig()
+        self._http_transport = http_transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._shutdown_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parsed = httpx.URL(url)
+        return f"{parsed.scheme}://{parsed.host}:{parsed.port or ''}"
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """Return the pooled client for the host of the given URL."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Pooled connections are bound to the loop that opened them
+            stale = [client.aclose for client in self._clients.values() if not client.is_closed]
+            _close_stale(self._loop, stale)
+            self._clients = {}
+            self._loop = loop
+            self._shutdown_task = _close_on_loop_shutdown(loop, self._closer(self._clients))
+
+        origin = self._origin(url)
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self.config.limits(),
+                timeout=self.config.timeout(),
+                http2=self.config.http2,
+                transport=self._http_transport
+            )
+            self._clients[origin] = client
+        return client
+
+    async def post_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        POST a JSON payload and return the decoded JSON body.
+
+        Raises:
+            httpx.HTTPStatusError: If the server returns an error status
+        """
+        response = await self.client_for(url).post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def stream_events(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        POST a JSON payload and yield each decoded server-sent ``data:`` event
+        until the stream ends or a ``[DONE]`` sentinel arrives.
+
+        Raises:
+            httpx.HTTPStatusError: If the server returns an error status
+        """
+        async with self.client_for(url).stream("POST", url, json=payload, headers=headers) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                yield json.loads(data)
+
+    @staticmethod
+    def _closer(clients: Dict[str, httpx.AsyncClient]) -> Callable[[], Awaitable[None]]:
+        async def close() -> None:
+            pooled = list(clients.values())
+            clients.clear()
+            for client in pooled:
+                await client.aclose()
+        return close
+
+    async def aclose(self) -> None:
+        """Close all pooled connections."""
+        await self._closer(self._clients)()
+
+
+_shared_transports: Dict[HTTPTransportConfig, AsyncHTTPTransport] = {}
+
+
+def get_shared_transport(config: Optional[HTTPTransportConfig] = None) -> AsyncHTTPTransport:
+    """Return the process-wide transport for the given settings, creating it on first use."""
+    config = config or HTTPTransportConfig()
+    transport = _shared_transports.get(config)
+    if transport is None:
+        transport = AsyncHTTPTransport(config)
+        _shared_transports[config] = transport
+    return transport
+
+
+def _sdk_http_client_class(factory: Callable[..., Any]) -> Tuple[type, ModuleType]:
+    """
+    Find the async HTTP client class an SDK expects, and the httpx-compatible
+    package it comes from. Some SDK releases ship their own httpx fork and reject
+    plain ``httpx.AsyncClient`` instances.
+    """
+    sdk = importlib.import_module(factory.__module__.split(".")[0])
+    client_cls = getattr(sdk, "DefaultAsyncHttpxClient", httpx.AsyncClient)
+    for base in client_cls.__mro__:
+        if base.__name__ == "AsyncClient":
+            return client_cls, importlib.import_module(base.__module__.split(".")[0])
+    return client_cls, httpx
+
+
+# key -> (loop the client belongs to, client, loop-shutdown task)
+_shared_clients: Dict[Tuple[Any, ...], Tuple[Optional[asyncio.AbstractEventLoop], Any, Optional[asyncio.Task]]] = {}
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_shared_client(
+    factory: Callable[..., Any],
+    config: Optional[HTTPTransportConfig] = None,
+    **client_kwargs: Any
+) -> Any:
+    """
+    Return a process-wide async SDK client, creating it on first use.
+
+    Plugin instances built with the same factory, credentials and pool settings
+    share one client and therefore one connection pool. Like
+    AsyncHTTPTransport.client_for, clients are per event loop: a new loop
+    (e.g. a second asyncio.run) gets a fresh client, and each client is
+    closed when its loop shuts down.
+
+    Args:
+        factory: SDK client class accepting an ``http_client`` argument
+                 (e.g. ``openai.AsyncOpenAI``, ``groq.AsyncGroq``, ``anthropic.AsyncAnthropic``)
+        config: Pool limits, timeouts and HTTP/2 settings
+        **client_kwargs: Arguments forwarded to the factory (api_key, base_url, ...)
+    """
+    config = config or HTTPTransportConfig()
+    key = (factory, config, tuple(sorted(client_kwargs.items())))
+    loop = _running_loop()
+    entry = _shared_clients.get(key)
+    if entry is not None:
+        owner, client, _ = entry
+        if owner is loop:
+            return client
+        # Pooled connections are bound to the loop that opened them
+        if owner is not None:
+            _close_stale(owner, [client.close])
+
+    client_cls, http_lib = _sdk_http_client_class(factory)
+    http_client = client_cls(
+        limits=config.limits(http_lib),
+        timeout=config.timeout(http_lib),
+        http2=config.http2
+    )
+    client = factory(http_client=http_client, **client_kwargs)
+
+    async def close() -> None:
+        if _shared_clients.get(key, (None, None, None))[1] is client:
+            del _shared_clients[key]
+        await client.close()
+
+    _shared_clients[key] = (loop, client, _close_on_loop_shutdown(loop, close) if loop is not None else None)
+    return client
+
+
+class SharedClientMixin:
+    """
+    Gives a plugin a ``client`` property that resolves the shared SDK client
+    for the running event loop on every access, unless an explicit client
+    was given (or assigned).
+    """
+
+    def _use_shared_client(
+        self,
+        client: Any,
+        factory: Callable[..., Any],
+        config: Optional[HTTPTransportConfig] = None,
+        **client_kwargs: Any
+    ) -> None:
+        self._client = client
+        self._shared_client_args = (factory, config or HTTPTransportConfig(), client_kwargs)
+
+    @property
+    def client(self) -> Any:
+        if self._client is not None:
+            return self._client
+        factory, config, client_kwargs = self._shared_client_args
+        return get_shared_client(factory, config, **client_kwargs)
+
+    @client.setter
+    def client(self, value: Any) -> None:
+        self._client = value
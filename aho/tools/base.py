@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
+import functools
+import time
 from pydantic import BaseModel
+from ..utils.metrics import METRICS
+from ..utils.tracing import traced
 
 class ToolResponse(BaseModel):
     """Base class for tool execution responses"""
@@ -8,12 +12,46 @@ class ToolResponse(BaseModel):
     error: Optional[str] = None
     result: Any = None
 
+def _tool_name(tool: Any, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+    return {"tool": getattr(tool, "name", type(tool).__name__)}
+
+
+def _instrumented(execute: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Trace span and execution metrics around a tool's execute()"""
+    execute_traced = traced("tool.execute", _tool_name)(execute)
+
+    @functools.wraps(execute)
+    async def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        if not METRICS.enabled:
+            return await execute_traced(self, *args, **kwargs)
+        name = _tool_name(self)["tool"]
+        start = time.perf_counter()
+        try:
+            result = await execute_traced(self, *args, **kwargs)
+        except Exception:
+            METRICS.record_tool(name, time.perf_counter() - start, success=False)
+            raise
+        METRICS.record_tool(name, time.perf_counter() - start, getattr(result, "success", True))
+        return result
+
+    wrapper.__traced__ = True
+    return wrapper
+
+
 class Tool(ABC):
     """Abstract base class for all tools"""
     name: str
     description: str
     category: str = "general"
     
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        # Every concrete execute() gets a trace span and execution metrics
+        execute = cls.__dict__.get("execute")
+        if execute is not None and not getattr(execute, "__isabstractmethod__", False) \
+                and not getattr(execute, "__traced__", False):
+            cls.execute = _instrumented(execute)
+    
     @abstractmethod
     async def execute(self, **kwargs) -> ToolResponse:
         """Execute the tool with given parameters"""
@@ -1,14 +1,12 @@
 from aho.tools.utils.registry import ToolRegistry
-from aho.tools.search import (
-    BingSearchTool,
-    BraveSearchTool,
-    DuckDuckGoSearchTool,
-    ExaSearchTool,
-    GoogleSearchTool
-)
+from .bing import BingSearchTool
+from .brave import BraveSearchTool
+from .duckduckgo import DuckDuckGoSearchTool
+from .exa import ExaSearchTool
+from .google import GoogleSearchTool
 
-ToolRegistry.register(BingSearchTool())
-ToolRegistry.register(BraveSearchTool())
-ToolRegistry.register(DuckDuckGoSearchTool())
-ToolRegistry.register(ExaSearchTool())
-ToolRegistry.register(GoogleSearchTool())
+ToolRegistry.register(BingSearchTool)
+ToolRegistry.register(BraveSearchTool)
+ToolRegistry.register(DuckDuckGoSearchTool)
+ToolRegistry.register(ExaSearchTool)
+ToolRegistry.register(GoogleSearchTool)
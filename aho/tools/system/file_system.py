@@ -1,7 +1,5 @@
-
-from ast import Dict
 import os
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 from ..base import Tool, ToolResponse
 
 class FileSystemTool(Tool):
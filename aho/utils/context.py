@@ -0,0 +1,265 @@
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import json
+
+try:
+    import tiktoken
+except ImportError:  # optional: falls back to a character-based estimate
+    tiktoken = None
+
+# Context windows by model-name prefix; longest matching prefix wins
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "o1": 128000,
+    "claude": 200000,
+    "gemini-1.5": 1000000,
+    "gemini": 32768,
+    "llama-3.1": 128000,
+    "llama3": 8192,
+    "llama2": 4096,
+    "mixtral": 32768,
+    "mistral": 32768,
+}
+DEFAULT_CONTEXT_WINDOW = 4096
+
+# Tokens a chat API adds around every message (role, separators)
+MESSAGE_OVERHEAD = 4
+
+TRUNCATION_MARKER = " …"
+
+
+class Tokenizer:
+    """
+    Counts and truncates text in tokens.
+
+    Uses tiktoken when it is installed and a ~4 characters per token estimate
+    otherwise. Counts are memoized, so repeated context costs one lookup.
+    """
+
+    def __init__(self, encoding: Any = None, cache_size: int = 4096):
+        self.encoding = encoding
+        self.count: Callable[[str], int] = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most ``max_tokens`` tokens, marking the cut."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        keep = max_tokens - self.count(TRUNCATION_MARKER)
+        if keep <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return self.encoding.decode(tokens[:keep]) + TRUNCATION_MARKER
+        return text[:keep * 4] + TRUNCATION_MARKER
+
+
+@lru_cache(maxsize=32)
+def get_tokenizer(model: Optional[str] = None) -> Tokenizer:
+    """Shared tokenizer for a model, built once per model name."""
+    if tiktoken is None:
+        return Tokenizer()
+    try:
+        return Tokenizer(tiktoken.encoding_for_model(model or ""))
+    except KeyError:
+        # Non-OpenAI models: cl100k is a close enough proxy for budgeting
+        return Tokenizer(tiktoken.get_encoding("cl100k_base"))
+
+
+def context_window_for(llm: Any = None, model: Optional[str] = None) -> int:
+    """
+    Context window of an LLM or plugin: an explicit ``num_ctx`` or
+    ``context_window`` setting first, then the known limit for its model.
+    """
+    config = getattr(llm, "config", None)
+    for source in (llm, config):
+        for attr in ("context_window", "num_ctx"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int) and value > 0:
+                return value
+
+    model = model or getattr(llm, "model", None) or getattr(config, "model", None)
+    if isinstance(model, str):
+        name = model.lower()
+        matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if name.startswith(prefix)]
+        if matches:
+            return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def _as_text(item: Any) -> str:
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict) and set(item) >= {"role", "content"}:
+        return f"{item['role']}: {item['content']}"
+    try:
+        return json.dumps(item, default=str, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return str(item)
+
+
+class ContextBuilder:
+    """
+    Packs retrieved context into a token budget.
+
+    Context items are taken in the order given (most relevant first),
+    deduplicated, cut down when a single item would crowd out the rest, and
+    added until the budget runs out. The resulting messages always fit the
+    model's context window with room left for the reply.
+
+    Example usage:
+        builder = ContextBuilder(context_window=8192, reserve_output=1024)
+        messages = builder.build(
+            system="You are a helpful assistant.",
+            user=question,
+            context=memory.retrieve_relevant(question, limit=20)
+        )
+    """
+
+    def __init__(
+        self,
+        context_window: Optional[int] = None,
+        model: Optional[str] = None,
+        reserve_output: int = 512,
+        max_item_fraction: float = 0.5,
+        tokenizer: Optional[Tokenizer] = None
+    ):
+        """
+        Args:
+            context_window: Total tokens the model accepts (defaults to the known window for ``model``)
+            model: Model name, used for the default window and tokenizer
+            reserve_output: Tokens kept free for the response
+            max_item_fraction: Largest share of the context budget a single item may take
+            tokenizer: Tokenizer to count with (defaults to the shared one for ``model``)
+        """
+        self.context_window = context_window or context_window_for(model=model)
+        self.reserve_output = reserve_output
+        self.max_item_fraction = max_item_fraction
+        self.tokenizer = tokenizer or get_tokenizer(model)
+        self.last_stats: Dict[str, int] = {}
+
+    @classmethod
+    def for_llm(cls, llm: Any, **kwargs: Any) -> "ContextBuilder":
+        """Builder sized for an LLM or plugin's context window."""
+        model = getattr(llm, "model", None) or getattr(getattr(llm, "config", None), "model", None)
+        model = model if isinstance(model, str) else None
+        return cls(context_window=context_window_for(llm, model), model=model, **kwargs)
+
+    def message_tokens(self, message: Dict[str, Any]) -> int:
+        return self.tokenizer.count(str(message.get("content") or "")) + MESSAGE_OVERHEAD
+
+    def pack(self, items: Sequence[Any], budget: int) -> List[str]:
+        """
+        Select context items that fit in ``budget`` tokens.
+
+        Args:
+            items: Candidate context, most relevant first
+            budget: Tokens available for the joined items
+
+        Returns:
+            The items as text, deduplicated and truncated, in their original order
+        """
+        max_item_tokens = max(1, int(budget * self.max_item_fraction))
+        seen = set()
+        packed: List[str] = []
+        used = 0
+        for item in items:
+            text = _as_text(item).strip()
+            fingerprint = " ".join(text.split()).lower()
+            if not text or fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+
+            # One line per item: count the newline that joins it
+            remaining = budget - used - (1 if packed else 0)
+            if remaining <= 0:
+                break
+            text = self.tokenizer.truncate(text, min(max_item_tokens, remaining))
+            if not text:
+                break
+            packed.append(text)
+            used += self.tokenizer.count(text) + (1 if len(packed) > 1 else 0)
+        return packed
+
+    def build(
+        self,
+        user: str,
+        system: Optional[str] = None,
+        context: Optional[Sequence[Any]] = None,
+        history: Optional[Sequence[Dict[str, str]]] = None,
+        context_prefix: str = "Context:\n"
+    ) -> List[Dict[str, str]]:
+        """
+        Build a message list that fits the context window.
+
+        The system prompt and user message are always kept (the user message
+        is truncated only if it alone exceeds the window). Recent history is
+        kept newest first, then context fills what is left.
+
+        Args:
+            user: The user message
+            system: System prompt
+            context: Context items, most relevant first
+            history: Earlier conversation turns, oldest first
+            context_prefix: Text placed before the packed context
+
+        Returns:
+            Messages: system, context, history, user
+        """
+        budget = self.context_window - self.reserve_output
+        system_message = {"role": "system", "content": system} if system else None
+        fixed = self.message_tokens(system_message) if system_message else 0
+
+        user_budget = budget - fixed - MESSAGE_OVERHEAD
+        if user_budget <= 0:
+            raise ValueError(
+                f"Context window of {self.context_window} tokens leaves no room for the user message"
+            )
+        user_message = {"role": "user", "content": self.tokenizer.truncate(user, user_budget)}
+        remaining = budget - fixed - self.message_tokens(user_message)
+
+        kept_history: List[Dict[str, str]] = []
+        for message in reversed(list(history or [])):
+            cost = self.message_tokens(message)
+            if cost > remaining:
+                break
+            kept_history.insert(0, message)
+            remaining -= cost
+
+        context_budget = remaining - MESSAGE_OVERHEAD - self.tokenizer.count(context_prefix)
+        packed = self.pack(context or [], context_budget) if context_budget > 0 else []
+
+        def assemble() -> List[Dict[str, str]]:
+            messages: List[Dict[str, str]] = []
+            if system_message:
+                messages.append(system_message)
+            if packed:
+                messages.append({"role": "system", "content": context_prefix + "\n".join(packed)})
+            messages.extend(kept_history)
+            messages.append(user_message)
+            return messages
+
+        messages = assemble()
+        # Joined text can tokenize slightly differently from its parts
+        while packed and sum(self.message_tokens(m) for m in messages) > budget:
+            packed.pop()
+            messages = assemble()
+
+        self.last_stats = {
+            "prompt_tokens": sum(self.message_tokens(m) for m in messages),
+            "context_items": len(packed),
+            "context_items_dropped": len(context or []) - len(packed),
+            "history_dropped": len(history or []) - len(kept_history),
+        }
+        return messages
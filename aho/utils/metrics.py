@@ -0,0 +1,254 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+import threading
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [per-bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[idx] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, **labels: Any) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        state = self._values.get(key)
+        return state[-1] if state else 0.0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0.0
+            for idx, bound in enumerate(self.buckets):
+                cumulative += state[idx]
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics for plugins, tools and workflows.
+
+    Disabled by default: instrumented code checks ``enabled`` before doing
+    any work, so the hot path pays a single attribute lookup until metrics
+    are switched on.
+
+    Example usage:
+        from aho.utils.metrics import METRICS
+        METRICS.enable()
+        METRICS.serve(port=9464)        # scrape http://localhost:9464/metrics
+        print(METRICS.render())         # or export the text yourself
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics: Dict[str, Any] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+        self.plugin_requests = self.counter(
+            "aho_plugin_requests_total", "Plugin generate calls", ("plugin", "model", "status"))
+        self.plugin_retries = self.counter(
+            "aho_plugin_retries_total", "Plugin call retries", ("plugin",))
+        self.plugin_latency = self.histogram(
+            "aho_plugin_request_seconds", "Plugin call latency including retries", ("plugin", "model"))
+        self.plugin_ttft = self.histogram(
+            "aho_plugin_time_to_first_token_seconds", "Streaming time to first token", ("plugin", "model"))
+        self.plugin_tokens = self.counter(
+            "aho_plugin_tokens_total", "Tokens reported in usage", ("plugin", "model", "direction"))
+        self.tool_executions = self.counter(
+            "aho_tool_executions_total", "Tool executions", ("tool", "status"))
+        self.tool_latency = self.histogram(
+            "aho_tool_execute_seconds", "Tool execute latency", ("tool",))
+        self.workflow_steps = self.counter(
+            "aho_workflow_steps_total", "Workflow steps run", ("workflow", "step", "status"))
+        self.workflow_step_latency = self.histogram(
+            "aho_workflow_step_seconds", "Workflow step latency", ("workflow", "step"))
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Get or create a counter."""
+        if name not in self._metrics:
+            self._metrics[name] = Counter(name, documentation, labelnames)
+        return self._metrics[name]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        """Get or create a histogram."""
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+        return self._metrics[name]
+
+    def record_plugin_call(
+        self,
+        plugin: str,
+        model: Optional[str],
+        seconds: float,
+        usage: Optional[Dict[str, Any]] = None,
+        error: bool = False
+    ) -> None:
+        """Record one plugin call: outcome, latency and token usage."""
+        model = model or ""
+        self.plugin_requests.inc(plugin=plugin, model=model, status="error" if error else "ok")
+        self.plugin_latency.observe(seconds, plugin=plugin, model=model)
+        if usage:
+            self.record_tokens(plugin, model, usage)
+
+    def record_tokens(self, plugin: str, model: Optional[str], usage: Dict[str, Any]) -> None:
+        tokens_in = usage.get("prompt_tokens") or usage.get("input_tokens") or 0
+        tokens_out = usage.get("completion_tokens") or usage.get("output_tokens") or 0
+        if tokens_in:
+            self.plugin_tokens.inc(tokens_in, plugin=plugin, model=model or "", direction="in")
+        if tokens_out:
+            self.plugin_tokens.inc(tokens_out, plugin=plugin, model=model or "", direction="out")
+
+    def record_tool(self, tool: str, seconds: float, success: bool) -> None:
+        self.tool_executions.inc(tool=tool, status="ok" if success else "error")
+        self.tool_latency.observe(seconds, tool=tool)
+
+    def record_step(self, workflow: str, step: str, seconds: float, error: bool = False) -> None:
+        self.workflow_steps.inc(workflow=workflow, step=step, status="error" if error else "ok")
+        self.workflow_step_latency.observe(seconds, workflow=workflow, step=step)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """
+        Serve ``/metrics`` over HTTP from a daemon thread and enable recording.
+
+        Returns:
+            The running server (call ``stop_serving()`` to shut it down)
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self.stop_serving()
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.enable()
+        return self._server
+
+    def stop_serving(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Shared by every instrumented component
+METRICS = MetricsRegistry()
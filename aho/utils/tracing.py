@@ -0,0 +1,355 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar, Union
+import functools
+import json
+import os
+import queue
+import threading
+import time
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class Span:
+    """One timed operation in a trace."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "end_time", "attributes", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Duration in seconds, once ended."""
+        return None if self.end_time is None else (self.end_time - self.start_time) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def add(self, key: str, amount: float = 1) -> None:
+        """Increment a numeric attribute (e.g. retries)."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def record_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        """Copy normalized token counts from a plugin ``usage`` dict."""
+        if not usage:
+            return
+        self.set_attribute("tokens.input", usage.get("prompt_tokens") or usage.get("input_tokens"))
+        self.set_attribute("tokens.output", usage.get("completion_tokens") or usage.get("output_tokens"))
+        self.set_attribute("tokens.cache_read", usage.get("cache_read_tokens") or None)
+
+    def record_response(self, response: Any) -> None:
+        """Copy model, usage and cache attributes from a plugin response."""
+        if not hasattr(response, "get"):
+            return
+        self.set_attribute("model", response.get("model"))
+        self.record_usage(response.get("usage"))
+        if response.get("cache_hit"):
+            self.set_attribute("cache_hit", True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded while tracing is disabled; every method does nothing."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+    def record_usage(self, usage: Optional[Dict[str, Any]]) -> None:
+        pass
+
+    def record_response(self, response: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("aho_current_span", default=None)
+
+
+def current_span() -> Union[Span, _NoopSpan]:
+    """The innermost open span in this task, or a no-op span."""
+    return _current_span.get() or _NOOP_SPAN
+
+
+class JSONLinesExporter:
+    """
+    Appends each finished span as one JSON object per line.
+
+    Spans are buffered and written in batches by a background thread through
+    one open file handle, so exporting never does disk I/O on the event loop.
+    flush() and shutdown() write whatever is buffered.
+    """
+
+    def __init__(self, path: Union[str, Path], batch_size: int = 64):
+        """
+        Args:
+            path: File the spans are appended to
+            batch_size: Spans buffered before a batch is written
+        """
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        self._batches: "queue.Queue[Optional[List[Span]]]" = queue.Queue()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            if len(self._buffer) < self.batch_size:
+                return
+            batch, self._buffer = self._buffer, []
+        self._batches.put(batch)
+
+    def flush(self) -> None:
+        """Write buffered spans now (blocking)."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._batches.put(batch)
+        self._batches.join()
+
+    def shutdown(self) -> None:
+        if self._file.closed:
+            return
+        self.flush()
+        self._batches.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def _write(self) -> None:
+        while True:
+            batch = self._batches.get()
+            try:
+                if batch is None:
+                    return
+                self._file.write("".join(
+                    json.dumps(span.to_dict(), default=str, ensure_ascii=False) + "\n" for span in batch
+                ))
+                self._file.flush()
+            except Exception as e:
+                logger.warning(f"Failed to write {len(batch)} spans to {self.path}: {e}")
+            finally:
+                self._batches.task_done()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPHTTPExporter:
+    """
+    Sends spans to an OpenTelemetry collector with OTLP/HTTP JSON.
+
+    Spans are buffered and posted in batches from a background thread, so
+    exporting never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        service_name: str = "aho",
+        headers: Optional[Dict[str, str]] = None,
+        batch_size: int = 64,
+        timeout: float = 5.0
+    ):
+        """
+        Args:
+            endpoint: Collector traces URL
+            service_name: Value of the service.name resource attribute
+            headers: Extra request headers (e.g. auth for a hosted backend)
+            batch_size: Spans buffered before a batch is sent
+            timeout: Request timeout in seconds
+        """
+        # Imported here so enabling tracing without OTLP export doesn't pay for httpx
+        import httpx
+
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._client = httpx.Client(headers=headers, timeout=timeout)
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._buffer.append(span)
+            if len(self._buffer) < self.batch_size:
+                return
+            batch, self._buffer = self._buffer, []
+        threading.Thread(target=self._send, args=(batch,), daemon=True).start()
+
+    def flush(self) -> None:
+        """Send buffered spans now (blocking)."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._send(batch)
+
+    def shutdown(self) -> None:
+        self.flush()
+        self._client.close()
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        """OTLP JSON request body for a batch of spans."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "aho"},
+                    "spans": [self._span(span) for span in spans],
+                }],
+            }]
+        }
+
+    @staticmethod
+    def _span(span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_time),
+            "endTimeUnixNano": str(span.end_time or span.start_time),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def _send(self, spans: List[Span]) -> None:
+        try:
+            self._client.post(self.endpoint, json=self.payload(spans)).raise_for_status()
+        except Exception as e:
+            logger.warning(f"Failed to export {len(spans)} spans: {e}")
+
+
+class Tracer:
+    """
+    Records nested spans across workflows, agents, plugins and tools.
+
+    The active span is kept in a contextvar, so spans opened inside tasks
+    created with asyncio.gather or create_task become children of the span
+    that was open when the task started. Disabled until an exporter is
+    added; while disabled, ``span()`` yields a shared no-op span.
+
+    Example usage:
+        from aho.utils.tracing import TRACER, JSONLinesExporter
+        TRACER.add_exporter(JSONLinesExporter("traces.jsonl"))
+
+        with TRACER.span("my_job", user="42") as span:
+            result = await chain.run(text)
+    """
+
+    def __init__(self):
+        self.exporters: List[Any] = []
+        self.enabled = False
+
+    def add_exporter(self, exporter: Any) -> None:
+        """Add an exporter (anything with export(span)) and enable tracing."""
+        self.exporters.append(exporter)
+        self.enabled = True
+
+    def shutdown(self) -> None:
+        """Flush and close every exporter, then disable tracing."""
+        for exporter in self.exporters:
+            exporter.shutdown()
+        self.exporters = []
+        self.enabled = False
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Union[Span, _NoopSpan]]:
+        """Open a child of the current span (or a new trace) for the duration of the block."""
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name,
+            parent.trace_id if parent else os.urandom(16).hex(),
+            parent.span_id if parent else None,
+            {k: v for k, v in attributes.items() if v is not None}
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time_ns()
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception as e:
+                    logger.warning(f"Span export failed: {e}")
+
+
+# Shared by every instrumented component
+TRACER = Tracer()
+
+
+def traced(name: str, attributes: Optional[Callable[..., Dict[str, Any]]] = None) -> Callable:
+    """
+    Decorator opening a span around an async function or method.
+
+    Args:
+        name: Span name
+        attributes: Optional callable receiving the call's arguments and returning span attributes
+    """
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            if not TRACER.enabled:
+                return await fn(*args, **kwargs)
+            with TRACER.span(name, **(attributes(*args, **kwargs) if attributes else {})) as span:
+                result = await fn(*args, **kwargs)
+                span.record_response(result)
+                return result
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator
@@ -1,8 +1,18 @@
-from .prompt_chain import PromptChain
-from .parallel_processor import ParallelProcessor, ParallelProcessorResult
+from .prompt_chain import PromptChain, ChainStep
+from .checkpoint import ChainCheckpoint
+from .parallel_processor import ParallelProcessor, ParallelProcessorResult, BatchItem, BatchProgress
+from .model_router import ModelRouter, RouteTarget, RouteRequest, PluginStats
 
 __all__ = [
     "PromptChain",
+    "ChainStep",
+    "ChainCheckpoint",
     "ParallelProcessor",
-    "ParallelProcessorResult"
+    "ParallelProcessorResult",
+    "BatchItem",
+    "BatchProgress",
+    "ModelRouter",
+    "RouteTarget",
+    "RouteRequest",
+    "PluginStats"
 ]
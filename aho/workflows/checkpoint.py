@@ -0,0 +1,116 @@
+from pathlib import Path
+from typing import Dict, Optional, Union
+import hashlib
+import sqlite3
+import threading
+import time
+
+
+class ChainCheckpoint:
+    """
+    SQLite store of PromptChain step outputs, so a failed or interrupted run
+    resumes where it stopped instead of paying for finished steps again.
+
+    Outputs are keyed by (chain fingerprint, input hash, step name). The
+    fingerprint covers every step's template, inputs and plugin, so editing a
+    chain starts it afresh instead of reusing outputs of the old version.
+    Checkpoints are kept after a run completes; a rerun of the same input
+    returns the stored outputs. Use clear() to drop them.
+
+    Writes are committed in batches (every ``commit_every`` saves, or once
+    ``commit_interval`` seconds have passed since the last commit) rather than
+    once per step; PromptChain flushes when a run ends. A crash loses at most
+    the last uncommitted batch, which the rerun repeats.
+
+    Example usage:
+        checkpoint = ChainCheckpoint("~/.aho/checkpoints.db")
+        chain = PromptChain(steps, checkpoint=checkpoint)
+        result = await chain.run(document)     # rerun after a crash to resume
+    """
+
+    def __init__(
+        self,
+        db_path: Union[str, Path] = ":memory:",
+        commit_every: int = 64,
+        commit_interval: float = 1.0
+    ):
+        """
+        Args:
+            db_path: SQLite file (":memory:" for a store that lasts only as long as the process)
+            commit_every: Saves after which pending writes are committed
+            commit_interval: Seconds after which pending writes are committed on the next save
+        """
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        if str(db_path) != ":memory:":
+            path = Path(db_path).expanduser()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            db_path = str(path)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chain_checkpoints ("
+            "chain TEXT NOT NULL, input_hash TEXT NOT NULL, step TEXT NOT NULL, "
+            "output TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (chain, input_hash, step))"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def input_hash(initial_input: str) -> str:
+        return hashlib.sha256(initial_input.encode("utf-8")).hexdigest()
+
+    def load(self, chain: str, input_hash: str) -> Dict[str, str]:
+        """Stored outputs of a chain for one input, by step name."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT step, output FROM chain_checkpoints WHERE chain = ? AND input_hash = ?",
+                (chain, input_hash)
+            ).fetchall()
+        return dict(rows)
+
+    def save(self, chain: str, input_hash: str, step: str, output: str) -> None:
+        """Store one step's output; it is committed with the next batch."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chain_checkpoints (chain, input_hash, step, output, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chain, input_hash, step, output, time.time())
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every or time.monotonic() - self._last_commit >= self.commit_interval:
+                self._commit()
+
+    def flush(self) -> None:
+        """Commit the pending writes."""
+        with self._lock:
+            if self._pending:
+                self._commit()
+
+    def _commit(self) -> None:
+        self._db.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def clear(self, chain: Optional[str] = None) -> None:
+        """Remove the checkpoints of one chain fingerprint, or all of them."""
+        with self._lock:
+            if chain is None:
+                self._db.execute("DELETE FROM chain_checkpoints")
+            else:
+                self._db.execute("DELETE FROM chain_checkpoints WHERE chain = ?", (chain,))
+            self._commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chain_checkpoints").fetchone()[0]
@@ -0,0 +1,264 @@
+import time
+from typing import Any, Callable, Dict, List, Optional
+from loguru import logger
+from aho.plugins.rate_limit import estimate_tokens
+
+
+class PluginStats:
+    """Exponentially weighted live statistics for one routed plugin."""
+
+    def __init__(self, alpha: float = 0.2):
+        """
+        Args:
+            alpha: Weight of the newest sample (higher reacts faster)
+        """
+        self.alpha = alpha
+        self.requests = 0
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.tokens_per_second: Optional[float] = None
+
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else self.alpha * sample + (1 - self.alpha) * current
+
+    def record_success(self, latency: float, output_tokens: int) -> None:
+        self.requests += 1
+        self.latency = self._ewma(self.latency, latency)
+        self.error_rate = self._ewma(self.error_rate, 0.0)
+        if output_tokens and latency > 0:
+            self.tokens_per_second = self._ewma(self.tokens_per_second, output_tokens / latency)
+
+    def record_error(self) -> None:
+        self.requests += 1
+        self.error_rate = self._ewma(self.error_rate, 1.0)
+
+    def predicted_latency(self, output_tokens: Optional[int] = None) -> Optional[float]:
+        """
+        Expected latency for a request. When throughput is known, the output
+        budget is used to scale the estimate for long generations.
+        """
+        if self.latency is None:
+            return None
+        if output_tokens and self.tokens_per_second:
+            return max(self.latency, output_tokens / self.tokens_per_second)
+        return self.latency
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "latency": self.latency,
+            "error_rate": self.error_rate,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
+class RouteTarget:
+    """A plugin the router can send traffic to, with its price and context limit."""
+
+    def __init__(
+        self,
+        plugin: Any,
+        name: Optional[str] = None,
+        cost_per_1k_input: float = 0.0,
+        cost_per_1k_output: float = 0.0,
+        context_window: int = 8192,
+        alpha: float = 0.2
+    ):
+        """
+        Args:
+            plugin: Plugin with an async generate_response(messages=...) method
+            name: Name used in stats and responses (defaults to the plugin's name or class)
+            cost_per_1k_input: Price per 1000 prompt tokens
+            cost_per_1k_output: Price per 1000 completion tokens
+            context_window: Maximum prompt plus completion tokens the model accepts
+            alpha: EWMA weight for this target's stats
+        """
+        self.plugin = plugin
+        self.name = name or getattr(plugin, "name", None) or type(plugin).__name__
+        self.cost_per_1k_input = cost_per_1k_input
+        self.cost_per_1k_output = cost_per_1k_output
+        self.context_window = context_window
+        self.stats = PluginStats(alpha)
+
+    def estimated_cost(self, prompt_tokens: int, output_tokens: int) -> float:
+        return (prompt_tokens * self.cost_per_1k_input + output_tokens * self.cost_per_1k_output) / 1000
+
+
+class RouteRequest:
+    """What routing rules see about a request."""
+
+    def __init__(
+        self,
+        messages: List[Dict[str, str]],
+        prompt_tokens: int,
+        output_tokens: int,
+        latency_slo: Optional[float],
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.messages = messages
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.latency_slo = latency_slo
+        self.metadata = metadata or {}
+
+
+# A rule receives the request and the remaining candidates (cheapest first)
+# and returns the candidates to keep, in the order they should be tried.
+RoutingRule = Callable[[RouteRequest, List[RouteTarget]], List[RouteTarget]]
+
+
+def prefer_for_long_prompts(min_prompt_tokens: int, names: List[str]) -> RoutingRule:
+    """
+    Routing rule: requests with at least ``min_prompt_tokens`` prompt tokens go
+    to the named targets first (e.g. the strongest models), everything else
+    keeps the default cheapest-first order.
+    """
+    def rule(request: RouteRequest, candidates: List[RouteTarget]) -> List[RouteTarget]:
+        if request.prompt_tokens < min_prompt_tokens:
+            return candidates
+        preferred = [c for c in candidates if c.name in names]
+        return preferred + [c for c in candidates if c.name not in names]
+    return rule
+
+
+class ModelRouter:
+    """
+    Routes each request to the cheapest plugin that fits its context and is
+    expected to meet its latency SLO, based on live EWMA latency, error-rate
+    and tokens/sec stats collected from every response.
+
+    Failed calls fall through to the next candidate. The router exposes
+    generate_response, so it can be used anywhere a plugin is expected
+    (e.g. as a PromptChain step).
+
+    Example usage:
+        router = ModelRouter([
+            RouteTarget(groq_plugin, cost_per_1k_input=0.05, cost_per_1k_output=0.08, context_window=32768),
+            RouteTarget(ollama_plugin, context_window=4096),
+            RouteTarget(openai_plugin, cost_per_1k_input=10, cost_per_1k_output=30, context_window=128000),
+        ])
+        response = await router.run("Classify this ticket: ...", latency_slo=1.5)
+    """
+
+    def __init__(
+        self,
+        targets: List[RouteTarget],
+        rules: Optional[List[RoutingRule]] = None,
+        default_latency_slo: Optional[float] = None,
+        max_error_rate: float = 0.5,
+        default_output_tokens: int = 256
+    ):
+        """
+        Args:
+            targets: Plugins to route between
+            rules: Routing rules applied in order after the built-in filters
+            default_latency_slo: Latency target in seconds when a request sets none
+            max_error_rate: Targets with a higher EWMA error rate are tried last
+            default_output_tokens: Output estimate when max_tokens is not set
+        """
+        if not targets:
+            raise ValueError("ModelRouter needs at least one target")
+        self.targets = targets
+        self.rules = list(rules or [])
+        self.default_latency_slo = default_latency_slo
+        self.max_error_rate = max_error_rate
+        self.default_output_tokens = default_output_tokens
+
+    def add_rule(self, rule: RoutingRule) -> None:
+        """Append a routing rule."""
+        self.rules.append(rule)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Live stats for every target."""
+        return {target.name: target.stats.as_dict() for target in self.targets}
+
+    def candidates(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        latency_slo: Optional[float] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> List[RouteTarget]:
+        """
+        Rank targets for a request, best first.
+
+        Targets whose context window is too small are dropped. The rest are
+        ordered healthy-and-within-SLO first, then by estimated cost; targets
+        without stats yet are assumed to meet the SLO so they get sampled.
+        """
+        output_tokens = max_tokens or self.default_output_tokens
+        prompt_tokens = estimate_tokens(messages, 0, 0)
+        slo = latency_slo if latency_slo is not None else self.default_latency_slo
+        request = RouteRequest(messages, prompt_tokens, output_tokens, slo, metadata)
+
+        def rank(target: RouteTarget) -> tuple:
+            predicted = target.stats.predicted_latency(output_tokens)
+            meets_slo = slo is None or predicted is None or predicted <= slo
+            healthy = target.stats.error_rate <= self.max_error_rate
+            return (
+                not healthy,
+                not meets_slo,
+                target.estimated_cost(prompt_tokens, output_tokens) if meets_slo else (predicted or 0.0),
+            )
+
+        candidates = [t for t in self.targets if t.context_window >= prompt_tokens + output_tokens]
+        candidates.sort(key=rank)
+        for rule in self.rules:
+            candidates = rule(request, candidates)
+        return candidates
+
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        latency_slo: Optional[float] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Send the request to the best candidate, falling through to the next
+        one on failure.
+
+        Returns:
+            The plugin response dict, with "routed_to" naming the target used
+        """
+        candidates = self.candidates(messages, max_tokens, latency_slo, metadata)
+        if not candidates:
+            raise ValueError("No route target has a large enough context window for this request")
+
+        last_error: Optional[Exception] = None
+        for target in candidates:
+            start = time.perf_counter()
+            try:
+                response = await target.plugin.generate_response(
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    tools=tools
+                )
+            except Exception as e:
+                target.stats.record_error()
+                last_error = e
+                logger.warning(f"ModelRouter target {target.name} failed: {e}")
+                continue
+
+            usage = response.get("usage") or {}
+            output_tokens = usage.get("completion_tokens") or usage.get("output_tokens") or 0
+            target.stats.record_success(time.perf_counter() - start, output_tokens)
+            response["routed_to"] = target.name
+            return response
+
+        raise RuntimeError(f"All route targets failed: {last_error}")
+
+    async def run(self, user_input: str, latency_slo: Optional[float] = None, **kwargs: Any) -> Dict[str, Any]:
+        """
+        Route a single user prompt.
+
+        Args:
+            user_input: The prompt text
+            latency_slo: Latency target in seconds for this request
+            **kwargs: Passed to generate_response (temperature, max_tokens, tools, metadata)
+        """
+        messages = [{"role": "user", "content": user_input}]
+        return await self.generate_response(messages, latency_slo=latency_slo, **kwargs)
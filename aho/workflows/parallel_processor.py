@@ -1,28 +1,168 @@
 import asyncio
-from typing import List, Any, Dict
+import inspect
+import time
+from typing import List, Any, AsyncIterator, Callable, Dict, Hashable, Iterable, Iterator, Optional
+from aho.utils.metrics import METRICS
+from aho.utils.tracing import TRACER
+
+
+def normalize_answer(content: str) -> str:
+    """Default agreement key for quorum: case- and whitespace-insensitive content."""
+    return " ".join(str(content).split()).casefold()
+
+
+DEFAULT_BATCH_CONCURRENCY = 16
+
+
+def cluster_by_similarity(similarity: Any, threshold: float) -> List[List[int]]:
+    """
+    Greedy threshold clustering over a square similarity matrix.
+
+    Repeatedly takes the item with the most unassigned neighbours at or above
+    ``threshold`` and makes it and those neighbours a cluster. Unlike
+    connected components, a cluster never chains together items that are
+    only similar through intermediaries.
+
+    Args:
+        similarity: (n, n) NumPy similarity matrix
+        threshold: Minimum similarity for two items to agree
+
+    Returns:
+        Clusters as lists of item indices, largest first
+    """
+    import numpy as np
+
+    adjacency = np.asarray(similarity) >= threshold
+    np.fill_diagonal(adjacency, True)
+    unassigned = np.ones(len(adjacency), dtype=bool)
+    clusters: List[List[int]] = []
+    while unassigned.any():
+        degree = adjacency[:, unassigned].sum(axis=1)
+        degree[~unassigned] = -1
+        leader = int(np.argmax(degree))
+        members = np.flatnonzero(adjacency[leader] & unassigned)
+        unassigned[members] = False
+        clusters.append(members.tolist())
+    clusters.sort(key=len, reverse=True)
+    return clusters
+
+
+class BatchItem:
+    """
+    One plugin's answer to one input of a batch.
+
+    Unpacks as ``(input, plugin_name, response)``; ``index`` and
+    ``plugin_index`` locate it in the batch.
+    """
+
+    __slots__ = ("index", "input", "plugin_index", "plugin_name", "response")
+
+    def __init__(self, index: int, input: str, plugin_index: int, plugin_name: str, response: Dict[str, Any]):
+        self.index = index
+        self.input = input
+        self.plugin_index = plugin_index
+        self.plugin_name = plugin_name
+        self.response = response
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter((self.input, self.plugin_name, self.response))
+
+    def __repr__(self) -> str:
+        return f"BatchItem(index={self.index}, plugin_name={self.plugin_name!r})"
+
+
+class BatchProgress:
+    """Live counters for a running batch."""
+
+    def __init__(self, total: Optional[int], plugin_names: List[str]):
+        """
+        Args:
+            total: Plugin calls the batch will make, when the input count is known
+            plugin_names: Names of the plugins, for the per-plugin counts
+        """
+        self.total = total
+        self.completed = 0          # calls finished, including failures
+        self.failed = 0
+        self.in_flight = 0
+        self.inputs_completed = 0   # inputs answered by every plugin
+        self.per_plugin: Dict[str, int] = {name: 0 for name in plugin_names}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """Completed calls per second."""
+        elapsed = self.elapsed
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    def record(self, plugin_name: str, error: bool) -> None:
+        self.completed += 1
+        self.per_plugin[plugin_name] = self.per_plugin.get(plugin_name, 0) + 1
+        if error:
+            self.failed += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "inputs_completed": self.inputs_completed,
+            "per_plugin": dict(self.per_plugin),
+            "elapsed": self.elapsed,
+            "throughput": self.throughput,
+        }
+
 
 class ParallelProcessorResult:
     """
     Holds the raw responses from each plugin and provides convenience methods
     like majority_vote.
     """
-    def __init__(self, responses: List[Dict[str, Any]]):
+    def __init__(
+        self,
+        responses: List[Dict[str, Any]],
+        stop_reason: Optional[str] = None,
+        quorum_content: Optional[str] = None
+    ):
         """
         Args:
             responses: A list of plugin response dicts. Each dict might look like:
                 {
                   "plugin_name": str,
                   "content": str,
-                  "raw_response": ...
+                  "raw_response": ...  # the plugin's normalized response (e.g. LLMResponse)
                 }
+                Plugins cancelled by an early return or deadline have
+                {"plugin_name": str, "error": "cancelled", "cancelled": True}
+                and no "content", so they never take part in a vote.
+            stop_reason: Why the run returned before every plugin answered
+                ("first_k", "quorum" or "deadline"), or None
+            quorum_content: The agreed answer when a quorum was reached
         """
         self.responses = responses
+        self.stop_reason = stop_reason
+        self.quorum_content = quorum_content
 
     @property
     def raw_responses(self) -> List[Dict[str, Any]]:
         """Return the raw response objects from each plugin."""
         return self.responses
 
+    @property
+    def completed(self) -> List[Dict[str, Any]]:
+        """Responses from plugins that answered without error."""
+        return [r for r in self.responses if "raw_response" in r]
+
+    @property
+    def cancelled(self) -> List[str]:
+        """Names of plugins whose calls were cancelled."""
+        return [r["plugin_name"] for r in self.responses if r.get("cancelled")]
+
     @property
     def majority_vote(self) -> str:
         """
@@ -31,6 +171,8 @@ class ParallelProcessorResult:
         
         Customize as needed for more sophisticated logic.
         """
+        if self.quorum_content is not None:
+            return self.quorum_content
         if not self.responses:
             return ""
         contents = [r["content"] for r in self.responses if "content" in r]
@@ -44,74 +186,380 @@ class ParallelProcessorResult:
         sorted_contents = sorted(freq.items(), key=lambda x: x[1], reverse=True)
         return sorted_contents[0][0]
 
+    async def semantic_vote(
+        self,
+        embedding_fn: Callable[[List[str]], Any],
+        threshold: float = 0.85
+    ) -> Dict[str, Any]:
+        """
+        Consensus by meaning rather than exact text.
+
+        Embeds every successful answer in one batch, clusters them by cosine
+        similarity and returns the medoid (the answer most similar to the rest)
+        of the largest cluster.
+
+        Args:
+            embedding_fn: Callable (sync or async) embedding a list of texts,
+                returning an (n, dimension) array-like (e.g. SentenceTransformer.encode)
+            threshold: Cosine similarity at which two answers count as agreeing
+
+        Returns:
+            {
+              "content": str,           # the medoid answer ("" if nothing answered)
+              "agreement": float,       # share of answers in the winning cluster
+              "plugin_names": [...],    # plugins in the winning cluster
+              "clusters": int           # number of distinct answers found
+            }
+        """
+        import numpy as np
+
+        candidates = [r for r in self.responses if "raw_response" in r and r.get("content")]
+        if not candidates:
+            return {"content": "", "agreement": 0.0, "plugin_names": [], "clusters": 0}
+        texts = [r["content"] for r in candidates]
+
+        # Identical answers are embedded once
+        unique = list(dict.fromkeys(texts))
+        vectors = embedding_fn(unique)
+        if inspect.isawaitable(vectors):
+            vectors = await vectors
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(unique):
+            raise ValueError(f"Expected {len(unique)} embeddings, got array of shape {vectors.shape}")
+        position = {text: idx for idx, text in enumerate(unique)}
+        vectors = vectors[[position[text] for text in texts]]
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        unit = vectors / norms
+        similarity = unit @ unit.T
+
+        clusters = cluster_by_similarity(similarity, threshold)
+        winners = clusters[0]
+        medoid = winners[int(np.argmax(similarity[np.ix_(winners, winners)].sum(axis=1)))]
+        return {
+            "content": texts[medoid],
+            "agreement": len(winners) / len(texts),
+            "plugin_names": [candidates[idx]["plugin_name"] for idx in winners],
+            "clusters": len(clusters),
+        }
+
 class ParallelProcessor:
     """
     Sends the same prompt to multiple LLM plugins in parallel.
     Collects their responses and provides aggregator methods.
     
+    By default every plugin is awaited. ``first_k`` returns once k plugins
+    have answered, ``quorum`` once that many answers agree, and ``deadline``
+    returns whatever has arrived after that many seconds; in each case the
+    remaining calls are cancelled.
+
     Example usage:
         plugins = [openai_plugin, claude_plugin, local_llama_plugin]
         processor = ParallelProcessor(plugins)
         result = await processor.run("Is this content safe to publish?")
         print(result.majority_vote)
+
+        # Answer as soon as two providers agree, giving up after 10 seconds
+        result = await processor.run("Is this content safe to publish?", quorum=2, deadline=10)
+
+        # Many inputs across every plugin, streamed as answers arrive
+        async for user_input, plugin_name, response in processor.as_completed(items, per_plugin_concurrency=8):
+            save(user_input, plugin_name, response["content"])
     """
 
-    def __init__(self, plugins: List[Any]):
+    def __init__(
+        self,
+        plugins: List[Any],
+        max_concurrency: Optional[int] = None,
+        agreement_key: Callable[[str], Hashable] = normalize_answer
+    ):
         """
         Args:
             plugins: A list of LLM plugin instances that provide an async method:
                      generate_response(messages=[...]) -> Dict
+            max_concurrency: Most plugin calls in flight at once (None for no limit)
+            agreement_key: Maps a response's content to the value quorum compares
         """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
         self.plugins = plugins
+        self.max_concurrency = max_concurrency
+        self.agreement_key = agreement_key
+        self.progress: Optional[BatchProgress] = None
+
+    def _plugin_name(self, idx: int) -> str:
+        return getattr(self.plugins[idx], "name", f"plugin_{idx+1}")
 
-    async def run(self, user_input: str) -> ParallelProcessorResult:
+    async def run(
+        self,
+        user_input: str,
+        first_k: Optional[int] = None,
+        quorum: Optional[int] = None,
+        deadline: Optional[float] = None
+    ) -> ParallelProcessorResult:
         """
         Executes the same user_input prompt across all plugins *concurrently*.
         
         Args:
             user_input: The input text prompt to send to each plugin.
+            first_k: Return as soon as this many plugins have answered successfully
+            quorum: Return as soon as this many answers agree (see ``agreement_key``)
+            deadline: Seconds to wait before returning the answers received so far
         
         Returns:
             ParallelProcessorResult object with each plugin’s response.
         """
         if not self.plugins:
             return ParallelProcessorResult([])
+        for name, value in (("first_k", first_k), ("quorum", quorum)):
+            if value is not None and value < 1:
+                raise ValueError(f"{name} must be at least 1")
 
         # Build the message for each plugin. Adjust if you have a custom format.
         messages = [{"role": "user", "content": user_input}]
 
-        # We'll gather tasks for each plugin call
-        tasks = []
-        for plugin in self.plugins:
-            tasks.append(self._call_plugin(plugin, messages))
+        with TRACER.span(
+            "ParallelProcessor.run", plugins=len(self.plugins), first_k=first_k, quorum=quorum, deadline=deadline
+        ) as span:
+            if first_k is None and quorum is None and deadline is None and self.max_concurrency is None:
+                # Plain fan-out: nothing to stop early, so gather everything
+                tasks = [self._call_plugin(plugin, messages, self._plugin_name(idx))
+                         for idx, plugin in enumerate(self.plugins)]
+                plugin_responses = await asyncio.gather(*tasks, return_exceptions=True)
+                return ParallelProcessorResult(
+                    [self._format_response(idx, resp) for idx, resp in enumerate(plugin_responses)]
+                )
 
-        plugin_responses = await asyncio.gather(*tasks, return_exceptions=True)
-        # plugin_responses is a list of either dict or Exception
+            outcomes, stop_reason, quorum_content = await self._run_until(messages, first_k, quorum, deadline)
+            span.set_attribute("stop_reason", stop_reason)
+            span.set_attribute("cancelled", len(self.plugins) - len(outcomes))
 
-        # Build a list of response dicts with a minimal common format
         final_responses = []
-        for idx, resp in enumerate(plugin_responses):
-            plugin_name = getattr(self.plugins[idx], "name", f"plugin_{idx+1}")
-            if isinstance(resp, Exception):
-                # If an error occurred, we record it
-                final_responses.append({
-                    "plugin_name": plugin_name,
-                    "content": "",
-                    "error": str(resp)
-                })
+        for idx in range(len(self.plugins)):
+            if idx in outcomes:
+                final_responses.append(self._format_response(idx, outcomes[idx]))
+            else:
+                final_responses.append({"plugin_name": self._plugin_name(idx), "error": "cancelled", "cancelled": True})
+        return ParallelProcessorResult(final_responses, stop_reason, quorum_content)
+
+    async def _run_until(
+        self,
+        messages: List[Dict[str, str]],
+        first_k: Optional[int],
+        quorum: Optional[int],
+        deadline: Optional[float]
+    ):
+        """
+        Start every plugin call and collect results until a stop condition is
+        met, then cancel the stragglers.
+
+        Returns:
+            (outcomes by plugin index, stop reason or None, quorum answer or None)
+        """
+        loop = asyncio.get_running_loop()
+        end = loop.time() + deadline if deadline is not None else None
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+
+        async def call(idx: int) -> Dict[str, Any]:
+            if semaphore is None:
+                return await self._call_plugin(self.plugins[idx], messages, self._plugin_name(idx))
+            async with semaphore:
+                return await self._call_plugin(self.plugins[idx], messages, self._plugin_name(idx))
+
+        tasks = {asyncio.ensure_future(call(idx)): idx for idx in range(len(self.plugins))}
+        pending = set(tasks)
+        outcomes: Dict[int, Any] = {}
+        votes: Dict[Hashable, List[str]] = {}
+        successes = 0
+        try:
+            while pending:
+                timeout = None if end is None else max(0.0, end - loop.time())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    return outcomes, "deadline", None
+                # Handle simultaneous completions in plugin order, so results are deterministic
+                for task in sorted(done, key=tasks.get):
+                    idx = tasks[task]
+                    error = task.exception()
+                    outcomes[idx] = error if error is not None else task.result()
+                    if error is not None:
+                        continue
+                    successes += 1
+                    if quorum is not None:
+                        content = outcomes[idx].get("content", "")
+                        agreeing = votes.setdefault(self.agreement_key(content), [])
+                        agreeing.append(content)
+                        if len(agreeing) >= quorum:
+                            return outcomes, "quorum", agreeing[0]
+                if first_k is not None and successes >= first_k:
+                    return outcomes, "first_k", None
+            return outcomes, None, None
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run_batch(
+        self,
+        inputs: Iterable[str],
+        concurrency: Optional[int] = None,
+        per_plugin_concurrency: Optional[int] = None
+    ) -> List[ParallelProcessorResult]:
+        """
+        Run every input across every plugin and collect the results.
+
+        Holds all responses in memory; use as_completed() for large batches.
+
+        Args:
+            inputs: The input prompts
+            concurrency: Most plugin calls in flight across the batch
+            per_plugin_concurrency: Most calls in flight to any one plugin
+
+        Returns:
+            One ParallelProcessorResult per input, in input order
+        """
+        collected: Dict[int, List[Optional[Dict[str, Any]]]] = {}
+        async for item in self.as_completed(inputs, concurrency, per_plugin_concurrency):
+            collected.setdefault(item.index, [None] * len(self.plugins))[item.plugin_index] = item.response
+        return [ParallelProcessorResult(collected[idx]) for idx in sorted(collected)]
+
+    async def as_completed(
+        self,
+        inputs: Iterable[str],
+        concurrency: Optional[int] = None,
+        per_plugin_concurrency: Optional[int] = None
+    ) -> AsyncIterator[BatchItem]:
+        """
+        Run every input across every plugin, yielding each answer as soon as
+        it arrives.
+
+        Inputs are read lazily and every internal queue is bounded, so memory
+        stays flat however long the input is; a slow consumer slows the batch
+        down rather than buffering results. Failed calls are yielded with an
+        "error" entry like in run(). Live counters are available on
+        ``self.progress`` while the batch runs.
+
+        Args:
+            inputs: The input prompts (any iterable, e.g. a generator over a file)
+            concurrency: Most plugin calls in flight across the batch
+                (defaults to max_concurrency, else DEFAULT_BATCH_CONCURRENCY)
+            per_plugin_concurrency: Most calls in flight to any one plugin (defaults to ``concurrency``)
+
+        Returns:
+            Async iterator of BatchItem, in completion order
+        """
+        concurrency = concurrency or self.max_concurrency or DEFAULT_BATCH_CONCURRENCY
+        per_plugin = per_plugin_concurrency or concurrency
+        if concurrency < 1 or per_plugin < 1:
+            raise ValueError("Batch concurrency limits must be at least 1")
+        if not self.plugins:
+            return
+
+        names = [self._plugin_name(idx) for idx in range(len(self.plugins))]
+        total = len(inputs) * len(self.plugins) if hasattr(inputs, "__len__") else None
+        progress = self.progress = BatchProgress(total, names)
+        slots = asyncio.Semaphore(concurrency)
+        plugin_queues = [asyncio.Queue(maxsize=per_plugin) for _ in self.plugins]
+        results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        remaining: Dict[int, int] = {}
+        done = object()
+
+        async def feed() -> None:
+            for idx, user_input in enumerate(inputs):
+                remaining[idx] = len(self.plugins)
+                for queue in plugin_queues:
+                    await queue.put((idx, user_input))
+            for queue in plugin_queues:
+                for _ in range(per_plugin):
+                    await queue.put(None)
+
+        async def work(plugin_index: int) -> None:
+            plugin, name, queue = self.plugins[plugin_index], names[plugin_index], plugin_queues[plugin_index]
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                idx, user_input = job
+                async with slots:
+                    progress.in_flight += 1
+                    try:
+                        response = await self._call_plugin(plugin, [{"role": "user", "content": user_input}], name)
+                    except Exception as e:
+                        response = e
+                    finally:
+                        progress.in_flight -= 1
+                progress.record(name, error=isinstance(response, Exception))
+                remaining[idx] -= 1
+                if not remaining[idx]:
+                    del remaining[idx]
+                    progress.inputs_completed += 1
+                await results.put(BatchItem(idx, user_input, plugin_index, name, self._format_response(plugin_index, response)))
+
+        async def supervise() -> None:
+            tasks = [asyncio.ensure_future(feed())]
+            tasks += [asyncio.ensure_future(work(p)) for p in range(len(self.plugins)) for _ in range(per_plugin)]
+            try:
+                await asyncio.gather(*tasks)
+            except Exception as e:
+                await results.put(e)
             else:
-                # We expect a dict with at least "content"
-                final_responses.append({
-                    "plugin_name": plugin_name,
-                    "content": resp.get("content", ""),
-                    "raw_response": resp
-                })
+                await results.put(done)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
 
-        return ParallelProcessorResult(final_responses)
+        supervisor = asyncio.ensure_future(supervise())
+        try:
+            while True:
+                item = await results.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise RuntimeError(f"ParallelProcessor batch error: {item}") from item
+                yield item
+        finally:
+            progress.finished = time.perf_counter()
+            if not supervisor.done():
+                supervisor.cancel()
+                await asyncio.gather(supervisor, return_exceptions=True)
 
-    async def _call_plugin(self, plugin: Any, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    def _format_response(self, idx: int, resp: Any) -> Dict[str, Any]:
+        """Build a response dict with a minimal common format."""
+        plugin_name = self._plugin_name(idx)
+        if isinstance(resp, BaseException):
+            # If an error occurred, we record it
+            return {
+                "plugin_name": plugin_name,
+                "content": "",
+                "error": str(resp)
+            }
+        # We expect a dict with at least "content"
+        return {
+            "plugin_name": plugin_name,
+            "content": resp.get("content", ""),
+            "raw_response": resp
+        }
+
+    async def _call_plugin(self, plugin: Any, messages: List[Dict[str, str]], step: str = "") -> Dict[str, Any]:
         """
         Helper method to call plugin.generate_response in a safe block.
         """
         # Each plugin should have an async generate_response(...) method
-        return await plugin.generate_response(messages=messages)
+        if not METRICS.enabled and not TRACER.enabled:
+            return await plugin.generate_response(messages=messages)
+
+        with TRACER.span("ParallelProcessor.call", plugin=step) as span:
+            start = time.perf_counter()
+            try:
+                response = await plugin.generate_response(messages=messages)
+            except Exception:
+                if METRICS.enabled:
+                    METRICS.record_step("ParallelProcessor", step, time.perf_counter() - start, error=True)
+                raise
+            if METRICS.enabled:
+                METRICS.record_step("ParallelProcessor", step, time.perf_counter() - start)
+            span.record_response(response)
+            return response
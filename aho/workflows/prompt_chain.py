@@ -1,11 +1,100 @@
 import asyncio
-from typing import List, Tuple, Union, Any
+import hashlib
+import json
+import string
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple, Union, Any
+import networkx as nx
+from aho.utils.metrics import METRICS
+from aho.utils.tracing import TRACER
+from .checkpoint import ChainCheckpoint
+
+# Source name that refers to the chain's own input
+CHAIN_INPUT = "input"
+
+# Workers per step in run_many() unless configured
+DEFAULT_STAGE_CONCURRENCY = 4
+
+
+class _PipelineItem:
+    """Progress of one input through run_many()."""
+
+    __slots__ = ("index", "input", "input_hash", "values", "waiting", "remaining", "error")
+
+    def __init__(
+        self,
+        index: int,
+        initial_input: str,
+        input_hash: Optional[str],
+        values: Dict[str, str],
+        waiting: Dict[str, set]
+    ):
+        self.index = index
+        self.input = initial_input
+        self.input_hash = input_hash
+        self.values = values
+        self.waiting = waiting
+        self.remaining = len(waiting)
+        self.error: Optional[str] = None
+
+
+class ChainStep:
+    """
+    One node of a graph-structured PromptChain.
+
+    The template is formatted with the outputs of the steps it reads from;
+    ``{input}`` always refers to the chain's input unless remapped.
+
+    Example usage:
+        ChainStep("summary", claude_plugin, "Summarize:\\n{people}\\n{places}")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        plugin: Any,
+        template: str,
+        inputs: Optional[Union[Sequence[str], Dict[str, str]]] = None
+    ):
+        """
+        Args:
+            name: Unique step name, used as a placeholder by steps that read this one
+            plugin: Object with an async generate_response(messages), or None for a
+                    template-only step (e.g. merging several outputs without an LLM call)
+            template: Prompt template with one placeholder per input
+            inputs: Step names to read (each filling the placeholder of the same name),
+                    or a {placeholder: step name} mapping. Defaults to the template's
+                    placeholders.
+        """
+        if name == CHAIN_INPUT:
+            raise ValueError(f"'{CHAIN_INPUT}' is reserved for the chain input")
+        self.name = name
+        self.plugin = plugin
+        self.template = template
+        if inputs is None:
+            inputs = [field for _, field, _, _ in string.Formatter().parse(template) if field]
+        if not isinstance(inputs, dict):
+            inputs = {source: source for source in inputs}
+        self.inputs: Dict[str, str] = dict(inputs)
+
+    @property
+    def dependencies(self) -> List[str]:
+        """Steps this one waits for (the chain input excluded)."""
+        return sorted({source for source in self.inputs.values() if source != CHAIN_INPUT})
+
+    def __repr__(self) -> str:
+        return f"ChainStep({self.name!r}, inputs={self.inputs})"
+
 
 class PromptChain:
     """
     Executes a list of (plugin, prompt_template) steps in sequence.
     The output of step[i] is fed as the {input} to step[i+1].
-    
+
+    Steps can also be ChainSteps that name the earlier steps they read from.
+    Each step then starts as soon as its dependencies have finished, so
+    independent steps run concurrently.
+
     Example usage:
         steps = [
             (openai_plugin, "Translate this text to French: {input}"),
@@ -13,51 +102,374 @@ class PromptChain:
         ]
         chain = PromptChain(steps)
         result = await chain.run("Hello world!")
+
+        # Three extractions in parallel, then one synthesis
+        chain = PromptChain([
+            ChainStep("people", openai_plugin, "List the people in: {input}"),
+            ChainStep("places", openai_plugin, "List the places in: {input}"),
+            ChainStep("dates", groq_plugin, "List the dates in: {input}"),
+            ChainStep("report", claude_plugin, "Write a report.\\nPeople: {people}\\nPlaces: {places}\\nDates: {dates}"),
+        ])
+        result = await chain.run(document)
+
+        # A dataset, pipelined: each step works on a different item at once
+        async for item in chain.run_many(texts, concurrency={"0": 8, "1": 2}):
+            print(item["index"], item["output"])
     """
 
-    def __init__(self, steps: List[Tuple[Any, str]]):
+    def __init__(
+        self,
+        steps: List[Union[Tuple[Any, str], ChainStep]],
+        output: Optional[Union[str, Sequence[str]]] = None,
+        checkpoint: Optional[ChainCheckpoint] = None
+    ):
         """
         Args:
-            steps: A list of tuples (plugin, prompt_template).
+            steps: A list of tuples (plugin, prompt_template), or of ChainSteps.
                    - plugin: an object with an async method, e.g. generate_response(messages).
                    - prompt_template: a string that may contain {input} to be replaced
                                      by the output of the previous step.
+                   Tuples are named by their position ("0", "1", ...) and read the
+                   previous entry's output.
+            output: Step whose output run() returns, or several step names whose
+                    outputs are joined with blank lines (defaults to the last step)
+            checkpoint: Store for step outputs; runs resume from the first
+                        step without a stored output for their input
+
+        Raises:
+            ValueError: If step names repeat, an input names an unknown step, or
+                        the steps form a cycle
         """
         self.steps = steps
+        self.nodes: Dict[str, ChainStep] = {}
+        previous = CHAIN_INPUT
+        for idx, step in enumerate(steps):
+            if not isinstance(step, ChainStep):
+                plugin, prompt_template = step
+                step = ChainStep(str(idx), plugin, prompt_template, inputs={"input": previous})
+            if step.name in self.nodes:
+                raise ValueError(f"Duplicate PromptChain step name: {step.name}")
+            self.nodes[step.name] = step
+            previous = step.name
+
+        self.graph = nx.DiGraph()
+        self.graph.add_nodes_from(self.nodes)
+        for step in self.nodes.values():
+            for source in step.dependencies:
+                if source not in self.nodes:
+                    raise ValueError(f"PromptChain step {step.name} reads unknown step: {source}")
+                self.graph.add_edge(source, step.name)
+        if not nx.is_directed_acyclic_graph(self.graph):
+            cycle = " -> ".join(source for source, _ in nx.find_cycle(self.graph))
+            raise ValueError(f"PromptChain steps form a cycle: {cycle}")
+        # Declaration order breaks ties, so a linear chain runs exactly as listed
+        position = {name: idx for idx, name in enumerate(self.nodes)}
+        self.order: List[str] = list(nx.lexicographical_topological_sort(self.graph, key=position.get))
+
+        if output is None:
+            output = previous if self.nodes else []
+        self.output: List[str] = [output] if isinstance(output, str) else list(output)
+        for name in self.output:
+            if name not in self.nodes:
+                raise ValueError(f"Unknown PromptChain output step: {name}")
+        self.checkpoint = checkpoint
+        self.fingerprint = self._fingerprint()
+
+    def _fingerprint(self) -> str:
+        """Hash of the chain's structure, templates and plugins."""
+        description = [
+            {
+                "name": name,
+                "template": self.nodes[name].template,
+                "inputs": self.nodes[name].inputs,
+                "plugin": None if self.nodes[name].plugin is None else [
+                    type(self.nodes[name].plugin).__name__,
+                    getattr(self.nodes[name].plugin, "name", None),
+                    getattr(self.nodes[name].plugin, "model", None),
+                ],
+            }
+            for name in self.order
+        ]
+        encoded = json.dumps(description, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _restore(self, initial_input: str) -> Tuple[Optional[str], Dict[str, str], Dict[str, set]]:
+        """
+        Starting state for one input.
+
+        Returns:
+            (input hash or None without a checkpoint, known values, {unfinished step: steps it waits for})
+        """
+        values = {CHAIN_INPUT: initial_input}
+        input_hash = None
+        if self.checkpoint is not None:
+            input_hash = self.checkpoint.input_hash(initial_input)
+            stored = self.checkpoint.load(self.fingerprint, input_hash)
+            values.update({name: output for name, output in stored.items() if name in self.nodes})
+        waiting = {
+            name: {source for source in self.graph.predecessors(name) if source not in values}
+            for name in self.order if name not in values
+        }
+        return input_hash, values, waiting
+
+    def _save(self, input_hash: Optional[str], name: str, output: str) -> None:
+        if self.checkpoint is not None:
+            self.checkpoint.save(self.fingerprint, input_hash, name, output)
+
+    def _flush(self) -> None:
+        if self.checkpoint is not None:
+            self.checkpoint.flush()
 
     async def run(self, initial_input: str) -> str:
         """
-        Executes the chain of prompts sequentially, passing output from
-        one step to the next.
-        
+        Executes the chain of prompts, passing output from each step to the
+        steps that read it.
+
         Args:
             initial_input: The initial input text to feed into step[0].
-        
+
         Returns:
             The final output text from the last step in the chain.
         """
-        current_input = initial_input
+        if not self.nodes:
+            return initial_input
+        outputs = await self.run_steps(initial_input)
+        return "\n\n".join(outputs[name] for name in self.output)
 
-        for idx, (plugin, prompt_template) in enumerate(self.steps):
-            # Format the prompt with the current input
-            prompt = prompt_template.format(input=current_input)
+    async def run_steps(self, initial_input: str) -> Dict[str, str]:
+        """
+        Executes the chain and returns every step's output.
 
-            # For demonstration, we wrap the prompt in a minimal "messages" structure
-            # if your plugin uses an interface like plugin.generate_response(messages).
-            messages = [{"role": "user", "content": prompt}]
+        Args:
+            initial_input: The chain input
 
+        Returns:
+            {step name: output text}, in execution order
+        """
+        with TRACER.span("PromptChain.run", steps=len(self.nodes)) as span:
+            input_hash, values, waiting = self._restore(initial_input)
+            if len(values) > 1:
+                span.set_attribute("resumed_steps", len(values) - 1)
+            ready = [name for name in waiting if not waiting[name]]
+            running: Dict[asyncio.Future, str] = {}
             try:
-                response = await plugin.generate_response(messages=messages)
+                while ready or running:
+                    if not running and len(ready) == 1:
+                        # Only one step can run: await it directly, no task needed
+                        name = ready.pop()
+                        values[name] = await self._run_step(self.nodes[name], values)
+                        self._save(input_hash, name, values[name])
+                        ready = self._release(name, waiting)
+                        continue
+
+                    for name in ready:
+                        running[asyncio.ensure_future(self._run_step(self.nodes[name], values))] = name
+                    ready = []
+                    done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in sorted(done, key=lambda t: self.order.index(running[t])):
+                        name = running.pop(task)
+                        values[name] = task.result()
+                        self._save(input_hash, name, values[name])
+                        ready.extend(self._release(name, waiting))
+            finally:
+                # A failed step cancels the ones still running alongside it
+                for task in running:
+                    task.cancel()
+                if running:
+                    await asyncio.gather(*running, return_exceptions=True)
+                self._flush()
+
+            del values[CHAIN_INPUT]
+            return values
+
+    async def run_many(
+        self,
+        inputs: Iterable[str],
+        concurrency: Union[int, Dict[str, int]] = DEFAULT_STAGE_CONCURRENCY,
+        ordered: bool = True,
+        queue_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the chain over many inputs as a pipeline.
+
+        Every step is a stage with its own worker pool and bounded queue: while
+        one item is in step 2, the next is already in step 1. A full queue
+        blocks the stage feeding it, and at most ``max_in_flight`` items are
+        between the input and the consumer, so memory stays flat and a slow
+        consumer slows the pipeline down instead of buffering results.
+
+        A step failure fails only that item: it is yielded with an "error"
+        and its remaining steps are skipped. With a checkpoint, a rerun
+        of the batch skips the steps each item already finished.
+
+        Args:
+            inputs: The chain inputs (any iterable, read lazily)
+            concurrency: Workers per step, either one number for every step or
+                         {step name: workers} (unlisted steps get DEFAULT_STAGE_CONCURRENCY).
+                         Tuple steps are named "0", "1", ...
+            ordered: Yield results in input order (True) or as they finish (False)
+            queue_size: Items waiting in front of each step (defaults to twice its workers)
+            max_in_flight: Items started but not yet yielded (defaults to four times all workers)
+
+        Returns:
+            Async iterator of {"index": int, "input": str, "output": str or None, "error": str (on failure)}
+        """
+        if isinstance(concurrency, dict):
+            workers = {name: concurrency.get(name, DEFAULT_STAGE_CONCURRENCY) for name in self.order}
+        else:
+            workers = {name: concurrency for name in self.order}
+        if min(workers.values(), default=1) < 1:
+            raise ValueError("PromptChain stage concurrency must be at least 1")
+        max_in_flight = max_in_flight or 4 * sum(workers.values())
+        if not self.nodes:
+            for idx, initial_input in enumerate(inputs):
+                yield {"index": idx, "input": initial_input, "output": initial_input}
+            return
+
+        queues = {name: asyncio.Queue(maxsize=queue_size or 2 * workers[name]) for name in self.order}
+        window = asyncio.Semaphore(max_in_flight)
+        results: asyncio.Queue = asyncio.Queue()
+        fed: List[int] = []
+
+        def finish(item: _PipelineItem) -> None:
+            result: Dict[str, Any] = {"index": item.index, "input": item.input, "output": None}
+            if item.error is not None:
+                result["error"] = item.error
+            else:
+                result["output"] = "\n\n".join(item.values[name] for name in self.output)
+            item.values = {}
+            results.put_nowait(result)
+
+        async def feed() -> None:
+            for idx, initial_input in enumerate(inputs):
+                await window.acquire()
+                item = _PipelineItem(idx, initial_input, *self._restore(initial_input))
+                if not item.remaining:
+                    finish(item)  # every step restored from the checkpoint
+                for name, sources in item.waiting.items():
+                    if not sources:
+                        await queues[name].put(item)
+                fed.append(idx)
+            results.put_nowait(len(fed))
+
+        async def work(name: str) -> None:
+            step, queue = self.nodes[name], queues[name]
+            while True:
+                item = await queue.get()
+                if item.error is not None:
+                    continue  # another branch of this item already failed
+                try:
+                    output = await self._run_step(step, item.values)
+                except Exception as e:
+                    # A parallel branch may have failed while this one ran; finish once
+                    if item.error is None:
+                        item.error = str(e)
+                        finish(item)
+                    continue
+                self._save(item.input_hash, name, output)
+                if item.error is not None:
+                    continue  # kept in the checkpoint, but the item already finished
+                item.values[name] = output
+                item.remaining -= 1
+                if not item.remaining:
+                    finish(item)
+                    continue
+                for successor in self.graph.successors(name):
+                    if successor not in item.waiting:
+                        continue
+                    item.waiting[successor].discard(name)
+                    if not item.waiting[successor]:
+                        await queues[successor].put(item)
+
+        async def supervise() -> None:
+            # Workers only stop by failing (a checkpoint write, or a BaseException
+            # out of a plugin); report that instead of leaving their items unfinished
+            tasks = [asyncio.ensure_future(feed())]
+            tasks += [asyncio.ensure_future(work(name)) for name in self.order for _ in range(workers[name])]
+            pending = set(tasks)
+            try:
+                while pending:
+                    finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in finished:
+                        if task.cancelled():
+                            error: BaseException = RuntimeError("stage worker was cancelled")
+                        elif task.exception() is not None:
+                            error = task.exception()
+                        else:
+                            continue  # the feeder ran out of inputs
+                        results.put_nowait(error)
+                        return
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        supervisor = asyncio.ensure_future(supervise())
+        total: Optional[int] = None
+        emitted = 0
+        next_index = 0
+        reorder: Dict[int, Dict[str, Any]] = {}
+        try:
+            while total is None or emitted < total:
+                result = await results.get()
+                if isinstance(result, BaseException):
+                    raise RuntimeError(f"PromptChain run_many error: {result}") from result
+                if isinstance(result, int):
+                    total = result
+                    continue
+                if not ordered:
+                    emitted += 1
+                    window.release()
+                    yield result
+                    continue
+                reorder[result["index"]] = result
+                while next_index in reorder:
+                    emitted += 1
+                    window.release()
+                    yield reorder.pop(next_index)
+                    next_index += 1
+        finally:
+            if not supervisor.done():
+                supervisor.cancel()
+                await asyncio.gather(supervisor, return_exceptions=True)
+            self._flush()
+
+    def _release(self, finished: str, waiting: Dict[str, set]) -> List[str]:
+        """Mark a step finished and return the steps that became ready."""
+        ready = []
+        for name in self.graph.successors(finished):
+            if name not in waiting:
+                continue  # restored from a checkpoint
+            waiting[name].discard(finished)
+            if not waiting[name]:
+                ready.append(name)
+        return ready
+
+    async def _run_step(self, step: ChainStep, values: Dict[str, str]) -> str:
+        # Format the prompt with the outputs this step reads
+        prompt = step.template.format(**{placeholder: values[source] for placeholder, source in step.inputs.items()})
+        if step.plugin is None:
+            return prompt
+
+        # For demonstration, we wrap the prompt in a minimal "messages" structure
+        # if your plugin uses an interface like plugin.generate_response(messages).
+        messages = [{"role": "user", "content": prompt}]
+
+        plugin_name = getattr(step.plugin, "name", type(step.plugin).__name__)
+        with TRACER.span("PromptChain.step", step=step.name, plugin=plugin_name) as span:
+            start = time.perf_counter()
+            try:
+                response = await step.plugin.generate_response(messages=messages)
             except Exception as e:
+                if METRICS.enabled:
+                    METRICS.record_step("PromptChain", step.name, time.perf_counter() - start, error=True)
                 # Basic error handling: you can log or decide how to proceed
-                raise RuntimeError(f"Error in PromptChain step {idx}: {e}")
-
-            # The plugin response is expected to be a dict with "content" or similar.
-            # Adjust to your plugin’s actual return schema.
-            output_text = response.get("content", "")
-            
-            # Move on to the next step
-            current_input = output_text
+                raise RuntimeError(f"Error in PromptChain step {step.name}: {e}")
+            if METRICS.enabled:
+                METRICS.record_step("PromptChain", step.name, time.perf_counter() - start)
+            span.record_response(response)
 
-        # Return the final output
-        return current_input
+        # The plugin response is expected to be a dict with "content" or similar.
+        # Adjust to your plugin’s actual return schema.
+        return response.get("content", "")
@@ -0,0 +1,315 @@
+"""
+Framework-overhead micro-benchmarks.
+
+Measures the time aho itself adds around provider calls, using a
+zero-latency fake plugin, so numbers can be compared between commits.
+
+Usage:
+    python benchmarks/run.py                          # default sizes, writes benchmarks/results.json
+    python benchmarks/run.py --quick                  # smaller sizes and fewer rounds
+    python benchmarks/run.py --full                   # adds 1M-item memory benchmarks
+    python benchmarks/run.py --only memory,chain      # subset by group
+    python benchmarks/run.py --compare old.json       # flag regressions against an earlier run
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+class NullPlugin:
+    """Zero-latency plugin: returns a constant response without awaiting anything."""
+
+    def __init__(self, name: str = "null"):
+        self.name = name
+        self.model = "null"
+        self._response = {"content": "ok", "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}}
+
+    async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+        return self._response
+
+
+class Runner:
+    """Times benchmark bodies and collects results."""
+
+    def __init__(self, rounds: int, min_time: float):
+        self.rounds = rounds
+        self.min_time = min_time
+        self.results: List[Dict[str, Any]] = []
+
+    def _calibrate(self, run: Callable[[int], float]) -> int:
+        # Grow the per-round iteration count until a round takes min_time
+        number = 1
+        while run(number) < self.min_time and number < 1_000_000:
+            number *= 10
+        return number
+
+    def record(self, group: str, name: str, params: Dict[str, Any], per_op: List[float], number: int) -> None:
+        result = {
+            "group": group,
+            "name": name,
+            "params": params,
+            "iterations": number,
+            "rounds": len(per_op),
+            "median_us": statistics.median(per_op) * 1e6,
+            "min_us": min(per_op) * 1e6,
+            "mean_us": statistics.fmean(per_op) * 1e6,
+            "stdev_us": (statistics.stdev(per_op) if len(per_op) > 1 else 0.0) * 1e6,
+        }
+        self.results.append(result)
+        label = ", ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{group:>10} {name:<32} {label:<24} {result['median_us']:>12.2f} us/op")
+
+    def skip(self, group: str, name: str, params: Dict[str, Any], error: BaseException) -> None:
+        self.results.append({"group": group, "name": name, "params": params, "error": f"{type(error).__name__}: {error}"})
+        print(f"{group:>10} {name:<32} skipped: {type(error).__name__}: {error}")
+
+    def sync(self, group: str, name: str, fn: Callable[[], Any], number: Optional[int] = None, **params: Any) -> None:
+        """Benchmark a synchronous callable."""
+        def run(n: int) -> float:
+            start = time.perf_counter()
+            for _ in range(n):
+                fn()
+            return time.perf_counter() - start
+
+        try:
+            number = number or self._calibrate(run)
+            per_op = [run(number) / number for _ in range(self.rounds)]
+        except Exception as e:
+            self.skip(group, name, params, e)
+            return
+        self.record(group, name, params, per_op, number)
+
+    def coroutine(
+        self,
+        group: str,
+        name: str,
+        fn: Callable[[], Awaitable[Any]],
+        number: Optional[int] = None,
+        **params: Any
+    ) -> None:
+        """Benchmark an async callable, awaited sequentially on one event loop."""
+        loop = asyncio.new_event_loop()
+
+        def run(n: int) -> float:
+            async def body() -> float:
+                start = time.perf_counter()
+                for _ in range(n):
+                    await fn()
+                return time.perf_counter() - start
+            return loop.run_until_complete(body())
+
+        try:
+            number = number or self._calibrate(run)
+            per_op = [run(number) / number for _ in range(self.rounds)]
+        except Exception as e:
+            self.skip(group, name, params, e)
+            return
+        finally:
+            loop.close()
+        self.record(group, name, params, per_op, number)
+
+
+def bench_import(runner: Runner, sizes: Dict[str, List[int]]) -> None:
+    modules = ["aho", "aho.plugins.base", "aho.workflows", "aho.core"]
+    for module in modules:
+        code = f"import time; s = time.perf_counter(); import {module}; print(time.perf_counter() - s)"
+        samples = []
+        try:
+            for _ in range(runner.rounds):
+                out = subprocess.run(
+                    [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+                )
+                samples.append(float(out.stdout.strip().splitlines()[-1]))
+        except subprocess.CalledProcessError as e:
+            last_line = (e.stderr.strip().splitlines() or ["import failed"])[-1]
+            runner.skip("import", f"import {module}", {}, RuntimeError(last_line))
+            continue
+        runner.record("import", f"import {module}", {}, samples, 1)
+
+
+def bench_chain(runner: Runner, sizes: Dict[str, List[int]]) -> None:
+    from aho.workflows import PromptChain
+    for steps in sizes["chain_steps"]:
+        chain = PromptChain([(NullPlugin(), "Step: {input}") for _ in range(steps)])
+        runner.coroutine("chain", "PromptChain.run", lambda: chain.run("hello"), steps=steps)
+
+
+def bench_parallel(runner: Runner, sizes: Dict[str, List[int]]) -> None:
+    from aho.workflows import ParallelProcessor
+    for fan_out in sizes["fan_out"]:
+        processor = ParallelProcessor([NullPlugin(f"p{i}") for i in range(fan_out)])
+
+        async def run() -> None:
+            result = await processor.run("hello")
+            result.majority_vote
+
+        runner.coroutine("parallel", "ParallelProcessor.run+vote", run, plugins=fan_out)
+
+
+def bench_memory(runner: Runner, sizes: Dict[str, List[int]]) -> None:
+    try:
+        from aho.core.memory import Memory
+    except Exception as e:
+        for items in sizes["memory_items"]:
+            runner.skip("memory", "Memory", {"items": items}, e)
+        return
+
+    for items in sizes["memory_items"]:
+        memory = Memory(max_items=items)
+        for i in range(items):
+            memory.store(f"key_{i}", {"role": "user", "content": f"message {i}"})
+        counter = iter(range(items, 1 << 62))
+        runner.sync("memory", "Memory.store (full)", lambda: memory.store(f"key_{next(counter)}", "value"), items=items)
+        runner.sync("memory", "Memory.retrieve (oldest)", lambda: memory.retrieve(f"key_{items}"), items=items)
+        runner.sync("memory", "Memory.retrieve_relevant", lambda: memory.retrieve_relevant("message", limit=5), items=items)
+
+
+def bench_registry(runner: Runner, sizes: Dict[str, List[int]]) -> None:
+    try:
+        from aho.tools.utils.registry import ToolRegistry
+    except Exception as e:
+        runner.skip("tools", "ToolRegistry", {}, e)
+        return
+    names = list(ToolRegistry.get_all_tools()) or ["missing"]
+    runner.sync("tools", "ToolRegistry.get_tool", lambda: ToolRegistry.get_tool(names[0]), tools=len(names))
+    runner.sync("tools", "ToolRegistry.get_all_tools", ToolRegistry.get_all_tools, tools=len(names))
+
+
+def bench_faiss(runner: Runner, sizes: Dict[str, List[int]]) -> None:
+    import numpy as np
+    dimension = 384
+    rng = np.random.default_rng(0)
+    try:
+        from aho.tools.vector.faiss_vector import FaissVectorTool
+    except Exception as e:
+        for corpus in sizes["corpus"]:
+            runner.skip("faiss", "FaissVectorTool", {"docs": corpus}, e)
+        return
+
+    # Precomputed embeddings isolate the tool's overhead from the embedding model
+    def embed(text: str) -> "np.ndarray":
+        return vectors[hash(text) % len(vectors)]
+
+    for corpus in sizes["corpus"]:
+        vectors = rng.standard_normal((corpus, dimension), dtype=np.float32)
+        docs = [f"doc {i}" for i in range(corpus)]
+
+        async def index() -> None:
+            tool = FaissVectorTool(embed, dimension=dimension)
+            await tool.execute(operation="index", docs=docs)
+
+        runner.coroutine("faiss", "FaissVectorTool index", index, number=1, docs=corpus)
+
+        try:
+            tool = FaissVectorTool(embed, dimension=dimension)
+            asyncio.run(tool.execute(operation="index", docs=docs))
+        except Exception as e:
+            runner.skip("faiss", "FaissVectorTool query", {"docs": corpus}, e)
+            continue
+        runner.coroutine("faiss", "FaissVectorTool query", lambda: tool.execute(operation="query", query="doc 1", k=5), docs=corpus)
+
+
+GROUPS: Dict[str, Callable[[Runner, Dict[str, List[int]]], None]] = {
+    "import": bench_import,
+    "chain": bench_chain,
+    "parallel": bench_parallel,
+    "memory": bench_memory,
+    "tools": bench_registry,
+    "faiss": bench_faiss,
+}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: Path, threshold: float) -> int:
+    """Print changes against a baseline run; returns the number of regressions."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def key(result: Dict[str, Any]) -> str:
+        return f"{result['group']}/{result['name']}/{json.dumps(result['params'], sort_keys=True)}"
+
+    previous = {key(r): r for r in baseline["results"] if "median_us" in r}
+    regressions = 0
+    print(f"\nCompared with {baseline_path} ({baseline.get('git_revision')}):")
+    for result in results:
+        old = previous.get(key(result))
+        if old is None or "median_us" not in result:
+            continue
+        change = result["median_us"] / old["median_us"] - 1 if old["median_us"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"  {key(result):<72} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="aho framework-overhead benchmarks")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer rounds")
+    parser.add_argument("--full", action="store_true", help="include 1M-item memory benchmarks")
+    parser.add_argument("--only", help="comma-separated groups: " + ",".join(GROUPS))
+    parser.add_argument("--output", default=str(ROOT / "benchmarks" / "results.json"), help="results JSON path")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = {
+        "chain_steps": [1, 5, 20],
+        "fan_out": [1, 10, 100],
+        "memory_items": [1_000, 10_000, 100_000],
+        "corpus": [1_000, 10_000, 100_000],
+    }
+    if args.quick:
+        sizes = {"chain_steps": [1, 5], "fan_out": [1, 10, 100], "memory_items": [1_000, 10_000], "corpus": [1_000]}
+    if args.full:
+        sizes["memory_items"].append(1_000_000)
+
+    runner = Runner(rounds=3 if args.quick else 7, min_time=0.02 if args.quick else 0.1)
+    groups = args.only.split(",") if args.only else list(GROUPS)
+    for group in groups:
+        try:
+            GROUPS[group](runner, sizes)
+        except Exception:
+            print(f"Benchmark group {group} failed:\n{traceback.format_exc()}")
+
+    output = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "results": runner.results,
+    }
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"\nWrote {len(runner.results)} results to {args.output}")
+
+    if args.compare:
+        return 1 if compare(runner.results, Path(args.compare), args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import unittest
+
+from aho.utils.context import ContextBuilder, Tokenizer, context_window_for
+
+
+class FakeConfig:
+    model = "llama2"
+    num_ctx = 2048
+
+
+class FakeLLM:
+    config = FakeConfig()
+
+
+class TestContextBuilder(unittest.TestCase):
+    def setUp(self):
+        self.builder = ContextBuilder(context_window=200, reserve_output=50, tokenizer=Tokenizer())
+
+    def prompt_tokens(self, messages):
+        return sum(self.builder.message_tokens(m) for m in messages)
+
+    def test_messages_fit_budget(self):
+        context = [f"fact {i}: " + "x" * 100 for i in range(50)]
+        messages = self.builder.build(user="question?", system="Be brief.", context=context)
+
+        self.assertLessEqual(self.prompt_tokens(messages), 150)
+        self.assertEqual(messages[0]["content"], "Be brief.")
+        self.assertEqual(messages[-1], {"role": "user", "content": "question?"})
+        self.assertIn("fact 0", messages[1]["content"])
+        self.assertGreater(self.builder.last_stats["context_items_dropped"], 0)
+
+    def test_dedupes_and_truncates_items(self):
+        packed = self.builder.pack(["same  fact", "Same fact", "y" * 1000, "tail"], budget=60)
+        self.assertEqual(packed[0], "same  fact")
+        self.assertEqual(len(packed), 3)
+        self.assertTrue(packed[1].endswith("…"))
+        self.assertLessEqual(self.builder.tokenizer.count(packed[1]), 30)
+
+    def test_oversized_user_message_is_truncated(self):
+        messages = self.builder.build(user="z" * 5000, context=["unused"])
+        self.assertEqual(len(messages), 1)
+        self.assertLessEqual(self.prompt_tokens(messages), 150)
+
+    def test_context_window_for_llm(self):
+        self.assertEqual(context_window_for(FakeLLM()), 2048)
+        self.assertEqual(context_window_for(model="gpt-4o-mini"), 128000)
+        self.assertEqual(context_window_for(model="gpt-4-0613"), 8192)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import urllib.request
+
+from aho.plugins.base import BasePlugin
+from aho.plugins.cache import CachedPlugin
+from aho.plugins.replay import ReplayPlugin
+from aho.plugins.resilience import ResiliencePolicy, ResilientPlugin
+from aho.utils.metrics import METRICS, MetricsRegistry
+from aho.workflows import PromptChain
+
+
+class UsagePlugin(BasePlugin):
+    name = "usage_plugin"
+    model = "fake-1"
+
+    def __init__(self, failures=0):
+        self.failures = failures
+
+    async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("flaky")
+        return {"content": "ok", "usage": {"prompt_tokens": 7, "completion_tokens": 3}}
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_prometheus_text_format(self):
+        registry = MetricsRegistry(enabled=True)
+        registry.record_plugin_call("p", "m", 0.2, {"input_tokens": 5, "output_tokens": 2})
+        text = registry.render()
+
+        self.assertIn("# TYPE aho_plugin_request_seconds histogram", text)
+        self.assertIn('aho_plugin_requests_total{plugin="p",model="m",status="ok"} 1', text)
+        self.assertIn('aho_plugin_request_seconds_bucket{plugin="p",model="m",le="0.25"} 1', text)
+        self.assertIn('aho_plugin_request_seconds_bucket{plugin="p",model="m",le="+Inf"} 1', text)
+        self.assertIn('aho_plugin_tokens_total{plugin="p",model="m",direction="in"} 5', text)
+
+    def test_http_endpoint(self):
+        registry = MetricsRegistry()
+        server = registry.serve(port=0)
+        try:
+            registry.record_tool("search", 0.01, success=False)
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            body = urllib.request.urlopen(url, timeout=5).read().decode()
+        finally:
+            registry.stop_serving()
+        self.assertIn('aho_tool_executions_total{tool="search",status="error"} 1', body)
+
+
+class TestInstrumentation(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        METRICS.enable()
+
+    def tearDown(self):
+        METRICS.disable()
+
+    async def test_plugin_calls_retries_and_tokens(self):
+        plugin = ResilientPlugin(UsagePlugin(failures=1), ResiliencePolicy(backoff_base=0.001))
+        await plugin.generate_response([{"role": "user", "content": "hi"}])
+
+        self.assertEqual(METRICS.plugin_retries.value(plugin="usage_plugin"), 1)
+        self.assertEqual(METRICS.plugin_requests.value(plugin="usage_plugin", model="fake-1", status="ok"), 1)
+        self.assertEqual(METRICS.plugin_tokens.value(plugin="usage_plugin", model="fake-1", direction="out"), 3)
+
+    async def test_every_plugin_request_recorded_once(self):
+        class Stacked(UsagePlugin):
+            name = "stacked"
+
+        class Subclass(Stacked):
+            async def generate_response(self, messages, **kwargs):
+                return await super().generate_response(messages, **kwargs)
+
+        def requests(plugin, status="ok", model="fake-1"):
+            return METRICS.plugin_requests.value(plugin=plugin, model=model, status=status)
+
+        plugin = CachedPlugin(ResilientPlugin(Stacked(failures=1), ResiliencePolicy(backoff_base=0.001)))
+        for _ in range(2):
+            await plugin.generate_response([{"role": "user", "content": "hi"}], temperature=0)
+        # One failed and one successful attempt; the cache hit reached no service
+        self.assertEqual((requests("stacked"), requests("stacked", "error")), (1, 1))
+
+        await Subclass().generate_response([{"role": "user", "content": "hi"}])
+        self.assertEqual(requests("stacked"), 2)
+
+        # Plugins without a resilience policy are covered too
+        before = requests("ReplayPlugin", model="")
+        await ReplayPlugin(seed=1).generate_response([{"role": "user", "content": "hi"}])
+        self.assertEqual(requests("ReplayPlugin", model="") - before, 1)
+
+    async def test_tool_executions_recorded_outside_memory(self):
+        from aho.tools.base import Tool, ToolResponse
+
+        class EchoTool(Tool):
+            name = "metrics_echo"
+            description = "Echoes its input"
+
+            async def execute(self, text: str = "") -> ToolResponse:
+                if not text:
+                    raise ValueError("nothing to echo")
+                return ToolResponse(result=text)
+
+            def _get_parameters_schema(self):
+                return {}
+
+        tool = EchoTool()
+        await tool.execute(text="hi")
+        with self.assertRaises(ValueError):
+            await tool.execute()
+        self.assertEqual(METRICS.tool_executions.value(tool="metrics_echo", status="ok"), 1)
+        self.assertEqual(METRICS.tool_executions.value(tool="metrics_echo", status="error"), 1)
+
+    async def test_stream_records_time_to_first_token(self):
+        plugin = UsagePlugin()
+        async for _ in plugin.generate_stream([{"role": "user", "content": "hi"}]):
+            pass
+        self.assertGreaterEqual(METRICS.plugin_ttft.count(plugin="usage_plugin", model="fake-1"), 1)
+
+    async def test_prompt_chain_steps(self):
+        chain = PromptChain([(UsagePlugin(), "{input}"), (UsagePlugin(), "again: {input}")])
+        before = METRICS.workflow_step_latency.count(workflow="PromptChain", step="1")
+        await chain.run("start")
+        self.assertEqual(METRICS.workflow_step_latency.count(workflow="PromptChain", step="1"), before + 1)
+
+    async def test_disabled_records_nothing(self):
+        METRICS.disable()
+        before = METRICS.render()
+        await UsagePlugin().generate_response([{"role": "user", "content": "hi"}])
+        await PromptChain([(UsagePlugin(), "{input}")]).run("x")
+        self.assertEqual(METRICS.render(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,888 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import httpx
+
+from aho.plugins.azureai_plugin import AzureAIPlugin
+from aho.plugins.base import BasePlugin, LLMResponse
+from aho.plugins.cache import CachedPlugin, ResponseCache, make_request_key
+from aho.plugins.failover import CircuitBreaker, CircuitOpenError, FailoverPlugin
+from aho.plugins.rate_limit import RateLimitedPlugin, RateLimiter, TokenBucket, get_rate_limiter
+from aho.plugins.resilience import ResiliencePolicy, ResilientPlugin, RetryBudget
+from aho.plugins.single_flight import SingleFlightPlugin
+from aho.plugins.transport import AsyncHTTPTransport, HTTPTransportConfig, get_shared_transport
+
+
+def completion_payload(content):
+    return {
+        "choices": [{"message": {"content": content}}],
+        "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}
+    }
+
+
+class TestAsyncHTTPTransport(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_overlap(self):
+        async def handler(request):
+            await asyncio.sleep(0.2)
+            return httpx.Response(200, json=completion_payload("ok"))
+
+        transport = AsyncHTTPTransport(http_transport=httpx.MockTransport(handler))
+        plugin = AzureAIPlugin(api_key="key", endpoint="https://azure.test", transport=transport)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            plugin.generate_response([{"role": "user", "content": "hi"}])
+            for _ in range(5)
+        ])
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual([r["content"] for r in results], ["ok"] * 5)
+        self.assertLess(elapsed, 0.6)
+        await transport.aclose()
+
+    async def test_one_pool_per_host(self):
+        transport = AsyncHTTPTransport()
+        a = transport.client_for("https://a.test/v1/x")
+        self.assertIs(a, transport.client_for("https://a.test/v1/y"))
+        self.assertIsNot(a, transport.client_for("https://b.test/v1/x"))
+        await transport.aclose()
+
+    def test_shared_transport_per_config(self):
+        config = HTTPTransportConfig(max_connections=5)
+        self.assertIs(get_shared_transport(config), get_shared_transport(HTTPTransportConfig(max_connections=5)))
+        self.assertIsNot(get_shared_transport(config), get_shared_transport())
+
+
+class TestTransportAcrossLoops(unittest.TestCase):
+    def test_clients_closed_when_their_loop_ends(self):
+        transport = AsyncHTTPTransport(http_transport=httpx.MockTransport(lambda request: httpx.Response(200, json={})))
+
+        async def call():
+            await transport.post_json("https://a.test/v1", {})
+            return transport.client_for("https://a.test/v1")
+
+        first = asyncio.run(call())
+        self.assertTrue(first.is_closed)
+        second = asyncio.run(call())
+        self.assertIsNot(first, second)
+        self.assertTrue(second.is_closed)
+
+
+class TestSharedSDKClients(unittest.TestCase):
+    def test_plugins_share_async_client(self):
+        openai = __import__("pytest").importorskip("openai")
+        from aho.plugins.openai_plugin import OpenAIPlugin
+
+        first = OpenAIPlugin(api_key="key", model="gpt-4o")
+        second = OpenAIPlugin(api_key="key", model="gpt-4o-mini")
+        other = OpenAIPlugin(api_key="key", transport_config=HTTPTransportConfig(max_connections=5))
+
+        self.assertIsInstance(first.client, openai.AsyncOpenAI)
+        self.assertIs(first.client, second.client)
+        self.assertIsNot(first.client, other.client)
+
+    def test_shared_client_per_event_loop(self):
+        __import__("pytest").importorskip("openai")
+        from aho.plugins.openai_plugin import OpenAIPlugin
+
+        plugin = OpenAIPlugin(api_key="loop-key")
+
+        async def current():
+            return plugin.client, plugin.client
+
+        first, again = asyncio.run(current())
+        self.assertIs(first, again)
+        self.assertTrue(first.is_closed())
+        second, _ = asyncio.run(current())
+        self.assertIsNot(first, second)
+        self.assertTrue(second.is_closed())
+
+
+class TestLLMResponse(unittest.TestCase):
+    def test_behaves_like_response_dict(self):
+        response = LLMResponse(content="hi", usage={"total_tokens": 3}, model="m")
+        response["served_by"] = "primary"
+
+        self.assertEqual(response["content"], "hi")
+        self.assertEqual(response.get("usage"), {"total_tokens": 3})
+        self.assertIsNone(response.get("raw_response"))
+        self.assertEqual(response.get("missing", "default"), "default")
+        self.assertEqual(dict(response)["served_by"], "primary")
+        self.assertFalse(hasattr(response, "__dict__"))
+
+    def test_openai_response_drops_raw_payload_by_default(self):
+        __import__("pytest").importorskip("openai")
+        from openai.types.chat import ChatCompletion
+        from aho.plugins.openai_plugin import OpenAIPlugin
+
+        completion = ChatCompletion(
+            id="c1", object="chat.completion", created=0, model="gpt-4o",
+            choices=[{
+                "index": 0, "finish_reason": "tool_calls",
+                "message": {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": "t1", "type": "function", "function": {"name": "add", "arguments": "{}"}
+                }]}
+            }],
+            usage={"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7}
+        )
+
+        response = OpenAIPlugin(api_key="key", client=object())._process_response(completion)
+        self.assertIsNone(response.raw_response)
+        self.assertEqual(response.tool_calls[0]["function"]["name"], "add")
+        self.assertEqual(response.finish_reason, "tool_calls")
+
+        raw = OpenAIPlugin(api_key="key", client=object(), keep_raw=True)._process_response(completion)
+        self.assertIs(raw.raw_response, completion)
+
+
+class TestPromptCaching(unittest.TestCase):
+    messages = [
+        {"role": "user", "content": "hello"},
+        {"role": "system", "content": "long system prompt"},
+        {"role": "system", "content": "pinned memory"},
+    ]
+    tools = [
+        {"name": "search", "input_schema": {"type": "object"}, "description": "Search"},
+        {"description": "Add", "name": "add", "input_schema": {"type": "object"}},
+    ]
+
+    def test_anthropic_marks_stable_prefix(self):
+        __import__("pytest").importorskip("anthropic")
+        from aho.plugins.anthropic_plugin import ClaudePlugin
+
+        plugin = ClaudePlugin(api_key="key", client=object())
+        params = plugin._build_params(self.messages, 0.0, None, self.tools)
+
+        self.assertEqual([block["text"] for block in params["system"]], ["long system prompt", "pinned memory"])
+        self.assertNotIn("cache_control", params["system"][0])
+        self.assertEqual(params["system"][-1]["cache_control"], {"type": "ephemeral"})
+        self.assertEqual([tool["name"] for tool in params["tools"]], ["add", "search"])
+        self.assertEqual(params["tools"][-1]["cache_control"], {"type": "ephemeral"})
+        self.assertEqual(params["messages"], [{"role": "user", "content": "hello"}])
+
+    def test_openai_layout_is_stable(self):
+        __import__("pytest").importorskip("openai")
+        from aho.plugins.openai_plugin import OpenAIPlugin
+
+        plugin = OpenAIPlugin(api_key="key", client=object())
+        first = plugin._build_params(self.messages, 0.0, None, self.tools)
+        second = plugin._build_params(self.messages, 0.0, None, list(reversed(self.tools)))
+
+        self.assertEqual([m["role"] for m in first["messages"]], ["user", "system", "system"])
+        self.assertEqual(json.dumps(first["tools"]), json.dumps(second["tools"]))
+
+        hoisting = OpenAIPlugin(api_key="key", client=object(), hoist_system_messages=True)
+        hoisted = hoisting._build_params(self.messages, 0.0, None, self.tools)
+        self.assertEqual([m["role"] for m in hoisted["messages"]], ["system", "system", "user"])
+
+    def test_later_system_messages_stay_in_place(self):
+        from aho.plugins.base import stable_prefix_layout
+
+        messages = [
+            {"role": "system", "content": "system prompt"},
+            {"role": "user", "content": "hello"},
+            {"role": "assistant", "content": "hi"},
+            {"role": "system", "content": "use the search tool for dates"},
+            {"role": "user", "content": "when is easter?"},
+        ]
+        laid_out, _ = stable_prefix_layout(messages)
+        self.assertEqual(laid_out, messages)
+        hoisted, _ = stable_prefix_layout(messages, hoist_system=True)
+        self.assertEqual([m["role"] for m in hoisted], ["system", "system", "user", "assistant", "user"])
+
+    def test_usage_reports_cache_tokens(self):
+        __import__("pytest").importorskip("anthropic")
+        from types import SimpleNamespace
+        from aho.plugins.anthropic_plugin import normalize_usage
+
+        usage = normalize_usage(SimpleNamespace(
+            input_tokens=10, output_tokens=5, cache_read_input_tokens=3000, cache_creation_input_tokens=0
+        ))
+        self.assertEqual(usage["cache_read_tokens"], 3000)
+        self.assertEqual(usage["cache_write_tokens"], 0)
+        self.assertEqual(usage["total_tokens"], 3015)
+
+
+class EchoPlugin(BasePlugin):
+    model = "echo"
+
+    async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+        return {
+            "content": messages[-1]["content"],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }
+
+
+class CountingPlugin(EchoPlugin):
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return await super().generate_response(messages, temperature, max_tokens, tools)
+
+
+class TestGenerateStream(unittest.IsolatedAsyncioTestCase):
+    async def test_fallback_stream(self):
+        plugin = EchoPlugin()
+        chunks = [c async for c in plugin.generate_stream([{"role": "user", "content": "hello"}])]
+
+        self.assertEqual([c.content for c in chunks], ["hello", ""])
+        self.assertEqual(chunks[-1].usage["total_tokens"], 2)
+        self.assertIsNotNone(chunks[-1].time_to_first_token)
+
+    async def test_concurrent_streams_report_their_own_ttft(self):
+        class SlowStart(EchoPlugin):
+            async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+                await asyncio.sleep(float(messages[-1]["content"]))
+                return await super().generate_response(messages, temperature, max_tokens, tools)
+
+        plugin = SlowStart()
+
+        async def final_chunk(delay):
+            return [c async for c in plugin.generate_stream([{"role": "user", "content": delay}])][-1]
+
+        slow, fast = await asyncio.gather(final_chunk("0.1"), final_chunk("0"))
+        self.assertGreaterEqual(slow.time_to_first_token, 0.1)
+        self.assertLess(fast.time_to_first_token, 0.1)
+        self.assertFalse(hasattr(plugin, "last_time_to_first_token"))
+
+    async def test_azure_sse_stream(self):
+        events = [
+            {"choices": [{"delta": {"content": "Hel"}}]},
+            {"choices": [{"delta": {"tool_calls": [{"index": 0, "id": "c1", "function": {"name": "f", "arguments": "{\"a\""}}]}}]},
+            {"choices": [{"delta": {"content": "lo"}, "finish_reason": "stop"}]},
+            {"choices": [], "usage": {"prompt_tokens": 4, "completion_tokens": 2, "total_tokens": 6}},
+        ]
+        body = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+
+        async def handler(request):
+            self.assertTrue(json.loads(request.content)["stream"])
+            return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+
+        transport = AsyncHTTPTransport(http_transport=httpx.MockTransport(handler))
+        plugin = AzureAIPlugin(api_key="key", endpoint="https://azure.test", transport=transport)
+        chunks = [c async for c in plugin.generate_stream([{"role": "user", "content": "hi"}])]
+
+        self.assertEqual("".join(c.content for c in chunks), "Hello")
+        self.assertEqual(chunks[1].tool_call["name"], "f")
+        self.assertEqual(chunks[-1].usage["total_tokens"], 6)
+        self.assertEqual(chunks[-1].finish_reason, "stop")
+        await transport.aclose()
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+    messages = [{"role": "user", "content": "hello"}]
+
+    def test_key_ignores_dict_order(self):
+        a = make_request_key("m", [{"role": "user", "content": "x"}], 0, None, None)
+        b = make_request_key("m", [{"content": "x", "role": "user"}], 0, None, None)
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, make_request_key("m", [{"role": "user", "content": "x"}], 0.5, None, None))
+
+    async def test_hit_skips_plugin(self):
+        inner = CountingPlugin()
+        plugin = CachedPlugin(inner)
+        first = await plugin.generate_response(self.messages, temperature=0)
+        second = await plugin.generate_response(self.messages, temperature=0)
+
+        self.assertEqual(inner.calls, 1)
+        self.assertEqual(first["content"], second["content"])
+        self.assertTrue(second["cache_hit"])
+        self.assertEqual(plugin.model, "echo")
+
+    async def test_hits_keep_the_response_type(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.db")
+            cache = ResponseCache(db_path=path)
+            cache.set("k", LLMResponse(content="hi", usage={"total_tokens": 3}, served_by="primary"))
+            hit = cache.get("k")
+            self.assertIsInstance(hit, LLMResponse)
+            hit["cache_hit"] = True
+            self.assertNotIn("cache_hit", cache.get("k"))
+            cache.close()
+
+            from_disk = ResponseCache(db_path=path).get("k")
+            self.assertIsInstance(from_disk, LLMResponse)
+            self.assertEqual(from_disk["served_by"], "primary")
+
+            cache = ResponseCache()
+            cache.set("d", {"content": "plain"})
+            self.assertIs(type(cache.get("d")), dict)
+
+    async def test_deterministic_only(self):
+        inner = CountingPlugin()
+        plugin = CachedPlugin(inner, deterministic_only=True)
+        await plugin.generate_response(self.messages, temperature=0.7)
+        await plugin.generate_response(self.messages, temperature=0.7)
+        self.assertEqual(inner.calls, 2)
+
+    async def test_ttl_and_lru(self):
+        cache = ResponseCache(max_entries=1, ttl=0.05)
+        cache.set("a", {"content": "a"})
+        cache.set("b", {"content": "b"})
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b")["content"], "b")
+        await asyncio.sleep(0.06)
+        self.assertIsNone(cache.get("b"))
+
+    async def test_sqlite_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.db")
+            cache = ResponseCache(db_path=path)
+            await CachedPlugin(CountingPlugin(), cache).generate_response(self.messages, temperature=0)
+            cache.close()
+
+            inner = CountingPlugin()
+            restarted = ResponseCache(db_path=path)
+            response = await CachedPlugin(inner, restarted).generate_response(self.messages, temperature=0)
+            restarted.close()
+
+        self.assertEqual(inner.calls, 0)
+        self.assertEqual(response["content"], "hello")
+
+
+def bag_of_words(text, vocabulary=("capital", "france", "weather", "paris", "today", "what", "is")):
+    words = text.lower().replace("?", "").split()
+    return [float(words.count(term)) + 0.01 for term in vocabulary]
+
+
+class TestSemanticCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        __import__("pytest").importorskip("faiss")
+        from aho.plugins.semantic_cache import SemanticCache, SemanticCachePlugin
+        self.SemanticCache = SemanticCache
+        self.SemanticCachePlugin = SemanticCachePlugin
+
+    async def test_paraphrase_hits(self):
+        inner = CountingPlugin()
+        cache = self.SemanticCache(dimension=7, threshold=0.9)
+        plugin = self.SemanticCachePlugin(inner, bag_of_words, cache)
+
+        await plugin.generate_response([{"role": "user", "content": "What is the capital of France?"}])
+        hit = await plugin.generate_response([{"role": "user", "content": "capital of france is what"}])
+        await plugin.generate_response([{"role": "user", "content": "weather today"}])
+
+        self.assertEqual(inner.calls, 2)
+        self.assertTrue(hit["cache_hit"])
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "false_hits": 0, "size": 2})
+
+    async def test_namespaces_are_isolated(self):
+        inner = CountingPlugin()
+        cache = self.SemanticCache(dimension=7)
+        messages = [{"role": "user", "content": "capital of france"}]
+        await self.SemanticCachePlugin(inner, bag_of_words, cache, namespace="a").generate_response(messages)
+        await self.SemanticCachePlugin(inner, bag_of_words, cache, namespace="b").generate_response(messages)
+        self.assertEqual(inner.calls, 2)
+
+    async def test_generation_settings_partition_the_cache(self):
+        inner = CountingPlugin()
+        plugin = self.SemanticCachePlugin(inner, bag_of_words, self.SemanticCache(dimension=7))
+        messages = [{"role": "user", "content": "capital of france"}]
+        await plugin.generate_response(messages, temperature=0)
+        self.assertNotIn("cache_hit", await plugin.generate_response(messages, temperature=1.0))
+        self.assertTrue((await plugin.generate_response(messages, temperature=0))["cache_hit"])
+        self.assertEqual(inner.calls, 2)
+
+    def test_other_contexts_do_not_hide_a_match(self):
+        # The match is less similar than every entry stored under other contexts
+        cache = self.SemanticCache(dimension=7, threshold=0.85, search_k=2)
+        cache.store(bag_of_words("what is the capital of france today"), "mine", {"content": "Paris"}, context_key="mine")
+        for i in range(20):
+            cache.store(bag_of_words("what is the capital of france"), f"other {i}", {"content": "x"}, context_key=f"other {i}")
+
+        hit = cache.lookup(bag_of_words("what is the capital of france"), "what is the capital of france", context_key="mine")
+        self.assertEqual(hit[0], {"content": "Paris"})
+        self.assertIsNone(cache.lookup(bag_of_words("weather today"), "weather today", context_key="mine"))
+
+    def test_module_imports_without_faiss(self):
+        import importlib
+        import sys
+        from unittest import mock
+        import aho.plugins.semantic_cache as module
+
+        with mock.patch.dict(sys.modules, {"faiss": None}):
+            reloaded = importlib.reload(module)
+            with self.assertRaises(ImportError):
+                reloaded.SemanticCache(dimension=7)
+        importlib.reload(module)
+
+    def test_capacity_eviction_and_false_hits(self):
+        cache = self.SemanticCache(dimension=7, capacity=2, verifier=lambda new, old: False)
+        for text in ("capital france", "weather today", "paris"):
+            cache.store(bag_of_words(text), text, {"content": text})
+
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertIsNone(cache.lookup(bag_of_words("paris"), "paris"))
+        self.assertEqual(cache.stats()["false_hits"], 1)
+
+
+class FailingPlugin(EchoPlugin):
+    def __init__(self, error=None, delay=0.0):
+        self.calls = 0
+        self.error = error or RuntimeError("provider down")
+        self.delay = delay
+
+    async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        raise self.error
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def test_concurrent_identical_calls_coalesce(self):
+        inner = CountingPlugin(delay=0.05)
+        plugin = SingleFlightPlugin(inner)
+        results = await asyncio.gather(*[plugin.generate_response(self.messages) for _ in range(10)])
+
+        self.assertEqual(inner.calls, 1)
+        self.assertEqual(plugin.coalesced, 9)
+        self.assertEqual({r["content"] for r in results}, {"hello"})
+        self.assertEqual(plugin.in_flight, 0)
+
+        await plugin.generate_response(self.messages)
+        self.assertEqual(inner.calls, 2)
+
+    async def test_waiters_get_separate_copies_of_the_same_type(self):
+        class ResponsePlugin(CountingPlugin):
+            async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+                return LLMResponse(**await super().generate_response(messages, temperature, max_tokens, tools))
+
+        plugin = SingleFlightPlugin(ResponsePlugin(delay=0.01))
+        first, second = await asyncio.gather(*[plugin.generate_response(self.messages) for _ in range(2)])
+        self.assertIsInstance(first, LLMResponse)
+        self.assertIsInstance(second, LLMResponse)
+        first["served_by"] = "a"
+        self.assertNotIn("served_by", second)
+
+    async def test_waiters_share_exception(self):
+        inner = FailingPlugin(delay=0.02)
+        plugin = SingleFlightPlugin(inner)
+        results = await asyncio.gather(
+            *[plugin.generate_response(self.messages) for _ in range(3)],
+            return_exceptions=True
+        )
+        self.assertEqual(inner.calls, 1)
+        self.assertTrue(all(r is inner.error for r in results))
+
+    async def test_leader_cancellation_does_not_cancel_waiters(self):
+        plugin = SingleFlightPlugin(CountingPlugin(delay=0.05))
+        leader = asyncio.ensure_future(plugin.generate_response(self.messages))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(plugin.generate_response(self.messages))
+        await asyncio.sleep(0)
+        leader.cancel()
+        self.assertEqual((await follower)["content"], "hello")
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    def test_shared_limiter_takes_later_limits(self):
+        class Unlimited(EchoPlugin):
+            model = "shared-limit-test"
+
+        first = RateLimitedPlugin(Unlimited())
+        self.assertIsNone(first.limiter.requests)
+        second = RateLimitedPlugin(Unlimited(), requests_per_minute=60)
+        self.assertIs(first.limiter, second.limiter)
+        self.assertEqual(first.limiter.requests.per_minute, 60)
+
+        # Omitted limits keep the configured ones
+        RateLimitedPlugin(Unlimited(), tokens_per_minute=1000)
+        self.assertEqual(first.limiter.requests.per_minute, 60)
+        self.assertEqual(first.limiter.tokens.per_minute, 1000)
+
+        get_rate_limiter("Unlimited", "shared-limit-test", requests_per_minute=30)
+        self.assertEqual(first.limiter.requests.per_minute, 30)
+        self.assertLessEqual(first.limiter.requests.level, 30)
+
+    def test_wrapped_plugins_share_the_provider_limiter(self):
+        class Provider(EchoPlugin):
+            model = "wrapped-limit-test"
+
+        direct = RateLimitedPlugin(Provider(), requests_per_minute=60)
+        wrapped = RateLimitedPlugin(CachedPlugin(Provider()))
+        self.assertIs(direct.limiter, wrapped.limiter)
+
+    def test_token_bucket_wait_time(self):
+        bucket = TokenBucket(per_minute=600, capacity=1)
+        self.assertEqual(bucket.wait_time(1), 0)
+        bucket.consume(1)
+        self.assertAlmostEqual(bucket.wait_time(1), 0.1, places=2)
+
+    async def test_settle_overshoot_delays_next_call(self):
+        limiter = RateLimiter(tokens_per_minute=60_000)
+        reserved = await limiter.acquire(60_000)
+        limiter.settle(reserved, 60_100)
+
+        start = time.perf_counter()
+        await limiter.acquire(0)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.09)
+
+    async def test_settle_refund(self):
+        limiter = RateLimiter(tokens_per_minute=60_000)
+        reserved = await limiter.acquire(60_000)
+        limiter.settle(reserved, 100)
+        self.assertEqual(limiter._wait_time(50_000), 0)
+
+    async def test_cancelled_call_refunds_its_reservation(self):
+        limiter = RateLimiter(tokens_per_minute=6000)
+        plugin = RateLimitedPlugin(CountingPlugin(delay=1), limiter=limiter, default_completion_tokens=5000)
+        call = asyncio.ensure_future(plugin.generate_response([{"role": "user", "content": "hi"}]))
+        await asyncio.sleep(0.01)
+        self.assertGreater(limiter._wait_time(5000), 0)
+        call.cancel()
+        await asyncio.gather(call, return_exceptions=True)
+        self.assertEqual(limiter._wait_time(5000), 0)
+
+    async def test_plugin_queues_and_settles_usage(self):
+        limiter = RateLimiter(requests_per_minute=600)
+        limiter.requests.capacity = limiter.requests.level = 1
+        plugin = RateLimitedPlugin(CountingPlugin(), limiter=limiter)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[plugin.generate_response([{"role": "user", "content": "hi"}]) for _ in range(3)])
+        self.assertGreaterEqual(time.perf_counter() - start, 0.18)
+        self.assertEqual(plugin.plugin.calls, 3)
+
+
+class FlakyPlugin(EchoPlugin):
+    """Fails the first ``failures`` calls, then answers after ``delays[i]`` seconds."""
+
+    def __init__(self, failures=0, delays=None):
+        self.calls = 0
+        self.failures = failures
+        self.delays = delays or []
+
+    async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+        call = self.calls
+        self.calls += 1
+        if call < self.failures:
+            raise RuntimeError("transient")
+        await asyncio.sleep(self.delays[call] if call < len(self.delays) else 0)
+        return {"content": f"call {call}", "usage": {}}
+
+
+class TestResiliencePolicy(unittest.IsolatedAsyncioTestCase):
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def test_retries_then_succeeds(self):
+        policy = ResiliencePolicy(backoff_base=0.001, retry_budget=RetryBudget())
+        plugin = ResilientPlugin(FlakyPlugin(failures=2), policy)
+        response = await plugin.generate_response(self.messages)
+        self.assertEqual(response["content"], "call 2")
+        self.assertEqual(policy.retries, 2)
+
+    async def test_retry_budget_caps_retries(self):
+        policy = ResiliencePolicy(backoff_base=0.001, retry_budget=RetryBudget(ratio=0, min_retries=1))
+        plugin = ResilientPlugin(FlakyPlugin(failures=5), policy)
+        with self.assertRaises(RuntimeError):
+            await plugin.generate_response(self.messages)
+        self.assertEqual(plugin.plugin.calls, 2)
+
+    async def test_attempt_deadline(self):
+        policy = ResiliencePolicy(max_attempts=2, attempt_timeout=0.05, retry_budget=RetryBudget())
+        plugin = ResilientPlugin(FlakyPlugin(delays=[1.0, 0.0]), policy)
+        response = await plugin.generate_response(self.messages)
+        self.assertEqual(response["content"], "call 1")
+
+    async def test_hedge_beats_straggler(self):
+        policy = ResiliencePolicy(hedge=True, hedge_min_samples=3, retry_budget=RetryBudget())
+        for _ in range(3):
+            policy.latency.record(0.01)
+        plugin = ResilientPlugin(FlakyPlugin(delays=[1.0, 0.0]), policy)
+
+        start = time.perf_counter()
+        response = await plugin.generate_response(self.messages)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(response["content"], "call 1")
+        self.assertEqual((policy.hedges, policy.hedge_wins), (1, 1))
+
+
+class TestCircuitBreaker(unittest.IsolatedAsyncioTestCase):
+    messages = [{"role": "user", "content": "hi"}]
+
+    def test_opens_on_error_rate_and_recovers(self):
+        breaker = CircuitBreaker(min_calls=2, error_rate_threshold=0.5, reset_timeout=0)
+        breaker.record_success(0.1)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_ignores_calls_admitted_before_opening(self):
+        breaker = CircuitBreaker(min_calls=1, reset_timeout=0)
+        late_success, late_failure = breaker.allow_request(), breaker.allow_request()
+        breaker.record_failure(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        probe = breaker.allow_request()
+        self.assertTrue(probe.probe)
+        breaker.record_success(0.1, late_success)
+        breaker.record_failure(late_failure)
+        breaker.release(late_success)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(breaker._probes_in_flight, 1)
+
+        breaker.record_success(0.1, probe)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker._probes_in_flight, 0)
+
+    def test_opens_on_slow_calls(self):
+        breaker = CircuitBreaker(min_calls=2, slow_call_threshold=1.0, slow_call_rate_threshold=1.0)
+        breaker.record_success(2.0)
+        breaker.record_success(3.0)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    async def test_failover_skips_open_breaker(self):
+        primary = FailingPlugin()
+        backup = CountingPlugin()
+        plugin = FailoverPlugin(
+            [primary, backup],
+            breaker_factory=lambda: CircuitBreaker(min_calls=2, reset_timeout=60)
+        )
+
+        for _ in range(4):
+            response = await plugin.generate_response(self.messages)
+            self.assertEqual(response["content"], "hi")
+
+        self.assertEqual(primary.calls, 2)
+        self.assertEqual(backup.calls, 4)
+        self.assertEqual(list(plugin.health().values()), ["open", "closed"])
+
+    async def test_probe_closes_recovered_breaker(self):
+        primary = FailingPlugin()
+        plugin = FailoverPlugin(
+            [primary],
+            breaker_factory=lambda: CircuitBreaker(min_calls=1, reset_timeout=0)
+        )
+        with self.assertRaises(CircuitOpenError):
+            await plugin.generate_response(self.messages)
+
+        primary.generate_response = CountingPlugin().generate_response
+        self.assertEqual(list((await plugin.probe()).values()), ["closed"])
+
+    async def test_cancelled_probe_releases_half_open_slot(self):
+        primary = FailingPlugin()
+        breaker = CircuitBreaker(min_calls=1, reset_timeout=0)
+        plugin = FailoverPlugin([primary], breaker_factory=lambda: breaker)
+        with self.assertRaises(CircuitOpenError):
+            await plugin.generate_response(self.messages)
+
+        primary.generate_response = CountingPlugin(delay=5).generate_response
+        probe = asyncio.ensure_future(plugin.probe())
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await probe
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+
+
+class TestReplay(unittest.IsolatedAsyncioTestCase):
+    messages = [{"role": "user", "content": "summarize"}]
+
+    async def record(self, path):
+        from aho.plugins.replay import RecordingPlugin
+        live = CountingPlugin(delay=0.01)
+        live.model = "live-model"
+        recorder = RecordingPlugin(live, path=path)
+        await recorder.generate_response(self.messages)
+        await recorder.generate_response([{"role": "user", "content": "other"}])
+        recorder.save()
+        return live
+
+    async def test_record_then_replay_offline(self):
+        from aho.plugins.replay import Cassette, CassetteMissError, ReplayPlugin, constant
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cassette.json")
+            live = await self.record(path)
+            plugin = ReplayPlugin(Cassette.load(path), latency=constant(0))
+
+            response = await plugin.generate_response(self.messages)
+            self.assertEqual(response["content"], "summarize")
+            self.assertEqual(live.calls, 2)
+            with self.assertRaises(CassetteMissError):
+                await plugin.generate_response([{"role": "user", "content": "unknown"}])
+
+    async def test_sequential_replay_and_recorded_latency(self):
+        from aho.plugins.replay import Cassette, ReplayPlugin
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cassette.json")
+            await self.record(path)
+            plugin = ReplayPlugin(Cassette.load(path), match="sequential")
+
+            start = time.perf_counter()
+            first = await plugin.generate_response([{"role": "user", "content": "anything"}])
+            second = await plugin.generate_response([{"role": "user", "content": "anything"}])
+            self.assertGreaterEqual(time.perf_counter() - start, 0.015)
+            self.assertEqual([first["content"], second["content"]], ["summarize", "other"])
+
+    async def test_seeded_error_injection_is_repeatable(self):
+        from aho.plugins.replay import InjectedError, ReplayPlugin, uniform
+
+        async def outcomes():
+            plugin = ReplayPlugin(latency=uniform(0, 0.001), error_rate=0.3, seed=11)
+            results = []
+            for _ in range(40):
+                try:
+                    await plugin.generate_response(self.messages)
+                    results.append(True)
+                except InjectedError:
+                    results.append(False)
+            return results
+
+        first, second = await outcomes(), await outcomes()
+        self.assertEqual(first, second)
+        self.assertTrue(0 < first.count(False) < 40)
+
+
+def _tagged(name):
+    return name if ":" in name else f"{name}:latest"
+
+
+class FakeOllamaClient:
+    def __init__(self, delay=0.0, fail=False, models=("llama2",), loaded=()):
+        self.delay = delay
+        self.fail = fail
+        self.models = list(models)
+        self.loaded = list(loaded)
+        self.calls = []
+
+    async def chat(self, model, messages, options=None, **kwargs):
+        from ollama import ChatResponse
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("server down")
+        return ChatResponse(
+            model=model, done=True, message={"role": "assistant", "content": "hi"},
+            prompt_eval_count=3, eval_count=1, load_duration=2_000_000_000, total_duration=3_000_000_000
+        )
+
+    async def generate(self, model, prompt, keep_alive=None):
+        from ollama import GenerateResponse
+        self.calls.append({"keep_alive": keep_alive})
+        return GenerateResponse(model=model, response="", load_duration=1_500_000_000)
+
+    async def list(self):
+        from ollama import ListResponse
+        if self.fail:
+            raise ConnectionError("server down")
+        # The server always reports the tag, e.g. "llama2:latest"
+        return ListResponse(models=[{"model": _tagged(name)} for name in self.models])
+
+    async def ps(self):
+        from ollama import ProcessResponse
+        return ProcessResponse(models=[{"model": _tagged(name)} for name in self.loaded])
+
+
+class TestOllamaSlots(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        __import__("pytest").importorskip("ollama")
+        from aho.plugins.ollama_plugin import OllamaPlugin
+        self.OllamaPlugin = OllamaPlugin
+
+    async def test_requests_queue_for_server_slots(self):
+        plugin = self.OllamaPlugin({"num_parallel": 1, "keep_alive": "1h"})
+        plugin.client = FakeOllamaClient(delay=0.05)
+        first, second = await asyncio.gather(
+            plugin.generate_response([{"role": "user", "content": "a"}]),
+            plugin.generate_response([{"role": "user", "content": "b"}])
+        )
+
+        self.assertLess(first["timings"]["queue_time"], 0.02)
+        self.assertGreaterEqual(second["timings"]["queue_time"], 0.04)
+        self.assertEqual(first["timings"]["load_time"], 2.0)
+        self.assertEqual(plugin.client.calls[0]["keep_alive"], "1h")
+        self.assertEqual((plugin.active, plugin.queued), (0, 0))
+
+    async def test_preload_reports_load_time(self):
+        plugin = self.OllamaPlugin()
+        plugin.client = FakeOllamaClient()
+        self.assertEqual(await plugin.preload(), 1.5)
+        self.assertEqual(plugin.client.calls[0]["keep_alive"], "30m")
+
+
+class TestOllamaHostPool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        __import__("pytest").importorskip("ollama")
+        from aho.plugins.ollama_plugin import OllamaPlugin
+        self.plugin = OllamaPlugin({
+            "hosts": ["http://a:11434", "http://b:11434"],
+            "num_parallel": 2,
+            "max_host_failures": 1,
+        })
+        self.clients = [FakeOllamaClient(delay=0.02), FakeOllamaClient(delay=0.02)]
+        for host, client in zip(self.plugin.hosts, self.clients):
+            host.client = client
+
+    async def test_balances_by_outstanding_requests(self):
+        responses = await asyncio.gather(*(
+            self.plugin.generate_response([{"role": "user", "content": str(i)}]) for i in range(4)
+        ))
+        self.assertEqual(len(self.clients[0].calls), 2)
+        self.assertEqual(len(self.clients[1].calls), 2)
+        self.assertEqual({r["host"] for r in responses}, {"http://a:11434", "http://b:11434"})
+
+    async def test_prefers_host_with_model_loaded(self):
+        self.clients[1].loaded = ["llama2"]
+        await self.plugin.check_health()
+        response = await self.plugin.generate_response([{"role": "user", "content": "hi"}])
+        self.assertEqual(response["host"], "http://b:11434")
+
+    async def test_failed_host_is_drained_until_healthy(self):
+        self.clients[0].fail = True
+        with self.assertRaises(RuntimeError):
+            await self.plugin.generate_response([{"role": "user", "content": "hi"}])
+        self.assertFalse(self.plugin.hosts[0].healthy)
+
+        response = await self.plugin.generate_response([{"role": "user", "content": "hi"}])
+        self.assertEqual(response["host"], "http://b:11434")
+
+        self.clients[0].fail = False
+        health = await self.plugin.check_health()
+        self.assertTrue(health["http://a:11434"])
+
+    async def test_skips_hosts_without_model(self):
+        self.clients[0].models = ["mistral"]
+        await self.plugin.check_health()
+        response = await self.plugin.generate_response([{"role": "user", "content": "hi"}])
+        self.assertEqual(response["host"], "http://b:11434")
+
+    async def test_skips_host_drained_by_health_check(self):
+        self.clients[0].fail = True
+        health = await self.plugin.check_health()
+        self.assertEqual(health, {"http://a:11434": False, "http://b:11434": True})
+        self.assertTrue(self.plugin.hosts[1].serves("llama2"))
+
+        responses = await asyncio.gather(*(
+            self.plugin.generate_response([{"role": "user", "content": str(i)}]) for i in range(3)
+        ))
+        self.assertEqual({r["host"] for r in responses}, {"http://b:11434"})
+        self.assertEqual(self.clients[0].calls, [])
+
+    async def test_explicit_tags_match_untagged_names(self):
+        self.clients[0].models = ["llama2:13b"]
+        self.clients[1].loaded = ["llama2"]
+        await self.plugin.check_health()
+        self.assertFalse(self.plugin.hosts[0].serves("llama2"))
+        self.assertTrue(self.plugin.hosts[0].serves("llama2:13b"))
+        self.assertTrue(self.plugin.hosts[1].is_loaded("llama2:latest"))
+
+
+if __name__ == "__main__":
+    unittest.main()
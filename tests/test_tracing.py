@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from aho.plugins.base import BasePlugin
+from aho.plugins.resilience import ResiliencePolicy, ResilientPlugin
+from aho.utils.tracing import TRACER, JSONLinesExporter, OTLPHTTPExporter, Span
+from aho.workflows import ParallelProcessor, PromptChain
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def shutdown(self):
+        pass
+
+
+class TracedPlugin(BasePlugin):
+    name = "traced"
+    model = "fake-1"
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+
+    async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("flaky")
+        return {"content": "ok", "model": self.model, "usage": {"input_tokens": 4, "output_tokens": 2}}
+
+
+class TestTracing(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.exporter = ListExporter()
+        TRACER.add_exporter(self.exporter)
+
+    def tearDown(self):
+        TRACER.shutdown()
+
+    def by_name(self, name):
+        return [span for span in self.exporter.spans if span.name == name]
+
+    async def test_prompt_chain_nests_plugin_spans(self):
+        plugin = ResilientPlugin(TracedPlugin(failures=1), ResiliencePolicy(backoff_base=0.001))
+        await PromptChain([(plugin, "{input}"), (plugin, "{input}")]).run("hi")
+
+        run = self.by_name("PromptChain.run")[0]
+        steps = self.by_name("PromptChain.step")
+        calls = self.by_name("plugin.generate_response")
+
+        self.assertEqual(len(steps), 2)
+        self.assertTrue(all(step.parent_id == run.span_id for step in steps))
+        self.assertEqual({call.parent_id for call in calls}, {step.span_id for step in steps})
+        self.assertTrue(all(span.trace_id == run.trace_id for span in self.exporter.spans))
+        self.assertEqual(calls[0].attributes["retries"], 1)
+        self.assertEqual(calls[0].attributes["tokens.input"], 4)
+        self.assertEqual(calls[0].attributes["model"], "fake-1")
+
+    async def test_parallel_calls_are_children_of_run(self):
+        processor = ParallelProcessor([TracedPlugin(delay=0.01), TracedPlugin(delay=0.02)])
+        await processor.run("hi")
+
+        run = self.by_name("ParallelProcessor.run")[0]
+        calls = self.by_name("ParallelProcessor.call")
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(all(call.parent_id == run.span_id for call in calls))
+        self.assertGreaterEqual(run.duration, max(call.duration for call in calls))
+
+    async def test_errors_mark_span(self):
+        with self.assertRaises(RuntimeError):
+            await PromptChain([(TracedPlugin(failures=1), "{input}")]).run("hi")
+        self.assertEqual(self.by_name("PromptChain.step")[0].status, "error")
+
+
+class TestExporters(unittest.TestCase):
+    def test_jsonl_exporter(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces.jsonl")
+            TRACER.add_exporter(JSONLinesExporter(path))
+            try:
+                with TRACER.span("outer", user="42"):
+                    with TRACER.span("inner"):
+                        pass
+            finally:
+                TRACER.shutdown()
+            with open(path) as f:
+                spans = [json.loads(line) for line in f]
+        self.assertEqual([s["name"] for s in spans], ["inner", "outer"])
+        self.assertEqual(spans[0]["parent_id"], spans[1]["span_id"])
+        self.assertEqual(spans[1]["attributes"], {"user": "42"})
+
+    def test_jsonl_exporter_writes_in_batches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "traces.jsonl")
+            exporter = JSONLinesExporter(path, batch_size=3)
+            spans = [Span(f"span {i}", "t", None, {}) for i in range(5)]
+            for span in spans[:2]:
+                exporter.export(span)
+            self.assertEqual(os.path.getsize(path), 0)
+
+            for span in spans[2:]:
+                exporter.export(span)
+            exporter.flush()
+            with open(path) as f:
+                self.assertEqual([json.loads(line)["name"] for line in f], [s.name for s in spans])
+            exporter.shutdown()
+            exporter.shutdown()
+
+    def test_otlp_payload(self):
+        exporter = OTLPHTTPExporter(service_name="svc")
+        span = Span("call", "a" * 32, "b" * 16, {"tokens.input": 3, "cache_hit": True})
+        span.end_time = span.start_time + 1000
+        encoded = exporter.payload([span])["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+        exporter.shutdown()
+
+        self.assertEqual(encoded["parentSpanId"], "b" * 16)
+        self.assertIn({"key": "tokens.input", "value": {"intValue": "3"}}, encoded["attributes"])
+        self.assertIn({"key": "cache_hit", "value": {"boolValue": True}}, encoded["attributes"])
+
+    def test_module_imports_without_httpx(self):
+        # In a subprocess: reloading here would replace the TRACER other modules hold
+        import subprocess
+        import sys
+
+        code = (
+            "import sys; sys.modules['httpx'] = None\n"
+            "from aho.utils.tracing import OTLPHTTPExporter\n"
+            "try:\n    OTLPHTTPExporter()\nexcept ImportError:\n    print('lazy')"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip(), "lazy", result.stderr)
+
+    def test_disabled_tracer_is_noop(self):
+        with TRACER.span("ignored") as span:
+            span.set_attribute("x", 1)
+        self.assertFalse(TRACER.enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,478 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from aho.workflows import ChainCheckpoint, ChainStep, ModelRouter, ParallelProcessor, PromptChain, RouteTarget
+from aho.workflows.model_router import prefer_for_long_prompts
+
+
+class FakePlugin:
+    """Answers after ``delay`` seconds with a fixed content, or raises ``error``."""
+
+    def __init__(self, content="ok", delay=0.0, error=None, output_tokens=10):
+        self.content = content
+        self.delay = delay
+        self.error = error
+        self.output_tokens = output_tokens
+        self.calls = 0
+
+    async def generate_response(self, messages, temperature=0.7, max_tokens=None, tools=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {
+            "content": self.content.format(input=messages[-1]["content"]),
+            "usage": {"prompt_tokens": 5, "completion_tokens": self.output_tokens}
+        }
+
+
+class TestModelRouter(unittest.IsolatedAsyncioTestCase):
+    def make_router(self, **kwargs):
+        self.cheap = FakePlugin("cheap", delay=0.05)
+        self.fast = FakePlugin("fast")
+        self.small = FakePlugin("small")
+        return ModelRouter([
+            RouteTarget(self.fast, "fast", cost_per_1k_input=10, cost_per_1k_output=30),
+            RouteTarget(self.cheap, "cheap", cost_per_1k_input=0.1, cost_per_1k_output=0.1),
+            RouteTarget(self.small, "small", context_window=300),
+        ], **kwargs)
+
+    async def test_routes_to_cheapest_that_fits_context(self):
+        router = self.make_router()
+        response = await router.run("hi")
+        self.assertEqual(response["routed_to"], "small")
+
+        response = await router.run("x" * 400)
+        self.assertEqual(response["routed_to"], "cheap")
+
+    async def test_latency_slo_moves_traffic(self):
+        router = self.make_router()
+        await router.run("x" * 400)
+        self.assertEqual(router.stats()["cheap"]["requests"], 1)
+
+        response = await router.run("x" * 400, latency_slo=0.01)
+        self.assertEqual(response["routed_to"], "fast")
+
+    async def test_failure_falls_through_and_updates_error_rate(self):
+        router = self.make_router()
+        self.small.error = RuntimeError("down")
+        response = await router.run("hi")
+        self.assertEqual(response["routed_to"], "cheap")
+        self.assertGreater(router.stats()["small"]["error_rate"], 0)
+
+    async def test_custom_rule(self):
+        router = self.make_router(rules=[prefer_for_long_prompts(50, ["fast"])])
+        self.assertEqual((await router.run("x" * 400))["routed_to"], "fast")
+        self.assertEqual((await router.run("hi"))["routed_to"], "small")
+
+
+class TestParallelProcessorEarlyReturn(unittest.IsolatedAsyncioTestCase):
+    async def test_default_waits_for_all(self):
+        plugins = [FakePlugin("a"), FakePlugin("b", delay=0.05), FakePlugin(error=RuntimeError("down"))]
+        result = await ParallelProcessor(plugins).run("hi")
+        self.assertIsNone(result.stop_reason)
+        self.assertEqual([r["content"] for r in result.responses], ["a", "b", ""])
+        self.assertEqual(result.responses[2]["error"], "down")
+
+    async def test_first_k_cancels_stragglers(self):
+        plugins = [FakePlugin("slow", delay=5), FakePlugin("a"), FakePlugin("b", delay=0.01)]
+        result = await asyncio.wait_for(ParallelProcessor(plugins).run("hi", first_k=2), 1)
+        self.assertEqual(result.stop_reason, "first_k")
+        self.assertEqual([r["content"] for r in result.completed], ["a", "b"])
+        self.assertEqual(result.cancelled, ["plugin_1"])
+
+    async def test_quorum_ignores_errors_and_normalizes(self):
+        plugins = [
+            FakePlugin("Yes"),
+            FakePlugin(error=RuntimeError("down")),
+            FakePlugin("No", delay=0.01),
+            FakePlugin(" yes ", delay=0.02),
+            FakePlugin("no", delay=5),
+        ]
+        result = await asyncio.wait_for(ParallelProcessor(plugins).run("hi", quorum=2), 1)
+        self.assertEqual(result.stop_reason, "quorum")
+        self.assertEqual(result.quorum_content, "Yes")
+        self.assertEqual(result.majority_vote, "Yes")
+        self.assertEqual(result.cancelled, ["plugin_5"])
+
+    async def test_deadline_returns_partial_results(self):
+        plugins = [FakePlugin("fast"), FakePlugin("slow", delay=5)]
+        result = await asyncio.wait_for(ParallelProcessor(plugins).run("hi", deadline=0.05), 1)
+        self.assertEqual(result.stop_reason, "deadline")
+        self.assertEqual(result.majority_vote, "fast")
+        self.assertEqual(result.cancelled, ["plugin_2"])
+
+    async def test_max_concurrency(self):
+        in_flight = peak = 0
+
+        class Tracking(FakePlugin):
+            async def generate_response(self, messages, **kwargs):
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                try:
+                    return await super().generate_response(messages, **kwargs)
+                finally:
+                    in_flight -= 1
+
+        plugins = [Tracking(str(i), delay=0.01) for i in range(6)]
+        result = await ParallelProcessor(plugins, max_concurrency=2).run("hi")
+        self.assertEqual(peak, 2)
+        self.assertEqual(len(result.completed), 6)
+
+
+class TestParallelProcessorBatch(unittest.IsolatedAsyncioTestCase):
+    async def test_run_batch_orders_results(self):
+        plugins = [FakePlugin("a:{input}", delay=0.01), FakePlugin("b:{input}"), FakePlugin(error=RuntimeError("down"))]
+        processor = ParallelProcessor(plugins)
+        results = await processor.run_batch([f"x{i}" for i in range(5)], concurrency=4)
+        self.assertEqual(len(results), 5)
+        self.assertEqual([r["content"] for r in results[3].responses], ["a:x3", "b:x3", ""])
+        self.assertEqual(processor.progress.completed, 15)
+        self.assertEqual(processor.progress.failed, 5)
+        self.assertEqual(processor.progress.inputs_completed, 5)
+        self.assertEqual(processor.progress.per_plugin["plugin_1"], 5)
+
+    async def test_as_completed_respects_limits_and_reads_lazily(self):
+        in_flight = peak = 0
+        per_plugin_peak = {}
+
+        class Tracking(FakePlugin):
+            async def generate_response(self, messages, **kwargs):
+                nonlocal in_flight, peak
+                in_flight += 1
+                self.in_flight = getattr(self, "in_flight", 0) + 1
+                peak = max(peak, in_flight)
+                per_plugin_peak[self.content] = max(per_plugin_peak.get(self.content, 0), self.in_flight)
+                try:
+                    return await super().generate_response(messages, **kwargs)
+                finally:
+                    in_flight -= 1
+                    self.in_flight -= 1
+
+        read = 0
+
+        def inputs():
+            nonlocal read
+            for i in range(50):
+                read += 1
+                yield str(i)
+
+        processor = ParallelProcessor([Tracking("a", delay=0.001), Tracking("b", delay=0.001), Tracking("c", delay=0.001)])
+        seen = 0
+        async for user_input, plugin_name, response in processor.as_completed(inputs(), concurrency=4, per_plugin_concurrency=2):
+            seen += 1
+            self.assertIn(plugin_name, ("plugin_1", "plugin_2", "plugin_3"))
+            self.assertIn(response["content"], ("a", "b", "c"))
+            if seen == 3:
+                self.assertLess(read, 50)
+        self.assertEqual(seen, 150)
+        self.assertLessEqual(peak, 4)
+        self.assertTrue(all(v <= 2 for v in per_plugin_peak.values()))
+        self.assertIsNone(processor.progress.total)
+        self.assertGreater(processor.progress.throughput, 0)
+
+    async def test_breaking_out_cancels_workers(self):
+        slow = FakePlugin(delay=5)
+        processor = ParallelProcessor([FakePlugin(), slow])
+        stream = processor.as_completed(["a", "b", "c"])
+        item = await stream.__anext__()
+        self.assertEqual(item.plugin_index, 0)
+        await stream.aclose()
+        self.assertEqual(processor.progress.in_flight, 0)
+
+    async def test_input_errors_propagate(self):
+        def inputs():
+            yield "a"
+            raise ValueError("bad input")
+
+        with self.assertRaises(RuntimeError):
+            async for _ in ParallelProcessor([FakePlugin()]).as_completed(inputs()):
+                pass
+
+
+class TestSemanticVote(unittest.IsolatedAsyncioTestCase):
+    VECTORS = {
+        "Paris": [1.0, 0.0, 0.0],
+        "It is Paris.": [0.95, 0.1, 0.0],
+        "The capital is Paris": [0.9, 0.15, 0.05],
+        "Lyon": [0.0, 1.0, 0.0],
+    }
+
+    def embed(self, texts):
+        self.batches.append(list(texts))
+        return [self.VECTORS[t] for t in texts]
+
+    def setUp(self):
+        self.batches = []
+
+    async def run_processor(self, *contents):
+        return await ParallelProcessor([FakePlugin(c) for c in contents]).run("q")
+
+    async def test_groups_paraphrases_and_returns_medoid(self):
+        result = await self.run_processor("Paris", "Lyon", "It is Paris.", "The capital is Paris", "Paris")
+        self.assertEqual(result.majority_vote, "Paris")
+
+        vote = await result.semantic_vote(self.embed, threshold=0.9)
+        self.assertEqual(vote["content"], "It is Paris.")
+        self.assertAlmostEqual(vote["agreement"], 0.8)
+        self.assertEqual(vote["plugin_names"], ["plugin_1", "plugin_3", "plugin_4", "plugin_5"])
+        self.assertEqual(vote["clusters"], 2)
+        # One embedding call, duplicates removed
+        self.assertEqual(self.batches, [["Paris", "Lyon", "It is Paris.", "The capital is Paris"]])
+
+    async def test_async_embedding_and_errors_ignored(self):
+        plugins = [FakePlugin("Lyon"), FakePlugin(error=RuntimeError("down")), FakePlugin("Paris")]
+        result = await ParallelProcessor(plugins).run("q")
+
+        async def embed(texts):
+            return self.embed(texts)
+
+        vote = await result.semantic_vote(embed)
+        self.assertEqual(vote["content"], "Lyon")
+        self.assertAlmostEqual(vote["agreement"], 0.5)
+
+    async def test_no_answers(self):
+        result = await ParallelProcessor([FakePlugin(error=RuntimeError("down"))]).run("q")
+        vote = await result.semantic_vote(self.embed)
+        self.assertEqual(vote["content"], "")
+        self.assertEqual(self.batches, [])
+
+
+class TestPromptChainGraph(unittest.IsolatedAsyncioTestCase):
+    async def test_linear_tuples_unchanged(self):
+        chain = PromptChain([(FakePlugin("a({input})"), "{input}"), (FakePlugin("b({input})"), "x {input}")])
+        self.assertEqual(await chain.run("hi"), "b(x a(hi))")
+
+    async def test_independent_steps_run_concurrently(self):
+        loop = asyncio.get_running_loop()
+        chain = PromptChain([
+            ChainStep("a", FakePlugin("A[{input}]", delay=0.1), "{input}"),
+            ChainStep("b", FakePlugin("B[{input}]", delay=0.1), "{input}"),
+            ChainStep("c", FakePlugin("C[{input}]", delay=0.1), "{input}"),
+            ChainStep("report", FakePlugin("R[{input}]"), "{a}|{b}|{c}"),
+        ])
+        start = loop.time()
+        self.assertEqual(await chain.run("doc"), "R[A[doc]|B[doc]|C[doc]]")
+        self.assertLess(loop.time() - start, 0.25)
+
+    async def test_outputs_merge_and_named_inputs(self):
+        chain = PromptChain([
+            ChainStep("a", FakePlugin("A[{input}]"), "{input}"),
+            ChainStep("b", FakePlugin("B[{input}]"), "{text}", inputs={"text": "a"}),
+            ChainStep("merged", None, "{a} + {b}"),
+        ], output=["a", "merged"])
+        self.assertEqual(await chain.run("x"), "A[x]\n\nA[x] + B[A[x]]")
+        steps = await chain.run_steps("x")
+        self.assertEqual(steps["b"], "B[A[x]]")
+
+    async def test_failure_cancels_siblings(self):
+        slow = FakePlugin(delay=5)
+        chain = PromptChain([
+            ChainStep("slow", slow, "{input}"),
+            ChainStep("bad", FakePlugin(error=ValueError("boom")), "{input}"),
+            ChainStep("end", FakePlugin(), "{slow}{bad}"),
+        ])
+        with self.assertRaises(RuntimeError) as ctx:
+            await asyncio.wait_for(chain.run("x"), 1)
+        self.assertIn("bad", str(ctx.exception))
+
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            PromptChain([ChainStep("a", None, "{b}"), ChainStep("b", None, "{a}")])
+        with self.assertRaises(ValueError):
+            PromptChain([ChainStep("a", None, "{missing}")])
+        with self.assertRaises(ValueError):
+            PromptChain([ChainStep("a", None, "{input}"), ChainStep("a", None, "{input}")])
+
+
+class InputDelayPlugin(FakePlugin):
+    """Sleeps for the number of milliseconds given as the prompt's last word."""
+
+    async def generate_response(self, messages, **kwargs):
+        self.delay = int(messages[-1]["content"].split()[-1].strip("[]")) / 1000
+        return await super().generate_response(messages, **kwargs)
+
+
+class TestPromptChainRunMany(unittest.IsolatedAsyncioTestCase):
+    async def test_stages_overlap(self):
+        loop = asyncio.get_running_loop()
+        chain = PromptChain([(FakePlugin("a[{input}]", delay=0.05), "{input}"), (FakePlugin("b[{input}]", delay=0.05), "{input}")])
+        start = loop.time()
+        results = [r async for r in chain.run_many([str(i) for i in range(8)], concurrency=1)]
+        # Strictly sequential would take 8 * 0.1s; pipelined is about 9 * 0.05s
+        self.assertLess(loop.time() - start, 0.7)
+        self.assertEqual([r["output"] for r in results], [f"b[a[{i}]]" for i in range(8)])
+
+    async def test_ordered_and_completion_order(self):
+        chain = PromptChain([(InputDelayPlugin("{input}"), "{input}")])
+        inputs = ["60", "1", "30"]
+        ordered = [r["input"] async for r in chain.run_many(inputs)]
+        self.assertEqual(ordered, inputs)
+        completed = [r["input"] async for r in chain.run_many(inputs, ordered=False)]
+        self.assertEqual(completed, ["1", "30", "60"])
+
+    async def test_per_stage_concurrency_and_backpressure(self):
+        in_flight = peak = 0
+
+        class Tracking(FakePlugin):
+            async def generate_response(self, messages, **kwargs):
+                nonlocal in_flight, peak
+                in_flight += 1
+                peak = max(peak, in_flight)
+                try:
+                    return await super().generate_response(messages, **kwargs)
+                finally:
+                    in_flight -= 1
+
+        read = 0
+
+        def inputs():
+            nonlocal read
+            for i in range(100):
+                read += 1
+                yield str(i)
+
+        chain = PromptChain([(FakePlugin("{input}"), "{input}"), (Tracking("{input}", delay=0.001), "{input}")])
+        stream = chain.run_many(inputs(), concurrency={"0": 4, "1": 2}, max_in_flight=10)
+        first = await stream.__anext__()
+        self.assertEqual(first["index"], 0)
+        self.assertLessEqual(read, 12)
+        rest = [r async for r in stream]
+        self.assertEqual(len(rest), 99)
+        self.assertEqual(peak, 2)
+
+    async def test_failures_are_per_item(self):
+        chain = PromptChain([
+            ChainStep("a", InputDelayPlugin("{input}"), "{input}"),
+            ChainStep("b", FakePlugin(error=ValueError("boom")), "{input}"),
+            ChainStep("c", FakePlugin(), "{a}{b}"),
+        ])
+        results = [r async for r in chain.run_many(["1", "2"])]
+        self.assertEqual([r["index"] for r in results], [0, 1])
+        self.assertTrue(all("boom" in r["error"] and r["output"] is None for r in results))
+
+    async def test_failing_parallel_branches_finish_once(self):
+        chain = PromptChain([
+            ChainStep("a", FakePlugin(delay=0.01, error=ValueError("a failed")), "{input}"),
+            ChainStep("b", FakePlugin(delay=0.01, error=ValueError("b failed")), "{input}"),
+            ChainStep("c", FakePlugin(), "{a}{b}"),
+        ])
+        results = [r async for r in chain.run_many([str(i) for i in range(12)], ordered=False)]
+        self.assertEqual(sorted(r["index"] for r in results), list(range(12)))
+        self.assertTrue(all("failed" in r["error"] for r in results))
+
+    async def test_graph_chain(self):
+        chain = PromptChain([
+            ChainStep("a", FakePlugin("A[{input}]"), "{input}"),
+            ChainStep("b", FakePlugin("B[{input}]"), "{input}"),
+            ChainStep("c", None, "{a}{b}"),
+        ])
+        results = [r["output"] async for r in chain.run_many(["x", "y"])]
+        self.assertEqual(results, ["A[x]B[x]", "A[y]B[y]"])
+        self.assertEqual(await PromptChain([]).run("same"), "same")
+
+    async def test_cancelled_plugin_call_surfaces(self):
+        chain = PromptChain([(FakePlugin(error=asyncio.CancelledError()), "{input}")])
+
+        async def consume():
+            return [r async for r in chain.run_many(["1", "2"])]
+
+        with self.assertRaises(RuntimeError):
+            await asyncio.wait_for(consume(), 1)
+
+
+class TestPromptChainCheckpoint(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.first = FakePlugin("A[{input}]")
+        self.second = FakePlugin("B[{input}]", error=RuntimeError("down"))
+        self.checkpoint = ChainCheckpoint()
+
+    def make_chain(self, template="{input}"):
+        return PromptChain([(self.first, "{input}"), (self.second, template)], checkpoint=self.checkpoint)
+
+    async def test_run_resumes_after_failure(self):
+        with self.assertRaises(RuntimeError):
+            await self.make_chain().run("x")
+        self.second.error = None
+        self.assertEqual(await self.make_chain().run("x"), "B[A[x]]")
+        self.assertEqual(self.first.calls, 1)
+        self.assertEqual(self.second.calls, 2)
+
+        # Completed runs are served from the checkpoint
+        self.assertEqual(await self.make_chain().run("x"), "B[A[x]]")
+        self.assertEqual(self.second.calls, 2)
+
+    async def test_changed_chain_starts_afresh(self):
+        self.second.error = None
+        await self.make_chain().run("x")
+        self.assertEqual(await self.make_chain("again {input}").run("x"), "B[again A[x]]")
+        self.assertEqual(self.first.calls, 2)
+
+    async def test_run_many_resumes_per_item_and_persists(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "checkpoints.db")
+            self.checkpoint = ChainCheckpoint(path)
+            results = [r async for r in self.make_chain().run_many(["1", "2", "3"])]
+            self.assertTrue(all("down" in r["error"] for r in results))
+            self.assertEqual(len(self.checkpoint), 3)
+            self.checkpoint.close()
+
+            self.checkpoint = ChainCheckpoint(path)
+            self.second.error = None
+            results = [r["output"] async for r in self.make_chain().run_many(["1", "2", "3", "4"])]
+            self.assertEqual(results, ["B[A[1]]", "B[A[2]]", "B[A[3]]", "B[A[4]]"])
+            self.assertEqual(self.first.calls, 4)
+
+            results = [r["output"] async for r in self.make_chain().run_many(["2", "4"])]
+            self.assertEqual(results, ["B[A[2]]", "B[A[4]]"])
+            self.assertEqual(self.second.calls, 7)
+            self.checkpoint.clear()
+            self.assertEqual(len(self.checkpoint), 0)
+            self.checkpoint.close()
+
+    async def test_saves_are_committed_in_batches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "checkpoints.db")
+            self.checkpoint = ChainCheckpoint(path, commit_every=3, commit_interval=60)
+            reader = sqlite3.connect(path)
+            committed = lambda: reader.execute("SELECT COUNT(*) FROM chain_checkpoints").fetchone()[0]
+
+            self.checkpoint.save("chain", "hash", "a", "A")
+            self.checkpoint.save("chain", "hash", "b", "B")
+            self.assertEqual(committed(), 0)
+            self.assertEqual(self.checkpoint.load("chain", "hash"), {"a": "A", "b": "B"})
+            self.checkpoint.save("chain", "hash", "c", "C")
+            self.assertEqual(committed(), 3)
+
+            # Runs flush what they saved when they end, even on failure
+            self.checkpoint.clear()
+            results = [r async for r in self.make_chain().run_many(["1", "2"])]
+            self.assertTrue(all("down" in r["error"] for r in results))
+            self.assertEqual(committed(), 2)
+            with self.assertRaises(RuntimeError):
+                await self.make_chain().run("3")
+            self.assertEqual(committed(), 3)
+            reader.close()
+            self.checkpoint.close()
+
+    async def test_failing_save_surfaces_from_run_many(self):
+        def save(*args):
+            raise OSError("disk full")
+
+        self.second.error = None
+        self.checkpoint.save = save
+
+        async def consume():
+            return [r async for r in self.make_chain().run_many(["1", "2", "3"])]
+
+        with self.assertRaises(RuntimeError) as ctx:
+            await asyncio.wait_for(consume(), 1)
+        self.assertIn("disk full", str(ctx.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()